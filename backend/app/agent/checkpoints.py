@@ -0,0 +1,99 @@
+"""
+Graph Checkpointing
+Har node ke baad LangGraph checkpoint (thread_id = task_id) - late failure / restart par last completed node se resume
+"""
+import os
+from typing import Any, Dict
+
+from langgraph.checkpoint.memory import MemorySaver
+
+
+# none | memory (same process mein failures) | sqlite (process restart ke baad bhi)
+CHECKPOINT_BACKEND = os.getenv("CHECKPOINT_BACKEND", "memory").lower()
+
+# Node fail ho to ek run mein itni baar last good checkpoint se dobara (0 = kabhi nahi)
+CHECKPOINT_RESUME_ATTEMPTS = int(os.getenv("CHECKPOINT_RESUME_ATTEMPTS", "1"))
+
+
+class CheckpointStore:
+    """
+    LangGraph checkpointer ka lifecycle
+
+    Checkpoints sirf workflow chalne tak rakhe jate hain: run khatam (complete /
+    fail / cancel) hote hi thread delete hota hai. Process crash ho jaye to
+    SQLite backend mein thread bacha rehta hai aur journal requeue wahin se
+    resume karta hai. State mein images ke sirf blob IDs hain, isliye har
+    checkpoint write chhota rehta hai.
+
+    SQLite ke liye optional package chahiye: pip install langgraph-checkpoint-sqlite "aiosqlite<0.22"
+    """
+
+    def __init__(self):
+        self.backend = CHECKPOINT_BACKEND
+        self.path = os.getenv("CHECKPOINT_SQLITE_PATH", "data/checkpoints.db")
+        self.resume_attempts = CHECKPOINT_RESUME_ATTEMPTS
+
+        # Memory saver turant ready; SQLite connection start() par khulta hai
+        self.saver = MemorySaver() if self.backend == "memory" else None
+        self._conn = None
+        self._stats = {"resumed": 0, "rewound": 0, "discarded": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.saver is not None
+
+    async def start(self):
+        """SQLite checkpointer open karo (app / worker startup, jobs consume hone se pehle)"""
+        if self.backend != "sqlite" or self.saver is not None:
+            return self.saver
+
+        try:
+            import aiosqlite
+            from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+        except ImportError:
+            raise RuntimeError(
+                "CHECKPOINT_BACKEND=sqlite requires the 'langgraph-checkpoint-sqlite' package: "
+                "pip install langgraph-checkpoint-sqlite 'aiosqlite<0.22'"
+            )
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._conn = await aiosqlite.connect(self.path)
+        self.saver = AsyncSqliteSaver(self._conn)
+        await self.saver.setup()
+        print(f"💾 Graph checkpoints: {self.path}")
+        return self.saver
+
+    async def close(self):
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+            self.saver = None
+
+    @staticmethod
+    def config(task_id: str) -> Dict[str, Any]:
+        return {"configurable": {"thread_id": task_id}}
+
+    def record(self, event: str):
+        self._stats[event] += 1
+
+    async def discard(self, task_id: str):
+        """Task ke saare checkpoints hatao (run khatam / recovery ne task final kar diya)"""
+        if self.saver is None:
+            return
+        try:
+            await self.saver.adelete_thread(task_id)
+            self._stats["discarded"] += 1
+        except Exception as e:
+            print(f"⚠️ Checkpoint cleanup failed ({task_id}): {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend,
+            "enabled": self.enabled,
+            "resume_attempts": self.resume_attempts,
+            **self._stats
+        }
+
+
+# Global instance
+checkpoint_store = CheckpointStore()
@@ -2,24 +2,100 @@
 LangGraph Workflow Definition
 Sabhi nodes ko connect karke complete workflow banata hai
 """
-from typing import Literal
+import os
+import json
+import time
+import asyncio
+import hashlib
+from typing import Any, Awaitable, Callable, Dict, List, Literal, Optional
 from langgraph.graph import StateGraph, END
 from .state import AgentState, NodeStatus
+from ..services.singleflight import SingleFlight
+from ..services.task_store import task_store
+from .speculation import speculations
+from .checkpoints import checkpoint_store
 from .nodes import (
     planner_node,
     generator_node,
     critic_node,
-    human_approval_node
+    human_approval_node,
+    fits_another_round,
+    remaining_budget,
+    GENERATION_ROUND_ESTIMATE
 )
 
 
+# Node transition hooks: listener(task_id, node_name, state_update, progress) har node ke baad
+#
+# progress = {"iteration", "step_seconds", "elapsed_seconds", "remaining_seconds", "progress"}
+NodeListener = Callable[[str, str, Dict[str, Any], Dict[str, Any]], Awaitable[None]]
+node_listeners: List[NodeListener] = []
+
+
+class NodeTimings:
+    """Har node ki EWMA duration - progress / ETA estimate ke liye"""
+
+    def __init__(self, defaults: Dict[str, float], smoothing: float = 0.2):
+        self.smoothing = smoothing
+        self._average = dict(defaults)
+        self._samples: Dict[str, int] = {}
+
+    def record(self, node: str, seconds: float):
+        average = self._average.get(node)
+        if average is None or not self._samples.get(node):
+            # Pehla real sample default estimate ko replace karta hai
+            self._average[node] = seconds
+        else:
+            self._average[node] = average + self.smoothing * (seconds - average)
+        self._samples[node] = self._samples.get(node, 0) + 1
+
+    def expected(self, node: str) -> float:
+        return self._average.get(node, 0.0)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            node: {"avg_seconds": round(average, 2), "samples": self._samples.get(node, 0)}
+            for node, average in self._average.items()
+        }
+
+
+node_timings = NodeTimings({
+    "planner": 0.1,
+    "human_approval": 0.1,
+    "generator": GENERATION_ROUND_ESTIMATE,
+    "critic": 0.1
+})
+
+
+def expected_remaining(node: str, state: AgentState) -> float:
+    """Is node ke baad workflow ka bacha hua andaza (seconds, historical node durations se)"""
+    round_seconds = node_timings.expected("generator") + node_timings.expected("critic")
+    
+    if state.get("node_status") == NodeStatus.FAILED:
+        remaining = 0.0
+    elif node in ("planner", "human_approval"):
+        remaining = round_seconds
+    elif node == "generator":
+        remaining = node_timings.expected("critic")
+    elif state.get("should_regenerate") and state.get("iteration_count", 0) < state.get("max_iterations", 1):
+        remaining = round_seconds
+    else:
+        remaining = 0.0
+    
+    # Deadline ke baad kuch nahi chalega
+    budget = remaining_budget(state)
+    if budget is not None:
+        remaining = min(remaining, max(0.0, budget))
+    return remaining
+
+
 def should_continue_generation(state: AgentState) -> Literal["generator", "end"]:
     """
     Conditional edge: Decide karna hai ke generation continue karein ya end
     
     Returns:
-        - "generator": Agar quality low hai aur iterations baaki hain
-        - "end": Agar quality acceptable hai ya max iterations complete
+        - "generator": Agar quality low hai, iterations baaki hain aur deadline budget mein ek aur round fit hota hai
+        - "end": Agar quality acceptable hai, max iterations complete ya budget khatam (best image so far)
     """
     # Check for errors
     if state.get("node_status") == NodeStatus.FAILED:
@@ -31,6 +107,9 @@ def should_continue_generation(state: AgentState) -> Literal["generator", "end"]
     max_iterations = state.get("max_iterations", 3)
     
     if should_regenerate and iteration_count < max_iterations:
+        if not fits_another_round(state):
+            print(f"⏱️ Ending: Deadline budget can't fit another round")
+            return "end"
         print(f"🔄 Continuing: Iteration {iteration_count}/{max_iterations}")
         return "generator"
     else:
@@ -56,7 +135,7 @@ def should_get_approval(state: AgentState) -> Literal["human_approval", "generat
         return "generator"
 
 
-def create_agent_graph() -> StateGraph:
+def create_agent_graph(checkpointer=None) -> StateGraph:
     """
     Complete LangGraph workflow create karta hai
     
@@ -68,6 +147,9 @@ def create_agent_graph() -> StateGraph:
        - If continue: Go back to Generator
        - If end: END
     
+    Args:
+        checkpointer: Optional LangGraph checkpointer (har node ke baad state save)
+    
     Returns:
         Compiled StateGraph ready for execution
     """
@@ -112,7 +194,7 @@ def create_agent_graph() -> StateGraph:
     )
     
     # Compile the graph
-    app = workflow.compile()
+    app = workflow.compile(checkpointer=checkpointer)
     
     print("✅ LangGraph workflow compiled successfully")
     print("📊 Nodes: planner → human_approval → generator → critic")
@@ -120,15 +202,94 @@ def create_agent_graph() -> StateGraph:
     return app
 
 
-# Create global graph instance
-agent_graph = create_agent_graph()
+# Create global graph instance (memory checkpointer ho to usi ke saath)
+agent_graph = create_agent_graph(checkpoint_store.saver)
+
+
+async def start_checkpointing():
+    """Startup (jobs consume hone se pehle): SQLite checkpointer khule to graph usi ke saath compile"""
+    global agent_graph
+    saver = checkpoint_store.saver
+    if await checkpoint_store.start() is not saver:
+        agent_graph = create_agent_graph(checkpoint_store.saver)
+
+
+# Optional: identical concurrent workflows ek hi graph run share karein
+AGENT_COALESCE_ENABLED = os.getenv("AGENT_COALESCE_ENABLED", "false").lower() == "true"
+agent_flights = SingleFlight("agent")
+
+
+class AgentFlight:
+    """
+    Ek coalesced graph run ke saare waiting task IDs
+
+    Node updates har waiting task ko jate hain (progress, ETA, journal). Baad
+    mein join karne wale task ko latest update turant replay hota hai.
+    """
+
+    def __init__(self, key: str, deadline_at: Optional[float] = None):
+        self.key = key
+        self.deadline_at = deadline_at  # Shared run leader ki deadline par chalta hai
+        self.task_ids: Dict[str, None] = {}  # Insertion order (leader pehle)
+        self.joined: Dict[str, None] = {}  # Sab tasks jo kabhi join hue (cancel par bhi nahi hatte)
+        self.last: Optional[tuple] = None  # (node, update, progress)
+        self.done = False
+
+    @property
+    def thread_id(self) -> str:
+        # Checkpoint flight ka hai, kisi ek task ka nahi (leader cancel ho to bhi run bacha rahe)
+        return f"agent-flight:{self.key}"
+
+    def fits(self, deadline_at: Optional[float]) -> bool:
+        """Shared run is task ki deadline se pehle khatam hota hai (task join kar sakta hai)"""
+        if deadline_at is None:
+            return True
+        return self.deadline_at is not None and self.deadline_at <= deadline_at
+
+
+_agent_flight_members: Dict[str, AgentFlight] = {}
+
+
+def _agent_flight_key(
+    prompt: str,
+    reference_image_id: str,
+    max_iterations: int,
+    seed: int,
+    use_cache: bool,
+    candidates: int,
+    candidate_concurrency: int,
+    speculative: bool
+) -> str:
+    """
+    Workflow inputs ka hash (task_id aur deadline ke bina)
+
+    Deadline key mein nahi (har request ki absolute deadline alag hoti hai);
+    join karne ka faisla AgentFlight.fits karta hai.
+    """
+    canonical = json.dumps({
+        "prompt": prompt,
+        "reference_image_id": reference_image_id,
+        "max_iterations": max_iterations,
+        "seed": seed,
+        "use_cache": use_cache,
+        "candidates": candidates,
+        "candidate_concurrency": candidate_concurrency,
+        "speculative": speculative
+    }, sort_keys=True)
+    return hashlib.sha256(canonical.encode()).hexdigest()
 
 
 async def run_agent(
     prompt: str,
     task_id: str,
-    reference_image: str = None,
-    max_iterations: int = 3
+    reference_image_id: str = None,
+    max_iterations: int = 3,
+    seed: int = None,
+    use_cache: bool = False,
+    deadline_at: float = None,
+    candidates: int = 1,
+    candidate_concurrency: int = None,
+    speculative: bool = False
 ) -> AgentState:
     """
     Main function to execute the complete workflow
@@ -136,12 +297,76 @@ async def run_agent(
     Args:
         prompt: User's image generation prompt
         task_id: Unique task identifier
-        reference_image: Optional reference image (base64)
+        reference_image_id: Optional reference image handle (blob store ID)
         max_iterations: Maximum regeneration attempts
+        seed: Optional base seed (har iteration par +1 hota hai)
+        use_cache: Seed ke bina bhi generation cache use karo
+        deadline_at: Epoch deadline; generation isi budget mein rehti hai
+        candidates: Best-of-N - har round mein itni images parallel
+        candidate_concurrency: Ek waqt mein itne candidates (None = CANDIDATE_CONCURRENCY)
+        speculative: Critic ke dauraan agle round ki generation pehle se start karo
     
     Returns:
         Final AgentState with generated image and metadata
     """
+    def run(flight: Optional[AgentFlight] = None):
+        return _run_graph(
+            prompt, task_id, reference_image_id, max_iterations, seed, use_cache, deadline_at,
+            candidates=candidates,
+            candidate_concurrency=candidate_concurrency,
+            speculative=speculative,
+            flight=flight
+        )
+    
+    if not AGENT_COALESCE_ENABLED:
+        return await run()
+    
+    key = _agent_flight_key(
+        prompt, reference_image_id, max_iterations, seed, use_cache, candidates,
+        candidate_concurrency, speculative
+    )
+    flight = _agent_flight_members.get(key)
+    if flight is None or flight.done:
+        flight = _agent_flight_members[key] = AgentFlight(key, deadline_at)
+    elif not flight.fits(deadline_at):
+        # Shared run is task ki deadline ke baad tak chal sakta hai: apna alag run
+        return await run()
+    flight.task_ids[task_id] = None
+    flight.joined[task_id] = None
+    
+    try:
+        # Late joiner: run jahan tak pahunch chuka hai wahan tak ka progress
+        if flight.last is not None:
+            await _notify_listeners(task_id, *flight.last)
+        final_state = await agent_flights.do(key, lambda: run(flight))
+    finally:
+        flight.task_ids.pop(task_id, None)
+        if not flight.task_ids and _agent_flight_members.get(key) is flight:
+            del _agent_flight_members[key]
+    
+    # Shared result har follower ke apne task_id ke saath
+    return {**final_state, "task_id": task_id}
+
+
+async def _run_graph(
+    prompt: str,
+    task_id: str,
+    reference_image_id: str,
+    max_iterations: int,
+    seed: int,
+    use_cache: bool,
+    deadline_at: float = None,
+    candidates: int = 1,
+    candidate_concurrency: int = None,
+    speculative: bool = False,
+    flight: Optional[AgentFlight] = None
+) -> AgentState:
+    """
+    Graph ko ek baar execute karta hai (run_agent ka actual kaam)
+    
+    flight diya ho (coalesced run) to checkpoint thread flight ka hota hai aur
+    node updates uske saare waiting tasks ko jate hain.
+    """
     from datetime import datetime
     
     print(f"\n{'='*60}")
@@ -153,17 +378,29 @@ async def run_agent(
     # Initialize state
     initial_state: AgentState = {
         "original_prompt": prompt,
-        "reference_image": reference_image,
+        "reference_image_id": reference_image_id,
         "optimized_prompt": None,
         "prompt_analysis": None,
-        "generated_image": None,
+        "generated_image_id": None,
         "generation_params": None,
+        "seed": seed,
+        "use_cache": use_cache,
+        "candidates": candidates,
+        "candidate_concurrency": candidate_concurrency,
+        "candidate_image_ids": None,
+        "speculative": speculative,
         "quality_score": None,
         "feedback": None,
         "issues_found": None,
+        "candidate_scores": None,
+        "best_image_id": None,
+        "best_quality_score": None,
         "iteration_count": 0,
         "max_iterations": max_iterations,
+        "retry_count": 0,
         "should_regenerate": False,
+        "deadline_at": deadline_at,
+        "round_seconds": None,
         "current_node": "start",
         "node_status": NodeStatus.PENDING,
         "error_message": None,
@@ -172,9 +409,46 @@ async def run_agent(
         "user_approved": None
     }
     
+    thread_id = flight.thread_id if flight is not None else task_id
+    config = checkpoint_store.config(thread_id) if checkpoint_store.enabled else None
+    graph_input, state, run_config = initial_state, initial_state, config
+    keep_checkpoint = False
+    
     try:
-        # Run the graph
-        final_state = await agent_graph.ainvoke(initial_state)
+        # Pichla run (crash / restart) isi task ka checkpoint chhod gaya ho to wahin se
+        resume = await _resume_point(config) if config else None
+        if resume is not None and not resume.next:
+            print(f"♻️ Workflow already finished in checkpoint")
+            return resume.values
+        if resume is not None:
+            checkpoint_store.record("resumed")
+            print(f"♻️ Resuming from checkpoint before: {resume.next[0]}")
+            graph_input, state, run_config = None, resume.values, resume.config
+        
+        # Run the graph (har node ke baad update stream hota hai). Node fail ho
+        # ya exception aaye to last good checkpoint se dobara - bani hui image
+        # ke liye generation phir se nahi hoti.
+        attempts = 0
+        while True:
+            try:
+                final_state, error = await _stream_graph(graph_input, state, run_config, flight), None
+            except Exception as e:
+                final_state, error = None, e
+            
+            if error is None and final_state.get("node_status") != NodeStatus.FAILED:
+                break
+            if config is None or attempts >= checkpoint_store.resume_attempts:
+                break
+            resume = await _resume_point(config)
+            if resume is None or not resume.next:
+                break
+            attempts += 1
+            checkpoint_store.record("rewound")
+            print(f"♻️ Retrying from checkpoint before: {resume.next[0]}")
+            graph_input, state, run_config = None, resume.values, resume.config
+        
+        if error is not None:
+            raise error
         
         print(f"\n{'='*60}")
         print(f"✅ Workflow Completed Successfully")
@@ -193,3 +467,122 @@ async def run_agent(
         initial_state["node_status"] = NodeStatus.FAILED
         initial_state["error_message"] = str(e)
         return initial_state
+    
+    except asyncio.CancelledError:
+        # Shutdown: checkpoint rakho (restart par journal requeue yahin se resume
+        # karta hai). User cancel (cancel_job status pehle set karta hai) final hai.
+        task_ids = flight.joined if flight is not None else (task_id,)
+        keep_checkpoint = config is not None and not await _cancelled_by_user(task_ids)
+        raise
+    
+    finally:
+        # Workflow khatam (end / fail / cancel): bachi hui speculation wasted
+        speculations.discard(task_id)
+        if flight is not None:
+            flight.done = True
+        if config is not None and not keep_checkpoint:
+            await checkpoint_store.discard(thread_id)
+
+
+async def _cancelled_by_user(task_ids) -> bool:
+    """Kya saare tasks user ne cancel / delete kiye (shutdown cancel nahi)"""
+    try:
+        for task_id in task_ids:
+            record = await task_store.get(task_id)
+            if record is not None and record.get("status") != "cancelled":
+                return False
+    except Exception as e:
+        print(f"⚠️ Cancel status check failed: {e}")
+        return False
+    return True
+
+
+async def _resume_point(config: Dict[str, Any]):
+    """
+    Checkpoint jahan se graph dobara chal sake (StateSnapshot ya None)
+    
+    - Interrupted run: latest checkpoint (`next` mein baaki node)
+    - Graph successfully khatam: latest checkpoint (`next` khali - dobara mat chalao)
+    - Graph kisi node ke fail hone par khatam: us se pehle ka last good checkpoint,
+      sirf tab jab tak image ban chuki ho (warna ye bas normal retry hai)
+    """
+    snapshot = await agent_graph.aget_state(config)
+    if not snapshot.values:
+        return None
+    if snapshot.next or snapshot.values.get("node_status") != NodeStatus.FAILED:
+        return snapshot
+    
+    async for earlier in agent_graph.aget_state_history(config):
+        if earlier.next and earlier.values.get("node_status") != NodeStatus.FAILED:
+            if earlier.values.get("generated_image_id") or earlier.values.get("best_image_id"):
+                return earlier
+            return None
+    return None
+
+
+async def _stream_graph(
+    graph_input: Optional[AgentState],
+    state: AgentState,
+    config: Optional[Dict[str, Any]] = None,
+    flight: Optional[AgentFlight] = None
+) -> AgentState:
+    """
+    Graph ko streaming mode mein chalata hai
+    
+    Har node complete hone par listeners ko sirf us node ka update aur timing /
+    progress milta hai. Final state updates merge karke banti hai (AgentState
+    mein koi reducers nahi, har key overwrite hoti hai).
+    
+    graph_input None + checkpoint config = us checkpoint se resume (state =
+    checkpoint ki values). Coalesced run (flight) mein har waiting task ko
+    same update milta hai.
+    """
+    state: Dict[str, Any] = dict(state)
+    task_id = state["task_id"]
+    started = last = time.monotonic()
+    progress = 10
+    
+    async for chunk in agent_graph.astream(graph_input, config, stream_mode="updates"):
+        for node, update in chunk.items():
+            if node.startswith("__"):
+                continue
+            update = update or {}
+            now = time.monotonic()
+            step_seconds, last = now - last, now
+            node_timings.record(node, step_seconds)
+            state.update(update)
+            
+            elapsed = now - started
+            remaining = expected_remaining(node, state)
+            # Monotonic: regeneration round remaining badha de to bhi progress peeche nahi jata
+            progress = max(progress, min(95, 10 + int(85 * elapsed / max(elapsed + remaining, 1e-6))))
+            
+            if node in ("generator", "critic"):
+                # 1-based current round (critic iteration_count pehle hi badha chuka)
+                iteration = state.get("iteration_count", 0) + (1 if node == "generator" else 0)
+            else:
+                iteration = 0
+            
+            report = (node, update, {
+                "iteration": iteration,
+                "step_seconds": round(step_seconds, 2),
+                "elapsed_seconds": round(elapsed, 2),
+                "remaining_seconds": round(remaining, 1),
+                "progress": progress
+            })
+            if flight is None:
+                await _notify_listeners(task_id, *report)
+                continue
+            flight.last = report
+            for waiting_id in list(flight.task_ids):
+                await _notify_listeners(waiting_id, *report)
+    
+    return state
+
+
+async def _notify_listeners(task_id: str, node: str, update: Dict[str, Any], progress: Dict[str, Any]):
+    for listener in node_listeners:
+        try:
+            await listener(task_id, node, update, progress)
+        except Exception as e:
+            print(f"⚠️ Node listener failed ({node}): {e}")
@@ -0,0 +1,316 @@
+"""
+Job Execution
+Broker se aaye jobs ke liye agent workflow chalata hai (API inline mode ya app.worker process)
+"""
+import time
+import asyncio
+from typing import Any, Dict, Optional
+from datetime import datetime
+
+from .graph import run_agent, node_listeners
+from .checkpoints import checkpoint_store
+from .state import NodeStatus
+from ..services.monitor import monitor
+from ..services.blob_store import blob_store
+from ..services.derivatives import derivative_pipeline
+from ..services.task_store import task_store
+from ..services.journal import task_journal
+from ..services.broker import QueueFull
+from ..services.scheduler import job_scheduler
+
+
+async def run_job(job: Dict[str, Any]):
+    """JobScheduler handler: broker job -> execute_agent_workflow"""
+    params = job["params"]
+    
+    # Worker tier: job jahan chalta hai wahi journal/recover hota hai (inline mode
+    # mein submit pehle hi journal kar chuka). Row pehle se ho to wahi rehti hai.
+    if job_scheduler.mode == "worker":
+        task_journal.record_created(job["task_id"], {
+            **params,
+            "priority": job.get("priority", 0),
+            "client": job.get("client")
+        })
+    
+    await execute_agent_workflow(task_id=job["task_id"], redelivered=job.get("redelivered", False), **params)
+
+
+async def execute_agent_workflow(
+    task_id: str,
+    prompt: str,
+    reference_image_id: Optional[str],
+    max_iterations: int,
+    seed: Optional[int] = None,
+    use_cache: bool = False,
+    deadline_at: Optional[float] = None,
+    candidates: int = 1,
+    candidate_concurrency: Optional[int] = None,
+    speculative: bool = False,
+    redelivered: bool = False
+):
+    """
+    Execute the complete agent workflow in background
+    
+    Updates task status as workflow progresses. `redelivered` jobs (jinka
+    pichla worker beech mein mar gaya) "running" status se dobara shuru hote hain.
+    """
+    startable = ("pending", "running") if redelivered else ("pending",)
+    try:
+        # Queue mein hi deadline nikal gayi: generation shuru hi mat karo
+        if deadline_at is not None and time.time() >= deadline_at:
+            expired = await task_store.update(
+                task_id,
+                if_status=startable,
+                status="failed",
+                progress=0,
+                current_step="error",
+                error="Deadline exceeded while queued"
+            )
+            if expired is not None:
+                task_journal.record_finished(task_id, "failed", {"error": "Deadline exceeded while queued"})
+            return
+        
+        # Update status: running (started_at = ETA ke liye)
+        started = await task_store.update(
+            task_id,
+            if_status=startable,
+            status="running",
+            progress=10,
+            current_step="planning",
+            started_at=time.time()
+        )
+        if started is None:
+            # Queue mein rehte hue cancel/delete ho chuka
+            return
+        
+        # Run the agent
+        final_state = await run_agent(
+            prompt=prompt,
+            task_id=task_id,
+            reference_image_id=reference_image_id,
+            max_iterations=max_iterations,
+            seed=seed,
+            use_cache=use_cache,
+            deadline_at=deadline_at,
+            candidates=candidates,
+            candidate_concurrency=candidate_concurrency,
+            speculative=speculative
+        )
+        
+        # Best-so-far image (last round kharab ho ya deadline par ruka ho)
+        image_id = final_state.get("best_image_id") or final_state.get("generated_image_id")
+        quality_score = final_state.get("best_quality_score") or final_state.get("quality_score")
+        
+        # Check for errors
+        if final_state.get("node_status") == NodeStatus.FAILED:
+            await task_store.update(
+                task_id,
+                if_status=("running",),
+                status="failed",
+                progress=0,
+                current_step="error",
+                error=final_state.get("error_message", "Unknown error")
+            )
+            task_journal.record_finished(task_id, "failed", {"error": final_state.get("error_message")})
+            return
+        
+        # Update with success (cancelled task ko overwrite nahi karna)
+        completed = await task_store.update(
+            task_id,
+            if_status=("running",),
+            status="completed",
+            progress=100,
+            current_step="done",
+            image_id=image_id,
+            feedback=final_state.get("feedback"),
+            quality_score=quality_score,
+            iteration_count=final_state.get("iteration_count", 0)
+        )
+        if completed is None:
+            return
+        task_journal.record_finished(task_id, "completed", {
+            "image_id": image_id,
+            "quality_score": quality_score
+        })
+        
+        # Previews ke liye derivatives background mein
+        if derivative_pipeline.enabled and image_id:
+            spawn_background(build_derivatives(task_id, image_id))
+        
+        # Flush monitoring events
+        if monitor.enabled:
+            monitor.flush()
+        
+    except asyncio.CancelledError:
+        # User cancel: cancel_job status aur journal dono pehle hi likh chuka hai.
+        # Shutdown cancel: journal row unfinished rehti hai taake restart par recover ho
+        print(f"🛑 Task {task_id} cancelled")
+        raise
+    
+    except Exception as e:
+        # Update with error
+        await task_store.update(
+            task_id,
+            if_status=("pending", "running"),
+            status="failed",
+            progress=0,
+            current_step="error",
+            error=str(e)
+        )
+        task_journal.record_finished(task_id, "failed", {"error": str(e)})
+        
+        # Log error
+        if monitor.enabled:
+            monitor.log_error(
+                trace_id=task_id,
+                error_message=str(e)
+            )
+
+
+async def cancel_job(task_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Task cancel karo (queued ya running)
+    
+    Pehle status atomically "cancelled" hota hai (late completion isse overwrite
+    nahi kar sakti), phir queue se removal / running job abort. Returns updated
+    record, ya current record agar task pehle hi finish ho chuka tha, ya None.
+    """
+    record = await task_store.update(
+        task_id,
+        if_status=("pending", "running"),
+        status="cancelled",
+        progress=0,
+        current_step="cancelled"
+    )
+    if record is None:
+        return await task_store.get(task_id)
+    
+    await job_scheduler.cancel(task_id)
+    task_journal.record_finished(task_id, "cancelled", {})
+    # Checkpoint worker khud hatata hai (status "cancelled" dekh kar) - external
+    # worker mode mein checkpoint usi process ke saver mein hota hai
+    return record
+
+
+# Fire-and-forget tasks ka reference rakhna zaroori hai (warna GC cancel kar sakta hai)
+_background_tasks: set = set()
+
+
+def spawn_background(coro):
+    """Background asyncio task start karo aur complete hone tak reference rakho"""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+
+async def build_derivatives(task_id: str, image_id: str):
+    """Post-generation stage: thumbnails/WebP/AVIF + placeholder"""
+    manifest = await derivative_pipeline.process(image_id)
+    if manifest:
+        await task_store.update(task_id, placeholder=manifest.get("placeholder"))
+
+
+# Node transitions -> task store (status stream subscribers tak chhota patch jata hai)
+
+async def _report_node_progress(task_id: str, node: str, update: Dict, progress: Dict):
+    await task_store.update(
+        task_id,
+        if_status=("running",),
+        current_step=node,
+        iteration=progress["iteration"],
+        progress=progress["progress"],
+        step_seconds=progress["step_seconds"],
+        elapsed_seconds=progress["elapsed_seconds"],
+        estimated_finish_at=time.time() + progress["remaining_seconds"]
+    )
+
+
+node_listeners.append(_report_node_progress)
+
+
+# Task Journal (crash recovery)
+
+async def _journal_node_transition(task_id: str, node: str, update: Dict, progress: Dict):
+    task_journal.record_node(task_id, node, update)
+
+
+node_listeners.append(_journal_node_transition)
+
+
+async def recover_journal_tasks() -> Dict[str, int]:
+    """
+    Startup par journal ke unfinished tasks recover karo
+    
+    - Image generate ho chuki thi: usi image ke saath complete (dobara generation nahi)
+    - JOURNAL_RECOVERY=requeue: workflow dobara chalao
+    - JOURNAL_RECOVERY=fail: failed mark karo
+    """
+    recovered = {"resumed": 0, "requeued": 0, "failed": 0}
+    
+    for entry in await task_journal.load_tasks():
+        if entry["status"] in ("completed", "failed", "cancelled"):
+            continue
+        
+        task_id = entry["task_id"]
+        params = entry["params"]
+        record = {
+            "task_id": task_id,
+            "status": "pending",
+            "progress": 0,
+            "current_step": "recovering",
+            "prompt": params["prompt"],
+            "client": params.get("client"),
+            "image_id": None,
+            "feedback": None,
+            "error": None,
+            "quality_score": None,
+            "created_at": datetime.fromtimestamp(entry["created_at"]).isoformat()
+        }
+        
+        if entry["image_id"] and await blob_store.stat(entry["image_id"]) is not None:
+            await task_store.create(task_id, {
+                **record,
+                "status": "completed",
+                "progress": 100,
+                "current_step": "recovered",
+                "image_id": entry["image_id"]
+            })
+            task_journal.record_finished(task_id, "completed", {"image_id": entry["image_id"]})
+            await checkpoint_store.discard(task_id)
+            if derivative_pipeline.enabled:
+                spawn_background(build_derivatives(task_id, entry["image_id"]))
+            recovered["resumed"] += 1
+        
+        elif task_journal.recovery_mode == "requeue" and await requeue(task_id, record, params):
+            recovered["requeued"] += 1
+        
+        else:
+            error = "Interrupted by server restart"
+            await task_store.create(task_id, {
+                **record,
+                "status": "failed",
+                "current_step": "error",
+                "error": error
+            })
+            task_journal.record_finished(task_id, "failed", {"error": error})
+            await checkpoint_store.discard(task_id)
+            recovered["failed"] += 1
+    
+    await task_journal.flush()
+    return recovered
+
+
+async def requeue(task_id: str, record: Dict, params: Dict) -> bool:
+    """Recovered task ko dobara broker mein daalo; queue full ho to False"""
+    await task_store.create(task_id, record)
+    try:
+        await job_scheduler.submit(
+            task_id,
+            params,
+            priority=params.pop("priority", 0),
+            client=params.pop("client", None)
+        )
+    except QueueFull:
+        return False
+    return True
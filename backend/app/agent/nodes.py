@@ -2,12 +2,53 @@
 LangGraph Nodes
 Har node ek specific kaam karta hai (Planning, Generation, Criticism, etc.)
 """
+import os
 import json
-from typing import Dict, Any
+import time
+import random
+import asyncio
+from typing import Dict, Any, List, Optional
 from datetime import datetime
 from .state import AgentState, NodeStatus
-from ..services.silicon_flow import silicon_flow_service
+from ..services.silicon_flow import silicon_flow_service, SiliconFlowError
 from ..services.monitor import monitor
+from ..services.retry import RetryBudget
+from ..services.blob_store import blob_store
+from .speculation import speculations
+
+
+# Ek task ke saare generator iterations milke itne upstream retries kar sakte hain
+TASK_RETRY_BUDGET = int(os.getenv("TASK_RETRY_BUDGET", "4"))
+
+# Pehle round ka estimate jab tak koi latency observe na hui ho
+GENERATION_ROUND_ESTIMATE = float(os.getenv("GENERATION_ROUND_ESTIMATE", "30"))
+
+# Best-of-N: ek round mein zyada se zyada itne candidates (request `candidates`)
+MAX_CANDIDATES = int(os.getenv("MAX_CANDIDATES", "4"))
+
+# Request `candidate_concurrency` na de to ek round ke itne candidates saath chalte hain
+CANDIDATE_CONCURRENCY = int(os.getenv("CANDIDATE_CONCURRENCY", "4"))
+
+
+def remaining_budget(state: AgentState) -> Optional[float]:
+    """Deadline tak bache seconds (None = koi deadline nahi)"""
+    deadline_at = state.get("deadline_at")
+    if deadline_at is None:
+        return None
+    return deadline_at - time.time()
+
+
+def fits_another_round(state: AgentState) -> bool:
+    """Kya bacha hua budget ek aur generation round ke liye kaafi hai"""
+    remaining = remaining_budget(state)
+    if remaining is None:
+        return True
+    
+    estimate = state.get("round_seconds")
+    if estimate is None:
+        latency = silicon_flow_service.latency
+        estimate = latency.percentile(0.5) if len(latency) else GENERATION_ROUND_ESTIMATE
+    return remaining >= estimate
 
 
 async def planner_node(state: AgentState) -> Dict[str, Any]:
@@ -68,46 +109,56 @@ async def generator_node(state: AgentState) -> Dict[str, Any]:
     """
     Step 2: Actual image generation
     
-    SiliconFlow API use karke image banata hai
+    SiliconFlow API use karke image banata hai. `candidates` > 1 ho to us round
+    ke saare candidates parallel bante hain (best-of-N); critic sabko score karta hai.
     """
+    retry_budget = RetryBudget(TASK_RETRY_BUDGET - state.get("retry_count", 0))
+    timeout = remaining_budget(state)
+    started = time.monotonic()
+    
     try:
         print(f"🎨 Generator: Creating image...")
         
+        if timeout is not None and timeout <= 0:
+            raise TimeoutError("Deadline exceeded before generation")
+        
         prompt = state.get("optimized_prompt") or state["original_prompt"]
         
         # Validate prompt
         if not silicon_flow_service.validate_prompt(prompt):
             raise ValueError("Invalid or inappropriate prompt")
         
-        # Generation parameters
-        params = {
-            "width": 1024,
-            "height": 1024,
-            "num_inference_steps": 30,
-            "guidance_scale": 7.5
-        }
+        params = generation_params()
         
-        # Generate image
-        result = await silicon_flow_service.generate_image(
-            prompt=prompt,
-            **params
-        )
+        # Critic ke dauraan is round ka pehla candidate ban chuka ho to wahi use karo
+        speculative = await speculations.take(state["task_id"], state.get("iteration_count", 0))
         
-        # Monitor logging
-        if monitor.enabled:
-            monitor.log_generation(
-                trace_id=state["task_id"],
-                name="image_generation",
-                prompt=prompt,
-                output="Image generated successfully",
-                metadata=params
-            )
+        # Best-of-N: har candidate ka alag seed, saare parallel (concurrency cap ke andar)
+        seeds = candidate_seeds(state)
+        if speculative is not None:
+            seeds = seeds[1:]
+        slots = asyncio.Semaphore(state.get("candidate_concurrency") or CANDIDATE_CONCURRENCY)
+        results = await asyncio.gather(
+            *(generate_candidate(state, prompt, params, seed, retry_budget, slots) for seed in seeds),
+            return_exceptions=True
+        )
+        if speculative is not None:
+            results = [speculative, *results]
+        candidates = [result for result in results if not isinstance(result, BaseException)]
+        if not candidates:
+            raise results[0]
+        if len(candidates) < len(results):
+            print(f"⚠️ Generator: {len(results) - len(candidates)}/{len(results)} candidates failed")
         
-        print(f"✅ Generator: Image created successfully")
+        print(f"✅ Generator: {len(candidates)} image(s) created successfully")
         
+        image_id, candidate_params = candidates[0]
         return {
-            "generated_image": result["image"],
-            "generation_params": params,
+            "generated_image_id": image_id,
+            "candidate_image_ids": [candidate_id for candidate_id, _ in candidates],
+            "generation_params": candidate_params,
+            "retry_count": state.get("retry_count", 0) + retry_budget.spent,
+            "round_seconds": time.monotonic() - started,
             "current_node": "generator",
             "node_status": NodeStatus.COMPLETED
         }
@@ -121,13 +172,131 @@ async def generator_node(state: AgentState) -> Dict[str, Any]:
                 error_message=f"Generation failed: {str(e)}"
             )
         
+        # Regeneration fail hui lekin pehle wali image hai: wahi final result
+        # (pichle round ke candidates clear, taake critic unhe dobara score na kare)
+        if state.get("best_image_id"):
+            return {
+                "generated_image_id": None,
+                "candidate_image_ids": None,
+                "retry_count": state.get("retry_count", 0) + retry_budget.spent,
+                "should_regenerate": False,
+                "current_node": "generator",
+                "node_status": NodeStatus.COMPLETED,
+                "error_message": f"Regeneration failed, keeping best image: {str(e)}"
+            }
+        
+        # Koi image nahi: fatal error (e.g. 400) dobara try karne se theek nahi hota,
+        # aur retryable errors ke retries generate_image pehle hi kar chuka hai
+        if isinstance(e, SiliconFlowError) and not e.retryable:
+            error_message = f"Generation failed (non-retryable): {str(e)}"
+        else:
+            error_message = f"Generation failed: {str(e)}"
         return {
+            "retry_count": state.get("retry_count", 0) + retry_budget.spent,
+            "should_regenerate": False,
             "current_node": "generator",
             "node_status": NodeStatus.FAILED,
-            "error_message": f"Generation failed: {str(e)}"
+            "error_message": error_message
         }
 
 
+def generation_params() -> Dict[str, Any]:
+    """Generation parameters (seed candidate-wise alag se lagta hai)"""
+    return {
+        "width": 1024,
+        "height": 1024,
+        "num_inference_steps": 30,
+        "guidance_scale": 7.5
+    }
+
+
+def start_speculation(state: AgentState):
+    """
+    Critic score kare tab tak agle round ka pehla candidate background mein
+    
+    Sirf tab jab agla round mumkin ho (iterations aur deadline budget). Cost cap
+    SpeculationRegistry mein hai; speculative call retries nahi karti.
+    """
+    next_iteration = state.get("iteration_count", 0) + 1
+    if next_iteration >= state.get("max_iterations", 1) or not fits_another_round(state):
+        return
+    
+    next_state = {**state, "iteration_count": next_iteration}
+    prompt = state.get("optimized_prompt") or state["original_prompt"]
+    speculations.start(
+        state["task_id"],
+        next_iteration,
+        generate_candidate(
+            next_state,
+            prompt,
+            generation_params(),
+            candidate_seeds(next_state)[0],
+            RetryBudget(0),
+            asyncio.Semaphore(1)
+        )
+    )
+
+
+def candidate_seeds(state: AgentState) -> List[Optional[int]]:
+    """
+    Is round ke candidates ke seeds
+    
+    Fixed seed ho to har iteration/candidate naya (lekin deterministic) seed leta
+    hai. Seed ke bina single candidate upstream par random rehta hai; multiple
+    candidates ko distinct seeds chahiye warna cache / coalescing sabko ek hi
+    image de dega.
+    """
+    count = max(1, min(state.get("candidates") or 1, MAX_CANDIDATES))
+    base = state.get("seed")
+    if base is None:
+        if count == 1:
+            return [None]
+        first = random.randrange(2**31 - MAX_CANDIDATES)
+    else:
+        first = base + state.get("iteration_count", 0) * count
+    return [first + index for index in range(count)]
+
+
+async def generate_candidate(
+    state: AgentState,
+    prompt: str,
+    params: Dict[str, Any],
+    seed: Optional[int],
+    retry_budget: RetryBudget,
+    slots: asyncio.Semaphore
+) -> tuple:
+    """Ek candidate generate karke blob store mein rakho -> (image_id, params)"""
+    params = dict(params) if seed is None else {**params, "seed": seed}
+    
+    async with slots:
+        # Slot ka wait bhi deadline mein count hota hai
+        timeout = remaining_budget(state)
+        if timeout is not None and timeout <= 0:
+            raise TimeoutError("Deadline exceeded before generation")
+        
+        result = await silicon_flow_service.generate_image(
+            prompt=prompt,
+            use_cache=state.get("use_cache", False),
+            retry_budget=retry_budget,
+            timeout=timeout,
+            **params
+        )
+    
+    # Monitor logging
+    if monitor.enabled:
+        monitor.log_generation(
+            trace_id=state["task_id"],
+            name="image_generation",
+            prompt=prompt,
+            output="Image generated successfully",
+            metadata=params
+        )
+    
+    # Raw bytes blob store mein; state mein sirf ID
+    image_id = await blob_store.put(result["image_bytes"], result["content_type"])
+    return image_id, params
+
+
 async def critic_node(state: AgentState) -> Dict[str, Any]:
     """
     Step 3: Generated image ki quality check
@@ -137,9 +306,38 @@ async def critic_node(state: AgentState) -> Dict[str, Any]:
     try:
         print(f"🔍 Critic: Analyzing image quality...")
         
-        # Simple quality checks
+        # Score karne ko koi image nahi (generation fail hui): failure hi final hai
+        if not state.get("generated_image_id") and not state.get("best_image_id"):
+            return {
+                "should_regenerate": False,
+                "current_node": "critic",
+                "node_status": NodeStatus.FAILED
+            }
+        
+        # Is round mein nayi image nahi bani (regeneration fail): best image hi final,
+        # generator ka "aur round nahi" decision yahan palatna nahi
+        if not state.get("generated_image_id"):
+            speculations.discard(state["task_id"])
+            return {
+                "should_regenerate": False,
+                "current_node": "critic",
+                "node_status": NodeStatus.COMPLETED
+            }
+        
+        # Speculative mode: agle round ki generation scoring ke saath overlap
+        if state.get("speculative"):
+            start_speculation(state)
+        
+        # Simple quality checks (best-of-N: har candidate, sabse acha wala aage)
         # Production mein yahan vision model use kar sakte hain
-        quality_score, feedback, issues = analyze_image_quality(state)
+        candidate_ids = state.get("candidate_image_ids") or [state.get("generated_image_id")]
+        candidate_scores = {}
+        image_id, quality_score, feedback, issues = None, None, None, None
+        for candidate_id in candidate_ids:
+            score, candidate_feedback, candidate_issues = analyze_image_quality({**state, "generated_image_id": candidate_id})
+            candidate_scores[candidate_id] = score
+            if quality_score is None or score > quality_score:
+                image_id, quality_score, feedback, issues = candidate_id, score, candidate_feedback, candidate_issues
         
         # Log feedback
         if monitor.enabled:
@@ -149,17 +347,35 @@ async def critic_node(state: AgentState) -> Dict[str, Any]:
                 comment=feedback
             )
         
+        # Best-so-far track karo (deadline par ya last round kharab ho to yahi jati hai)
+        best_image_id = state.get("best_image_id")
+        best_quality_score = state.get("best_quality_score")
+        if best_quality_score is None or quality_score > best_quality_score:
+            best_image_id = image_id
+            best_quality_score = quality_score
+        
         should_regenerate = quality_score < 0.7 and state["iteration_count"] < state["max_iterations"]
         
-        if should_regenerate:
+        if should_regenerate and not fits_another_round(state):
+            print(f"⏱️ Critic: Quality score {quality_score:.2f} - No budget for another round")
+            should_regenerate = False
+        elif should_regenerate:
             print(f"⚠️ Critic: Quality score {quality_score:.2f} - Regeneration needed")
         else:
             print(f"✅ Critic: Quality score {quality_score:.2f} - Acceptable")
         
+        if not should_regenerate:
+            # Agla round nahi hoga: speculative generation turant band
+            speculations.discard(state["task_id"])
+        
         return {
+            "generated_image_id": image_id,
+            "candidate_scores": candidate_scores if len(candidate_ids) > 1 else None,
             "quality_score": quality_score,
             "feedback": feedback,
             "issues_found": issues,
+            "best_image_id": best_image_id,
+            "best_quality_score": best_quality_score,
             "should_regenerate": should_regenerate,
             "iteration_count": state["iteration_count"] + 1,
             "current_node": "critic",
@@ -236,7 +452,7 @@ def analyze_image_quality(state: AgentState) -> tuple:
     Note: Ye simple heuristic hai. Production mein CLIP ya vision model use karein.
     """
     # Check if image exists
-    if not state.get("generated_image"):
+    if not state.get("generated_image_id"):
         return (0.0, "No image generated", ["missing_image"])
     
     # Check prompt alignment
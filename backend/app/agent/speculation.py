@@ -0,0 +1,146 @@
+"""
+Speculative Generation
+Critic score kar raha ho tab tak agle round ki image pehle se banana shuru karo
+"""
+import os
+import asyncio
+from collections import deque
+from typing import Any, Awaitable, Dict, Optional
+
+
+# Request `speculative` na de to ye default
+SPECULATIVE_GENERATION = os.getenv("SPECULATIVE_GENERATION", "false").lower() == "true"
+
+# Cost cap: poore process mein ek waqt mein itni speculative generations
+SPECULATION_MAX_INFLIGHT = int(os.getenv("SPECULATION_MAX_INFLIGHT", "4"))
+
+# Cost cap: recent speculations mein waste ratio isse upar ho to speculation pause
+SPECULATION_MAX_WASTE_RATIO = float(os.getenv("SPECULATION_MAX_WASTE_RATIO", "0.7"))
+
+# Waste ratio kitne recent outcomes par (aur kam se kam kitne samples ke baad) lagta hai
+SPECULATION_WINDOW = 50
+SPECULATION_MIN_SAMPLES = 10
+
+# Paused hone par bhi har itne skips mein ek probe (warna ratio kabhi recover nahi hota)
+SPECULATION_PROBE_EVERY = 10
+
+
+class _Speculation:
+    """Ek task ka in-flight speculative round"""
+
+    def __init__(self, iteration: int, task: asyncio.Task):
+        self.iteration = iteration
+        self.task = task
+
+
+class SpeculationRegistry:
+    """
+    task_id -> agle round ki speculative generation
+
+    Critic start hote hi agle round ke pehle candidate (perturbed seed) ki
+    generation background mein chalti hai. Critic regenerate maange to generator
+    node wahi result `take` karta hai (used); critic accept kare, round match na
+    ho ya workflow khatam ho to turant cancel (wasted). Asyncio tasks state mein
+    nahi rakhe jate - graph state serializable rehti hai.
+    """
+
+    def __init__(self, max_inflight: int, max_waste_ratio: float):
+        self.max_inflight = max_inflight
+        self.max_waste_ratio = max_waste_ratio
+
+        self._pending: Dict[str, _Speculation] = {}
+        self._outcomes: deque = deque(maxlen=SPECULATION_WINDOW)  # True = used, False = wasted
+        self._skips = 0
+        self._stats = {
+            "started": 0,
+            "used": 0,
+            "wasted": 0,
+            "failed": 0,
+            "skipped_inflight": 0,
+            "skipped_waste": 0
+        }
+
+    def waste_ratio(self) -> Optional[float]:
+        if len(self._outcomes) < SPECULATION_MIN_SAMPLES:
+            return None
+        return self._outcomes.count(False) / len(self._outcomes)
+
+    def allowed(self) -> bool:
+        """Cost cap check (start se pehle)"""
+        inflight = sum(1 for speculation in self._pending.values() if not speculation.task.done())
+        if inflight >= self.max_inflight:
+            self._stats["skipped_inflight"] += 1
+            return False
+
+        ratio = self.waste_ratio()
+        if ratio is not None and ratio > self.max_waste_ratio:
+            self._skips += 1
+            if self._skips % SPECULATION_PROBE_EVERY:
+                self._stats["skipped_waste"] += 1
+                return False
+        return True
+
+    def start(self, task_id: str, iteration: int, coro: Awaitable) -> bool:
+        """Speculative generation background mein start karo (cap cross ho to False)"""
+        self.discard(task_id)
+        if not self.allowed():
+            coro.close()
+            return False
+
+        task = asyncio.ensure_future(coro)
+        # Cancel / consume na hui exception "never retrieved" warning na de
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self._pending[task_id] = _Speculation(iteration, task)
+        self._stats["started"] += 1
+        return True
+
+    async def take(self, task_id: str, iteration: int) -> Optional[Any]:
+        """
+        Is round ke liye speculative result (None = nahi tha ya fail hua)
+
+        Kisi aur round ki speculation ho to discard hoti hai.
+        """
+        speculation = self._pending.pop(task_id, None)
+        if speculation is None:
+            return None
+        if speculation.iteration != iteration:
+            self._wasted(speculation)
+            return None
+
+        try:
+            # Generator cancel ho (task cancel) to speculation bhi saath cancel hoti hai
+            result = await speculation.task
+        except Exception as e:
+            print(f"⚠️ Speculative generation failed, generating normally: {e}")
+            self._stats["failed"] += 1
+            return None
+
+        self._stats["used"] += 1
+        self._outcomes.append(True)
+        return result
+
+    def discard(self, task_id: str):
+        """Critic ne accept kiya / workflow khatam: speculation turant cancel"""
+        speculation = self._pending.pop(task_id, None)
+        if speculation is not None:
+            self._wasted(speculation)
+
+    def _wasted(self, speculation: _Speculation):
+        speculation.task.cancel()
+        self._stats["wasted"] += 1
+        self._outcomes.append(False)
+
+    def stats(self) -> Dict[str, Any]:
+        ratio = self.waste_ratio()
+        return {
+            "enabled_by_default": SPECULATIVE_GENERATION,
+            "pending": len(self._pending),
+            "max_inflight": self.max_inflight,
+            "waste_ratio": round(ratio, 2) if ratio is not None else None,
+            "max_waste_ratio": self.max_waste_ratio,
+            **self._stats
+        }
+
+
+# Global instance
+speculations = SpeculationRegistry(SPECULATION_MAX_INFLIGHT, SPECULATION_MAX_WASTE_RATIO)
@@ -20,25 +20,37 @@ class AgentState(TypedDict):
     """
     # User Input
     original_prompt: str
-    reference_image: Optional[str]  # Base64 encoded image (agar ho)
+    reference_image_id: Optional[str]  # Blob store handle (agar reference diya ho)
     
     # Planner Output
     optimized_prompt: Optional[str]
     prompt_analysis: Optional[Dict[str, Any]]
     
     # Generator Output
-    generated_image: Optional[str]  # Base64 encoded generated image
+    generated_image_id: Optional[str]  # Blob store ID (raw bytes blob store mein hain)
     generation_params: Optional[Dict[str, Any]]
+    seed: Optional[int]  # Base seed (fixed ho to result cacheable hai)
+    use_cache: bool
+    candidates: int  # Best-of-N: har round mein itni images parallel
+    candidate_concurrency: Optional[int]  # Ek waqt mein itne candidates (None = CANDIDATE_CONCURRENCY)
+    candidate_image_ids: Optional[List[str]]  # Is round ke successful candidates
+    speculative: bool  # Critic ke saath agle round ki generation overlap karo
     
     # Critic Output
     quality_score: Optional[float]  # 0.0 to 1.0
     feedback: Optional[str]
     issues_found: Optional[List[str]]
+    candidate_scores: Optional[Dict[str, float]]  # image_id -> score (sirf N > 1 par)
+    best_image_id: Optional[str]  # Ab tak ki sabse achi image (deadline par yahi return hoti hai)
+    best_quality_score: Optional[float]
     
     # Workflow Control
     iteration_count: int
     max_iterations: int
+    retry_count: int  # Upstream retries used (per-task budget)
     should_regenerate: bool
+    deadline_at: Optional[float]  # Epoch seconds; is waqt tak result chahiye
+    round_seconds: Optional[float]  # Last generation round ki duration (budget estimate)
     
     # Status Tracking
     current_node: str
@@ -57,6 +69,6 @@ class TaskStatus(TypedDict):
     status: str
     progress: int  # 0-100
     current_step: str
-    generated_image: Optional[str]
+    image_url: Optional[str]
     error: Optional[str]
     feedback: Optional[str]
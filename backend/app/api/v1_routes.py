@@ -2,16 +2,37 @@
 FastAPI Routes (v1)
 Frontend se connect karne ke liye REST API endpoints
 """
+import os
+import json
 import uuid
+import time
+import base64
 import asyncio
-from typing import Dict, Optional
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 from datetime import datetime
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+import binascii
+from fastapi import APIRouter, HTTPException, Request, Query
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from pydantic import BaseModel, Field
+from starlette.datastructures import UploadFile
+from starlette.formparsers import MultiPartParser, MultiPartException
 
-from ..agent.graph import run_agent
-from ..agent.state import TaskStatus, NodeStatus
+from ..agent.graph import agent_flights, node_timings
+from ..agent.nodes import MAX_CANDIDATES
+from ..agent.speculation import speculations, SPECULATIVE_GENERATION
+from ..agent.checkpoints import checkpoint_store
+from ..agent.jobs import cancel_job
 from ..services.monitor import monitor
+from ..services.cache import generation_cache
+from ..services.silicon_flow import silicon_flow_service
+from ..services.blob_store import blob_store
+from ..services.derivatives import derivative_pipeline
+from ..services.references import reference_service, ReferenceTooLarge, InvalidReferenceImage
+from ..services.task_store import task_store, TERMINAL_STATUSES
+from ..services.journal import task_journal
+from ..services.broker import QueueFull
+from ..services.scheduler import job_scheduler
+from ..services.clients import client_registry
 
 
 # Request/Response Models
@@ -19,9 +40,17 @@ from ..services.monitor import monitor
 class GenerateRequest(BaseModel):
     """Request body for /generate endpoint"""
     prompt: str = Field(..., min_length=3, max_length=1000)
-    reference_image: Optional[str] = None  # Base64 encoded
+    reference_image_id: Optional[str] = None  # /reference upload se mila handle
+    reference_image: Optional[str] = None  # Legacy: base64 encoded (prefer reference_image_id)
     max_iterations: int = Field(default=3, ge=1, le=5)
     enable_monitoring: bool = Field(default=True)
+    seed: Optional[int] = Field(default=None, ge=0)  # Fixed seed = reproducible + cacheable
+    use_cache: bool = Field(default=False)  # Seed ke bina bhi cached result allow karo
+    priority: int = Field(default=0, ge=0, le=9)  # Zyada = queue mein pehle
+    deadline_seconds: Optional[float] = Field(default=None, gt=0, le=3600)  # End-to-end budget (queue wait samet)
+    candidates: int = Field(default=1, ge=1, le=MAX_CANDIDATES)  # Best-of-N: har round mein parallel images
+    candidate_concurrency: Optional[int] = Field(default=None, ge=1, le=MAX_CANDIDATES)  # Ek waqt mein itne candidates
+    speculative: Optional[bool] = None  # Critic ke saath agla round overlap (None = SPECULATIVE_GENERATION)
 
 
 class GenerateResponse(BaseModel):
@@ -37,10 +66,47 @@ class StatusResponse(BaseModel):
     status: str
     progress: int
     current_step: str
-    generated_image: Optional[str] = None
+    image_url: Optional[str] = None
+    placeholder: Optional[str] = None  # Tiny blurred preview (data URI)
+    generated_image: Optional[str] = None  # Base64 sirf ?include_image=true par
     feedback: Optional[str] = None
     error: Optional[str] = None
     quality_score: Optional[float] = None
+    iteration: Optional[int] = None  # Current generation round (1-based)
+    step_seconds: Optional[float] = None  # Last completed node ka duration
+    elapsed_seconds: Optional[float] = None  # Workflow start se ab tak
+    queue_position: Optional[int] = None  # Pending tasks: 1 = next
+    eta_seconds: Optional[float] = None  # Estimated time to completion
+
+
+class TaskSummary(BaseModel):
+    """Listing item (image payload nahi, sirf URL)"""
+    task_id: str
+    status: str
+    progress: int
+    current_step: str
+    prompt: Optional[str] = None
+    created_at: Optional[str] = None
+    image_url: Optional[str] = None
+    placeholder: Optional[str] = None  # Sirf ?include_placeholder=true par
+    error: Optional[str] = None
+    quality_score: Optional[float] = None
+
+
+class TaskListResponse(BaseModel):
+    """Response for /tasks endpoint"""
+    tasks: List[TaskSummary]
+    next_cursor: Optional[str] = None
+
+
+class ReferenceResponse(BaseModel):
+    """Response for /reference endpoint"""
+    reference_id: str
+    content_type: str
+    width: int
+    height: int
+    size: int
+    reused: bool
 
 
 class FeedbackRequest(BaseModel):
@@ -50,23 +116,44 @@ class FeedbackRequest(BaseModel):
     comment: Optional[str] = None
 
 
-# Global storage for tasks (Production mein Redis ya Database use karein)
-tasks_store: Dict[str, dict] = {}
-
-
 # Router
 router = APIRouter(prefix="/api/v1", tags=["Agent"])
 
+# Client deadline na de to ye default budget (0 = koi deadline nahi)
+TASK_DEADLINE_SECONDS = float(os.getenv("TASK_DEADLINE_SECONDS", "300"))
+
+# /status long-poll (`?wait=`) ki upper limit (proxies ke idle timeout se kam rakhein)
+STATUS_MAX_WAIT = float(os.getenv("STATUS_MAX_WAIT", "30"))
+
 
 @router.post("/generate", response_model=GenerateResponse)
-async def generate_image(
-    request: GenerateRequest,
-    background_tasks: BackgroundTasks
-):
+async def generate_image(request: GenerateRequest, http_request: Request):
     """
     Start image generation workflow
     
-    Returns task_id immediately and runs generation in background
+    Returns task_id immediately; job scheduler queue se worker pool chalata hai.
+    Queue full ho ya client apne quota par ho to 429 + Retry-After.
+    """
+    # Caller identity (registered API key / IP) - fair share aur quotas isi par
+    task_id = await submit_generation(
+        request,
+        client_registry.identify(http_request),
+        client_label=client_registry.label(http_request)
+    )
+    
+    return GenerateResponse(
+        task_id=task_id,
+        status="accepted",
+        message="Image generation queued. Use /status endpoint to check progress."
+    )
+
+
+async def submit_generation(request: GenerateRequest, client: str, client_label: Optional[str] = None) -> str:
+    """
+    Task create karke job queue mein daalo (REST aur WebSocket dono yahi use karte hain)
+    
+    client quota identity hai; client_label (X-Client-ID) sirf record mein jata hai.
+    Returns task_id; errors HTTPException ke roop mein (429 with Retry-After, 400, 500).
     """
     try:
         # Generate unique task ID
@@ -79,18 +166,35 @@ async def generate_image(
                 detail="Prompt must be at least 3 characters long"
             )
         
+        # Admission control: saturated ho to kaam shuru karne se pehle hi reject
+        try:
+            await job_scheduler.admit(client)
+        except QueueFull as e:
+            raise queue_full_error(e)
+        
+        # Reference image: sirf handle graph mein jata hai
+        reference_image_id = await resolve_reference(request)
+        
+        # Deadline absolute epoch mein (API aur worker processes dono samajh sakein)
+        deadline_seconds = request.deadline_seconds or TASK_DEADLINE_SECONDS
+        deadline_at = time.time() + deadline_seconds if deadline_seconds > 0 else None
+        
         # Initialize task in store
-        tasks_store[task_id] = {
+        await task_store.create(task_id, {
             "task_id": task_id,
             "status": "pending",
             "progress": 0,
             "current_step": "initializing",
-            "generated_image": None,
+            "prompt": request.prompt,
+            "client": client,
+            "client_label": client_label,
+            "image_id": None,
             "feedback": None,
             "error": None,
             "quality_score": None,
+            "deadline_at": deadline_at,
             "created_at": datetime.now().isoformat()
-        }
+        })
         
         # Create monitoring trace
         if request.enable_monitoring and monitor.enabled:
@@ -99,24 +203,34 @@ async def generate_image(
                 metadata={
                     "task_id": task_id,
                     "prompt": request.prompt,
-                    "max_iterations": request.max_iterations
+                    "max_iterations": request.max_iterations,
+                    "candidates": request.candidates
                 }
             )
         
-        # Run agent in background
-        background_tasks.add_task(
-            execute_agent_workflow,
-            task_id=task_id,
-            prompt=request.prompt,
-            reference_image=request.reference_image,
-            max_iterations=request.max_iterations
-        )
+        # Queue for the worker pool (inline ya external workers)
+        params = {
+            "prompt": request.prompt,
+            "reference_image_id": reference_image_id,
+            "max_iterations": request.max_iterations,
+            "seed": request.seed,
+            "use_cache": request.use_cache,
+            "deadline_at": deadline_at,
+            "candidates": request.candidates,
+            "candidate_concurrency": request.candidate_concurrency,
+            "speculative": SPECULATIVE_GENERATION if request.speculative is None else request.speculative
+        }
+        try:
+            await job_scheduler.submit(task_id, params, priority=request.priority, client=client)
+        except QueueFull as e:
+            await task_store.delete(task_id)
+            raise queue_full_error(e)
         
-        return GenerateResponse(
-            task_id=task_id,
-            status="accepted",
-            message="Image generation started. Use /status endpoint to check progress."
-        )
+        # Inline mode: queued jobs bhi crash recovery ke liye journal karo
+        if job_scheduler.consuming:
+            task_journal.record_created(task_id, {**params, "priority": request.priority, "client": client})
+        
+        return task_id
         
     except HTTPException:
         raise
@@ -124,30 +238,468 @@ async def generate_image(
         raise HTTPException(status_code=500, detail=f"Failed to start generation: {str(e)}")
 
 
+def queue_full_error(error: QueueFull) -> HTTPException:
+    """QueueFull -> 429 with Retry-After"""
+    return HTTPException(
+        status_code=429,
+        detail=str(error),
+        headers={"Retry-After": str(int(error.retry_after))}
+    )
+
+
+async def resolve_reference(request: GenerateRequest) -> Optional[str]:
+    """GenerateRequest ke reference (handle ya legacy base64) ko blob handle mein badalta hai"""
+    if request.reference_image_id:
+        if await blob_store.stat(request.reference_image_id) is None:
+            raise HTTPException(status_code=400, detail="Unknown reference_image_id")
+        return request.reference_image_id
+    
+    if request.reference_image:
+        encoded = request.reference_image
+        if encoded.startswith("data:"):
+            encoded = encoded.partition(",")[2]
+        try:
+            data = base64.b64decode(encoded, validate=True)
+            result = await reference_service.ingest_bytes(data)
+        except (binascii.Error, ValueError) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid reference_image: {e}")
+        except ReferenceTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        return result["reference_id"]
+    
+    return None
+
+
+@router.post("/reference", response_model=ReferenceResponse)
+async def upload_reference(request: Request):
+    """
+    Upload a reference image (streaming)
+    
+    multipart/form-data (field: file) ya raw image/* body accept karta hai.
+    Body stream hote waqt size limit enforce hoti hai, bade uploads disk par
+    spool hote hain, aur validate/downscale worker thread mein hota hai.
+    Returned reference_id /generate mein reference_image_id ke taur par bhejein.
+    """
+    content_type = request.headers.get("content-type", "")
+    stream = reference_service.limit_stream(request.stream(), request.headers.get("content-length"))
+    
+    try:
+        if content_type.startswith("multipart/form-data"):
+            form = await MultiPartParser(request.headers, stream, max_files=1, max_fields=10).parse()
+            upload = form.get("file")
+            if not isinstance(upload, UploadFile):
+                raise HTTPException(status_code=400, detail="Multipart field 'file' is required")
+            try:
+                result = await reference_service.ingest_file(upload.file)
+            finally:
+                await upload.close()
+        elif content_type.startswith("image/") or content_type.startswith("application/octet-stream"):
+            result = await reference_service.ingest_stream(stream)
+        else:
+            raise HTTPException(status_code=415, detail="Send multipart/form-data or an image/* body")
+    except ReferenceTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except (InvalidReferenceImage, MultiPartException) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return ReferenceResponse(**result)
+
+
 @router.get("/status/{task_id}", response_model=StatusResponse)
-async def get_task_status(task_id: str):
+async def get_task_status(
+    task_id: str,
+    request: Request,
+    response: Response,
+    include_image: bool = False,
+    wait: float = Query(default=0, ge=0, le=STATUS_MAX_WAIT)
+):
     """
     Get current status of a generation task
     
-    Returns real-time progress and result
+    Returns real-time progress and result. Image `image_url` se milti hai;
+    legacy clients ke liye include_image=true base64 inline karta hai.
+    
+    ETag task ka version hai: `If-None-Match` same ho to 304 (body nahi). Saath
+    mein `?wait=N` ho to request N seconds tak hold hoti hai jab tak version na
+    badle (long-poll); timeout par bhi 304.
     """
-    if task_id not in tasks_store:
+    known_version = etag_version(request.headers.get("if-none-match"), include_image)
+    
+    task_data = await task_store.get(task_id)
+    if (
+        task_data is not None
+        and wait > 0
+        and task_data.get("version", 0) == known_version
+        and task_data["status"] not in TERMINAL_STATUSES
+    ):
+        task_data = await task_store.wait_for_change(task_id, known_version, wait)
+    if task_data is None:
         raise HTTPException(status_code=404, detail="Task not found")
     
-    task_data = tasks_store[task_id]
+    etag = status_etag(task_data.get("version", 0), include_image)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if task_data.get("version", 0) == known_version:
+        return Response(status_code=304, headers=headers)
+    
+    response.headers.update(headers)
+    return await build_status(task_data, include_image)
+
+
+def status_etag(version: int, include_image: bool) -> str:
+    # Weak: queue_position / eta_seconds version badle bina bhi badal sakte hain
+    return f'W/"{version}{"-image" if include_image else ""}"'
+
+
+def etag_version(if_none_match: Optional[str], include_image: bool) -> Optional[int]:
+    """If-None-Match mein is representation ka version (warna None)"""
+    if not if_none_match:
+        return None
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        tag = tag.strip('"')
+        if include_image != tag.endswith("-image"):
+            continue
+        try:
+            return int(tag.removesuffix("-image"))
+        except ValueError:
+            continue
+    return None
+
+
+async def build_status(task_data: Dict, include_image: bool = False) -> StatusResponse:
+    """Task record -> StatusResponse (queue position / ETA samet)"""
+    task_id = task_data["task_id"]
+    image_id = task_data.get("image_id")
+    
+    queue_position, eta_seconds = None, None
+    if task_data["status"] in ("pending", "running"):
+        running = task_data["status"] == "running"
+        queue_position, eta_seconds = await job_scheduler.estimate(
+            task_id,
+            task_data.get("started_at") if running else None,
+            task_data.get("estimated_finish_at") if running else None
+        )
+    
+    generated_image = None
+    if include_image and image_id:
+        image_bytes = await blob_store.get(image_id)
+        if image_bytes is not None:
+            generated_image = base64.b64encode(image_bytes).decode()
     
     return StatusResponse(
         task_id=task_data["task_id"],
         status=task_data["status"],
         progress=task_data["progress"],
         current_step=task_data["current_step"],
-        generated_image=task_data.get("generated_image"),
+        image_url=image_url_for(image_id),
+        placeholder=task_data.get("placeholder"),
+        generated_image=generated_image,
         feedback=task_data.get("feedback"),
         error=task_data.get("error"),
-        quality_score=task_data.get("quality_score")
+        quality_score=task_data.get("quality_score"),
+        iteration=task_data.get("iteration"),
+        step_seconds=task_data.get("step_seconds"),
+        elapsed_seconds=task_data.get("elapsed_seconds"),
+        queue_position=queue_position,
+        eta_seconds=eta_seconds
+    )
+
+
+# Status stream (SSE)
+
+# Idle connection par itne seconds mein heartbeat + store resync
+STATUS_STREAM_HEARTBEAT = float(os.getenv("STATUS_STREAM_HEARTBEAT", "15"))
+
+# Patches mein se sirf yahi fields client tak jati hain
+STREAM_FIELDS = (
+    "status", "progress", "current_step", "iteration", "step_seconds", "elapsed_seconds",
+    "error", "feedback", "quality_score", "placeholder"
+)
+
+
+@router.get("/status/{task_id}/stream")
+async def stream_task_status(task_id: str, request: Request):
+    """
+    Server-Sent Events: task ke har node transition / progress par push
+    
+    Events:
+    - `status`: poora StatusResponse (connect, resync aur pending mein heartbeat par)
+    - `progress`: sirf badle hue fields (planner, generator, critic, iteration n)
+    - `done`: final StatusResponse (image_url / error) - iske baad stream band
+    
+    Event ID task ka version hai; reconnect par `Last-Event-ID` same ho to
+    snapshot dobara nahi bheja jata, warna current state se resume hota hai.
+    """
+    if not await task_store.exists(task_id):
+        raise HTTPException(status_code=404, detail="Task not found")
+    
+    return StreamingResponse(
+        status_events(task_id, request.headers.get("last-event-id")),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def sse_event(event: str, data: Dict, event_id: Optional[int] = None) -> str:
+    """Ek SSE frame"""
+    frame = f"id: {event_id}\n" if event_id is not None else ""
+    return frame + f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def snapshot_event(record: Dict) -> str:
+    """Poora state: terminal task ke liye `done`, warna `status`"""
+    event = "done" if record["status"] in TERMINAL_STATUSES else "status"
+    status = await build_status(record)
+    return sse_event(event, status.model_dump(), record.get("version", 0))
+
+
+async def status_events(task_id: str, last_event_id: Optional[str]):
+    """SSE frames jab tak task terminal na ho ya client disconnect na kare"""
+    yield "retry: 3000\n\n"
+    
+    async for kind, version, payload in task_updates(task_id, resume_version=last_event_id):
+        if kind == "snapshot":
+            yield await snapshot_event(payload)
+        elif kind == "patch":
+            yield sse_event("progress", {"task_id": task_id, **payload}, version)
+        elif kind == "heartbeat":
+            yield ": heartbeat\n\n"
+        else:
+            yield sse_event("error", {"detail": "Task not found"})
+
+
+async def task_updates(
+    task_id: str,
+    resume_version: Optional[str] = None,
+    heartbeat: Optional[float] = None
+) -> AsyncIterator[Tuple[str, Optional[int], Optional[Dict]]]:
+    """
+    Ek task ke updates (SSE aur WebSocket dono ka source)
+    
+    Yields (kind, version, payload):
+    - ("snapshot", v, record): connect par, resync mein version badla ho, pending
+      task ke heartbeat par, aur terminal state par (uske baad iterator khatam)
+    - ("patch", v, fields): STREAM_FIELDS mein se badle hue fields (+ node transition par eta_seconds)
+    - ("heartbeat", v, None): idle interval, kuch nahi badla
+    - ("missing", None, None): task exist nahi karta / delete ho gaya
+    
+    resume_version current version ke barabar ho to pehla snapshot skip hota hai.
+    """
+    heartbeat = heartbeat or STATUS_STREAM_HEARTBEAT
+    events = task_store.subscribe(task_id)
+    # Subscription snapshot se pehle register ho; beech mein miss hua patch heartbeat resync pakad leta hai
+    next_patch = asyncio.ensure_future(events.__anext__())
+    await asyncio.sleep(0)
+    
+    try:
+        record = await task_store.get(task_id)
+        if record is None:
+            yield "missing", None, None
+            return
+        version = record.get("version", 0)
+        terminal = record["status"] in TERMINAL_STATUSES
+        
+        # Reconnect: client ke paas yahi version hai to snapshot dobara mat bhejo
+        if terminal or str(version) != resume_version:
+            yield "snapshot", version, record
+        if terminal:
+            return
+        
+        while True:
+            done, _ = await asyncio.wait({next_patch}, timeout=heartbeat)
+            
+            if not done:
+                # Heartbeat + resync (miss hue patches, pending task ki queue position)
+                record = await task_store.get(task_id)
+                if record is None:
+                    yield "missing", None, None
+                    return
+                if record.get("version", 0) != version or record["status"] == "pending" or record["status"] in TERMINAL_STATUSES:
+                    version = record.get("version", 0)
+                    yield "snapshot", version, record
+                    if record["status"] in TERMINAL_STATUSES:
+                        return
+                else:
+                    yield "heartbeat", version, None
+                continue
+            
+            patch = next_patch.result()
+            next_patch = asyncio.ensure_future(events.__anext__())
+            if patch.get("version", 0) <= version:
+                continue  # Snapshot mein pehle hi aa chuka
+            version = patch["version"]
+            
+            if patch.get("status") in TERMINAL_STATUSES:
+                record = await task_store.get(task_id)
+                if record is None:
+                    yield "missing", None, None
+                else:
+                    yield "snapshot", version, record
+                return
+            
+            fields = {name: patch[name] for name in STREAM_FIELDS if name in patch}
+            if patch.get("estimated_finish_at") is not None:
+                # Node transition ka ETA (historical node durations se)
+                fields["eta_seconds"] = round(max(0.0, patch["estimated_finish_at"] - time.time()), 1)
+            if fields:
+                yield "patch", version, fields
+    
+    finally:
+        next_patch.cancel()
+        try:
+            await next_patch
+        except BaseException:
+            pass
+        await events.aclose()
+
+
+@router.get("/tasks", response_model=TaskListResponse)
+async def list_tasks(
+    status: Optional[str] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    prompt: Optional[str] = Query(default=None, min_length=1, max_length=200),
+    limit: int = Query(default=50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    include_placeholder: bool = False
+):
+    """
+    List tasks (newest first) with filters and cursor pagination
+    
+    Store ke secondary indexes (status, created_at) use hote hain, isliye
+    serving path par full scan nahi hota. Agla page: ?cursor=<next_cursor>
+    """
+    try:
+        records, next_cursor = await task_store.list_tasks(
+            status=status,
+            created_after=created_after.timestamp() if created_after else None,
+            created_before=created_before.timestamp() if created_before else None,
+            prompt_contains=prompt,
+            limit=limit,
+            cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return TaskListResponse(
+        tasks=[
+            TaskSummary(
+                task_id=record["task_id"],
+                status=record["status"],
+                progress=record.get("progress", 0),
+                current_step=record.get("current_step", ""),
+                prompt=record.get("prompt"),
+                created_at=record.get("created_at"),
+                image_url=image_url_for(record.get("image_id")),
+                placeholder=record.get("placeholder") if include_placeholder else None,
+                error=record.get("error"),
+                quality_score=record.get("quality_score")
+            )
+            for record in records
+        ],
+        next_cursor=next_cursor
     )
 
 
+def image_url_for(image_id: Optional[str]) -> Optional[str]:
+    """Blob ID ka public URL"""
+    return f"{router.prefix}/image/{image_id}" if image_id else None
+
+
+def _parse_range(range_header: str, size: int) -> Optional[tuple]:
+    """
+    Single 'bytes=start-end' range parse karta hai
+    
+    Returns (start, end) inclusive, ya None agar range unsatisfiable/unsupported ho
+    """
+    if not range_header.startswith("bytes=") or "," in range_header:
+        return None
+    
+    start_text, _, end_text = range_header[len("bytes="):].strip().partition("-")
+    try:
+        if start_text == "":
+            # Suffix range: last N bytes
+            length = int(end_text)
+            if length <= 0:
+                return None
+            return max(0, size - length), size - 1
+        
+        start = int(start_text)
+        end = int(end_text) if end_text else size - 1
+    except ValueError:
+        return None
+    
+    if start >= size or start > end:
+        return None
+    return start, min(end, size - 1)
+
+
+@router.get("/image/{image_id}")
+async def get_image(image_id: str, request: Request, size: Optional[int] = None):
+    """
+    Serve raw image bytes by content hash
+    
+    Content-addressed hai, isliye strong ETag + immutable caching safe hai.
+    Range requests (206) bhi supported hain. Derivatives ready hon to
+    Accept header (AVIF/WebP) aur ?size= ke hisaab se variant serve hota hai.
+    """
+    headers = {
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "Accept-Ranges": "bytes"
+    }
+    
+    if derivative_pipeline.enabled:
+        manifest = await blob_store.get_meta(image_id, "derivatives")
+        if manifest:
+            headers["Vary"] = "Accept"
+            variant_id = derivative_pipeline.select(manifest, request.headers.get("accept", ""), size)
+            if variant_id:
+                image_id = variant_id
+    
+    info = await blob_store.stat(image_id)
+    if info is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+    
+    etag = f'"{info.blob_id}"'
+    headers["ETag"] = etag
+    
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in [t.strip() for t in if_none_match.split(",")]):
+        return Response(status_code=304, headers=headers)
+    
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (not if_range or if_range.strip() == etag):
+        byte_range = _parse_range(range_header, info.size)
+        if byte_range is None:
+            return Response(
+                status_code=416,
+                headers={**headers, "Content-Range": f"bytes */{info.size}"}
+            )
+        
+        start, end = byte_range
+        chunk = await blob_store.read_range(image_id, start, end)
+        if chunk is None:
+            raise HTTPException(status_code=404, detail="Image not found")
+        
+        return Response(
+            content=chunk,
+            status_code=206,
+            media_type=info.content_type,
+            headers={**headers, "Content-Range": f"bytes {start}-{end}/{info.size}"}
+        )
+    
+    if info.path:
+        return FileResponse(info.path, media_type=info.content_type, headers=headers)
+    
+    image_bytes = await blob_store.get(image_id)
+    if image_bytes is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+    return Response(content=image_bytes, media_type=info.content_type, headers=headers)
+
+
 @router.post("/feedback")
 async def submit_feedback(request: FeedbackRequest):
     """
@@ -155,7 +707,7 @@ async def submit_feedback(request: FeedbackRequest):
     
     Logs feedback to monitoring system
     """
-    if request.task_id not in tasks_store:
+    if not await task_store.exists(request.task_id):
         raise HTTPException(status_code=404, detail="Task not found")
     
     # Log to Langfuse
@@ -172,93 +724,58 @@ async def submit_feedback(request: FeedbackRequest):
     }
 
 
+@router.post("/task/{task_id}/cancel")
+async def cancel_task(task_id: str):
+    """
+    Cancel a queued or running task
+    
+    Queued job queue se nikal jata hai; running job ka graph aur in-flight
+    upstream request abort hote hain. Finished tasks par 409.
+    """
+    record = await cancel_job(task_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    if record["status"] != "cancelled":
+        raise HTTPException(status_code=409, detail=f"Task already {record['status']}")
+    
+    return {"message": "Task cancelled", "task_id": task_id, "status": record["status"]}
+
+
 @router.delete("/task/{task_id}")
 async def delete_task(task_id: str):
-    """Delete a task from storage"""
-    if task_id not in tasks_store:
+    """Cancel (agar abhi chal raha ho) aur storage se delete"""
+    if await cancel_job(task_id) is None:
         raise HTTPException(status_code=404, detail="Task not found")
     
-    del tasks_store[task_id]
-    
+    await task_store.delete(task_id)
     return {"message": "Task deleted successfully"}
 
 
 @router.get("/health")
 async def health_check():
     """Health check endpoint"""
+    task_stats = await task_store.stats()
+    
     return {
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
-        "active_tasks": len(tasks_store)
+        "active_tasks": task_stats["count"],
+        "tasks": task_stats,
+        "generation_cache": generation_cache.stats(),
+        "derivatives": derivative_pipeline.stats(),
+        "references": reference_service.stats(),
+        "upstream_limiter": silicon_flow_service.limiter.stats(),
+        "upstream_retries": {
+            **silicon_flow_service.retry_stats,
+            "latency": silicon_flow_service.latency.stats()
+        },
+        "coalescing": {
+            "upstream": silicon_flow_service.flights.stats(),
+            "agent": agent_flights.stats()
+        },
+        "journal": task_journal.stats(),
+        "node_timings": node_timings.stats(),
+        "speculation": speculations.stats(),
+        "checkpoints": checkpoint_store.stats(),
+        "scheduler": await job_scheduler.stats()
     }
-
-
-# Background Task Execution
-
-async def execute_agent_workflow(
-    task_id: str,
-    prompt: str,
-    reference_image: Optional[str],
-    max_iterations: int
-):
-    """
-    Execute the complete agent workflow in background
-    
-    Updates task status as workflow progresses
-    """
-    try:
-        # Update status: running
-        tasks_store[task_id].update({
-            "status": "running",
-            "progress": 10,
-            "current_step": "planning"
-        })
-        
-        # Run the agent
-        final_state = await run_agent(
-            prompt=prompt,
-            task_id=task_id,
-            reference_image=reference_image,
-            max_iterations=max_iterations
-        )
-        
-        # Check for errors
-        if final_state.get("node_status") == NodeStatus.FAILED:
-            tasks_store[task_id].update({
-                "status": "failed",
-                "progress": 0,
-                "current_step": "error",
-                "error": final_state.get("error_message", "Unknown error")
-            })
-            return
-        
-        # Update with success
-        tasks_store[task_id].update({
-            "status": "completed",
-            "progress": 100,
-            "current_step": "done",
-            "generated_image": final_state.get("generated_image"),
-            "feedback": final_state.get("feedback"),
-            "quality_score": final_state.get("quality_score"),
-            "iteration_count": final_state.get("iteration_count", 0)
-        })
-        
-        # Flush monitoring events
-        if monitor.enabled:
-            monitor.flush()
-        
-    except Exception as e:
-        # Update with error
-        tasks_store[task_id].update({
-            "status": "failed",
-            "progress": 0,
-            "current_step": "error",
-            "error": str(e)
-        })
-        
-        # Log error
-        if monitor.enabled:
-            monitor.log_error(
-                trace_id=task_id,
-                error_message=str(e)
-            )
@@ -0,0 +1,259 @@
+"""
+WebSocket Routes
+Ek connection par bahut saare tasks: subscribe / unsubscribe / generate + compact status deltas
+"""
+import os
+import asyncio
+from collections import OrderedDict, deque
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+from pydantic import ValidationError
+
+from .v1_routes import GenerateRequest, build_status, submit_generation, task_updates
+from ..services.clients import client_registry
+from ..services.task_store import TERMINAL_STATUSES
+
+
+router = APIRouter(prefix="/api/v1", tags=["Realtime"])
+
+# Ek connection itne tasks tak subscribe kar sakta hai
+WS_MAX_SUBSCRIPTIONS = int(os.getenv("WS_MAX_SUBSCRIPTIONS", "200"))
+
+# Unsent control replies (accepted / error / pong) isse zyada hon to client bahut slow hai - disconnect
+WS_MAX_PENDING_REPLIES = int(os.getenv("WS_MAX_PENDING_REPLIES", "100"))
+
+# Status fields jo `updates` mein jate hain (task_id / version ke alawa)
+STATE_FIELDS = (
+    "status", "progress", "current_step", "iteration", "step_seconds", "elapsed_seconds",
+    "image_url", "placeholder", "feedback", "error", "quality_score", "queue_position", "eta_seconds"
+)
+
+
+class SlowConsumer(Exception):
+    """Client replies utni tezi se nahi padh raha jitni tezi se bhej raha hai"""
+
+
+class TaskChannel:
+    """
+    Ek WebSocket connection ka state
+
+    Har subscribed task ka apna watcher (task_updates) hai jo latest fields
+    `_pending` mein merge karta hai. Writer sirf woh fields bhejta hai jo client
+    ko last bheje gaye state se alag hain, aur ek frame mein saare tasks ke
+    deltas batch karta hai. Slow client par same task ke updates coalesce ho
+    jate hain, isliye memory subscriptions ki tadaad se bounded rehti hai.
+    """
+
+    def __init__(self, websocket: WebSocket, client: str, client_label: Optional[str] = None):
+        self.websocket = websocket
+        self.client = client
+        self.client_label = client_label
+
+        self._watchers: Dict[str, asyncio.Task] = {}
+        self._pending: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()  # task_id -> unsent latest fields
+        self._sent: Dict[str, Dict[str, Any]] = {}  # task_id -> client ke paas jo state hai
+        self._replies: deque = deque()
+        self._wakeup = asyncio.Event()
+        self._closed = False
+
+    # Outbox
+
+    def push(self, task_id: str, version: Optional[int], fields: Dict[str, Any]):
+        """Task ke latest fields (pehle ke unsent fields ke upar merge)"""
+        if task_id not in self._watchers:
+            return  # Unsubscribe ho chuka
+        pending = self._pending.setdefault(task_id, {})
+        pending.update(fields)
+        if version is not None:
+            pending["version"] = version
+        self._wakeup.set()
+
+    def reply(self, message: Dict[str, Any]):
+        """Non-coalescable message (accepted, error, ...)"""
+        if len(self._replies) >= WS_MAX_PENDING_REPLIES:
+            raise SlowConsumer(f"More than {WS_MAX_PENDING_REPLIES} unsent replies")
+        self._replies.append(message)
+        self._wakeup.set()
+
+    def _take_updates(self) -> list:
+        updates = []
+        while self._pending:
+            task_id, fields = self._pending.popitem(last=False)
+            sent = self._sent.setdefault(task_id, {})
+            delta = {
+                name: value for name, value in fields.items()
+                if sent.get(name) != value and (name in sent or value is not None)
+            }
+            sent.update(fields)
+            if set(delta) - {"version"}:
+                updates.append({"task_id": task_id, **delta})
+            if sent.get("status") in TERMINAL_STATUSES:
+                # Final state bhej diya; task ka delta base ab zaroori nahi
+                del self._sent[task_id]
+        return updates
+
+    async def writer(self):
+        """Outbox ko socket par flush karta hai (ek waqt mein ek send = natural backpressure)"""
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while self._replies:
+                await self.websocket.send_json(self._replies.popleft())
+            updates = self._take_updates()
+            if updates:
+                await self.websocket.send_json({"type": "updates", "tasks": updates})
+
+    # Subscriptions
+
+    def subscribe(self, task_id: str) -> bool:
+        if task_id in self._watchers:
+            return True
+        if len(self._watchers) >= WS_MAX_SUBSCRIPTIONS:
+            return False
+        self._watchers[task_id] = asyncio.create_task(self._watch(task_id))
+        return True
+
+    def unsubscribe(self, task_id: str):
+        watcher = self._watchers.pop(task_id, None)
+        if watcher is not None:
+            watcher.cancel()
+        self._pending.pop(task_id, None)
+        self._sent.pop(task_id, None)
+
+    async def _watch(self, task_id: str):
+        try:
+            async for kind, version, payload in task_updates(task_id):
+                if kind == "snapshot":
+                    status = await build_status(payload)
+                    self.push(task_id, version, status.model_dump(include=set(STATE_FIELDS)))
+                elif kind == "patch":
+                    self.push(task_id, version, payload)
+                elif kind == "missing":
+                    self.reply({"type": "error", "task_id": task_id, "status": 404, "detail": "Task not found"})
+        except asyncio.CancelledError:
+            raise
+        except SlowConsumer:
+            await self.close(1013, "Client too slow")
+        except Exception as e:
+            print(f"⚠️ WebSocket watcher failed ({task_id}): {e}")
+        finally:
+            if self._watchers.get(task_id) is asyncio.current_task():
+                # Terminal task: watcher khatam, subscription slot free (last delta writer bhejega)
+                del self._watchers[task_id]
+
+    # Commands
+
+    async def handle(self, message: Dict[str, Any]):
+        op = message.get("op")
+        ref = message.get("ref")
+
+        if op == "subscribe":
+            task_ids = [str(task_id) for task_id in message.get("task_ids", [])]
+            accepted = [task_id for task_id in task_ids if self.subscribe(task_id)]
+            rejected = [task_id for task_id in task_ids if task_id not in accepted]
+            self.reply({"type": "subscribed", "ref": ref, "task_ids": accepted})
+            if rejected:
+                self.reply({
+                    "type": "error",
+                    "ref": ref,
+                    "status": 429,
+                    "detail": f"Subscription limit reached ({WS_MAX_SUBSCRIPTIONS})",
+                    "task_ids": rejected
+                })
+
+        elif op == "unsubscribe":
+            task_ids = [str(task_id) for task_id in message.get("task_ids", [])]
+            for task_id in task_ids:
+                self.unsubscribe(task_id)
+            self.reply({"type": "unsubscribed", "ref": ref, "task_ids": task_ids})
+
+        elif op == "generate":
+            fields = {k: v for k, v in message.items() if k not in ("op", "ref", "subscribe")}
+            try:
+                task_id = await submit_generation(GenerateRequest(**fields), self.client, self.client_label)
+            except ValidationError as e:
+                self.reply({"type": "error", "ref": ref, "status": 422, "detail": e.errors(include_url=False)})
+                return
+            except HTTPException as e:
+                error = {"type": "error", "ref": ref, "status": e.status_code, "detail": e.detail}
+                if e.headers and "Retry-After" in e.headers:
+                    error["retry_after"] = int(e.headers["Retry-After"])
+                self.reply(error)
+                return
+            self.reply({"type": "accepted", "ref": ref, "task_id": task_id})
+            if message.get("subscribe", True):
+                self.subscribe(task_id)
+
+        elif op == "ping":
+            self.reply({"type": "pong", "ref": ref})
+
+        else:
+            self.reply({"type": "error", "ref": ref, "status": 400, "detail": f"Unknown op: {op}"})
+
+    # Lifecycle
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            await self.websocket.close(code=code, reason=reason)
+        except Exception:
+            pass
+
+    async def shutdown(self):
+        watchers = list(self._watchers.values())
+        self._watchers.clear()
+        for watcher in watchers:
+            watcher.cancel()
+        await asyncio.gather(*watchers, return_exceptions=True)
+
+
+@router.websocket("/ws")
+async def task_channel(websocket: WebSocket):
+    """
+    Multiplexed task channel
+
+    Client -> server (JSON, optional `ref` reply mein wapas aata hai):
+    - {"op": "subscribe", "task_ids": [...]}
+    - {"op": "unsubscribe", "task_ids": [...]}
+    - {"op": "generate", "prompt": "...", ...GenerateRequest fields} (auto-subscribe)
+    - {"op": "ping"}
+
+    Server -> client:
+    - {"type": "updates", "tasks": [{"task_id", "version", ...sirf badle hue fields}]}
+    - {"type": "accepted" | "subscribed" | "unsubscribed" | "pong" | "error", ...}
+    """
+    await websocket.accept()
+    channel = TaskChannel(websocket, client_registry.identify(websocket), client_registry.label(websocket))
+    writer = asyncio.create_task(channel.writer())
+
+    try:
+        while True:
+            receive = asyncio.ensure_future(websocket.receive_json())
+            done, _ = await asyncio.wait({receive, writer}, return_when=asyncio.FIRST_COMPLETED)
+            if writer in done:
+                # Send fail hua (client gaya) - reader bhi band
+                receive.cancel()
+                break
+            try:
+                message = receive.result()
+            except (WebSocketDisconnect, RuntimeError):
+                break
+            except ValueError:
+                channel.reply({"type": "error", "status": 400, "detail": "Invalid JSON"})
+                continue
+            if not isinstance(message, dict):
+                channel.reply({"type": "error", "status": 400, "detail": "Message must be a JSON object"})
+                continue
+            await channel.handle(message)
+
+    except SlowConsumer:
+        await channel.close(1013, "Client too slow")
+    except WebSocketDisconnect:
+        pass
+    finally:
+        writer.cancel()
+        await asyncio.gather(writer, return_exceptions=True)
+        await channel.shutdown()
@@ -10,7 +10,16 @@ from fastapi.responses import JSONResponse
 from dotenv import load_dotenv
 
 from app.api.v1_routes import router as v1_router
+from app.api.ws_routes import router as ws_router
+from app.agent.jobs import run_job, recover_journal_tasks
+from app.agent.graph import start_checkpointing
+from app.agent.checkpoints import checkpoint_store
 from app.services.monitor import monitor
+from app.services.silicon_flow import silicon_flow_service
+from app.services.derivatives import derivative_pipeline
+from app.services.task_store import task_store
+from app.services.journal import task_journal
+from app.services.scheduler import job_scheduler
 
 
 # Load environment variables
@@ -32,12 +41,45 @@ async def lifespan(app: FastAPI):
     print(f"🌐 CORS: Enabled for frontend")
     print("="*60 + "\n")
     
+    # Shared upstream connection pool
+    await silicon_flow_service.start()
+    
+    # Derivative image workers (thumbnails, WebP/AVIF)
+    derivative_pipeline.start()
+    
+    # Task store maintenance (TTL sweeping)
+    await task_store.start()
+    
+    # Graph checkpoints (SQLite backend) - workers start hone se pehle
+    await start_checkpointing()
+    
+    # Job queue: inline mode mein workers isi process mein, external mein sirf enqueue
+    if job_scheduler.mode == "inline":
+        await job_scheduler.start(handler=run_job)
+    else:
+        await job_scheduler.start()
+    print(f"⚙️ Worker mode: {job_scheduler.mode}")
+    
+    # Task journal + crash recovery (jahan jobs chalte hain wahi)
+    if task_journal.enabled and job_scheduler.consuming:
+        await task_journal.start()
+        recovered = await recover_journal_tasks()
+        print(f"📒 Journal recovery: {recovered}")
+    
     yield
     
     # Shutdown
     print("\n" + "="*60)
     print("👋 AI Vision Agent Pro - Backend Shutting Down")
     
+    # Close upstream connections
+    await job_scheduler.close()
+    await task_journal.close()
+    await checkpoint_store.close()
+    await task_store.close()
+    await silicon_flow_service.close()
+    derivative_pipeline.close()
+    
     # Flush monitoring events
     if monitor.enabled:
         print("📊 Flushing monitoring events...")
@@ -68,6 +110,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],  # Long-poll ke If-None-Match ke liye
 )
 
 
@@ -92,6 +135,7 @@ async def global_exception_handler(request: Request, exc: Exception):
 
 # Include API routes
 app.include_router(v1_router)
+app.include_router(ws_router)
 
 
 # Root endpoint
@@ -0,0 +1,189 @@
+"""
+Blob Store
+Raw image bytes content hash (SHA-256) se store hoti hain - task state mein sirf ID jata hai
+"""
+import os
+import json
+import asyncio
+import hashlib
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional
+
+from .imaging import sniff_image_type
+
+
+class BlobInfo:
+    """Stored blob ki metadata"""
+
+    def __init__(self, blob_id: str, size: int, content_type: str, path: Optional[str] = None):
+        self.blob_id = blob_id
+        self.size = size
+        self.content_type = content_type
+        self.path = path  # Local file (sendfile ke liye); non-file backends mein None
+
+
+class BlobStore(ABC):
+    """Pluggable blob storage interface"""
+
+    @staticmethod
+    def compute_id(data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()
+
+    @staticmethod
+    def is_valid_id(blob_id: str) -> bool:
+        return len(blob_id) == 64 and all(c in "0123456789abcdef" for c in blob_id)
+
+    @abstractmethod
+    async def put(self, data: bytes, content_type: Optional[str] = None) -> str:
+        """Store bytes, return content-hash ID (same bytes = same ID)"""
+
+    @abstractmethod
+    async def get(self, blob_id: str) -> Optional[bytes]:
+        """Blob bytes ya None"""
+
+    @abstractmethod
+    async def stat(self, blob_id: str) -> Optional[BlobInfo]:
+        """Size/content type (bytes read kiye bina)"""
+
+    @abstractmethod
+    async def read_range(self, blob_id: str, start: int, end: int) -> Optional[bytes]:
+        """Inclusive byte range [start, end]"""
+
+    @abstractmethod
+    async def delete(self, blob_id: str):
+        """Remove blob (missing ho to no-op)"""
+
+    @abstractmethod
+    async def put_meta(self, blob_id: str, key: str, value: Dict[str, Any]):
+        """Blob ke saath chhota JSON document attach karo (e.g. derivatives manifest)"""
+
+    @abstractmethod
+    async def get_meta(self, blob_id: str, key: str) -> Optional[Dict[str, Any]]:
+        """Attached JSON document ya None"""
+
+
+class FileBlobStore(BlobStore):
+    """
+    Local filesystem backend
+
+    Layout: <root>/<id[:2]>/<id> (bytes) + <id>.json (content type, meta).
+    Shared volume par multiple workers same store use kar sakte hain.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, blob_id: str) -> str:
+        return os.path.join(self.root, blob_id[:2], blob_id)
+
+    def _meta_path(self, blob_id: str) -> str:
+        return self._path(blob_id) + ".json"
+
+    async def put(self, data: bytes, content_type: Optional[str] = None) -> str:
+        blob_id = self.compute_id(data)
+        content_type = content_type or sniff_image_type(data) or "application/octet-stream"
+        await asyncio.to_thread(self._write, blob_id, data, content_type)
+        return blob_id
+
+    def _write(self, blob_id: str, data: bytes, content_type: str):
+        path = self._path(blob_id)
+        if os.path.exists(path):
+            return  # Content-addressed: already stored
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._atomic_write(self._meta_path(blob_id), json.dumps({"content_type": content_type}).encode())
+        self._atomic_write(path, data)
+
+    @staticmethod
+    def _atomic_write(path: str, data: bytes):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _read_meta_file(self, blob_id: str) -> Dict[str, Any]:
+        try:
+            with open(self._meta_path(blob_id), "rb") as f:
+                return json.loads(f.read())
+        except (OSError, ValueError):
+            return {}
+
+    async def get(self, blob_id: str) -> Optional[bytes]:
+        if not self.is_valid_id(blob_id):
+            return None
+        try:
+            return await asyncio.to_thread(self._read, blob_id)
+        except FileNotFoundError:
+            return None
+
+    def _read(self, blob_id: str) -> bytes:
+        with open(self._path(blob_id), "rb") as f:
+            return f.read()
+
+    async def stat(self, blob_id: str) -> Optional[BlobInfo]:
+        if not self.is_valid_id(blob_id):
+            return None
+        return await asyncio.to_thread(self._stat, blob_id)
+
+    def _stat(self, blob_id: str) -> Optional[BlobInfo]:
+        path = self._path(blob_id)
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return None
+        content_type = self._read_meta_file(blob_id).get("content_type", "application/octet-stream")
+        return BlobInfo(blob_id, size, content_type, path)
+
+    async def read_range(self, blob_id: str, start: int, end: int) -> Optional[bytes]:
+        if not self.is_valid_id(blob_id):
+            return None
+        try:
+            return await asyncio.to_thread(self._read_range, blob_id, start, end)
+        except FileNotFoundError:
+            return None
+
+    def _read_range(self, blob_id: str, start: int, end: int) -> bytes:
+        with open(self._path(blob_id), "rb") as f:
+            f.seek(start)
+            return f.read(end - start + 1)
+
+    async def delete(self, blob_id: str):
+        if not self.is_valid_id(blob_id):
+            return
+        await asyncio.to_thread(self._delete, blob_id)
+
+    def _delete(self, blob_id: str):
+        for path in (self._path(blob_id), self._meta_path(blob_id)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    async def put_meta(self, blob_id: str, key: str, value: Dict[str, Any]):
+        await asyncio.to_thread(self._put_meta, blob_id, key, value)
+
+    def _put_meta(self, blob_id: str, key: str, value: Dict[str, Any]):
+        meta = self._read_meta_file(blob_id)
+        meta[key] = value
+        os.makedirs(os.path.dirname(self._meta_path(blob_id)), exist_ok=True)
+        self._atomic_write(self._meta_path(blob_id), json.dumps(meta).encode())
+
+    async def get_meta(self, blob_id: str, key: str) -> Optional[Dict[str, Any]]:
+        if not self.is_valid_id(blob_id):
+            return None
+        meta = await asyncio.to_thread(self._read_meta_file, blob_id)
+        return meta.get(key)
+
+
+def create_blob_store() -> BlobStore:
+    """BLOB_STORE_BACKEND ke hisaab se backend choose karta hai"""
+    backend = os.getenv("BLOB_STORE_BACKEND", "file").lower()
+
+    if backend == "file":
+        return FileBlobStore(os.getenv("BLOB_STORE_DIR", "./data/blobs"))
+
+    raise ValueError(f"Unknown BLOB_STORE_BACKEND: {backend}")
+
+
+# Global instance
+blob_store = create_blob_store()
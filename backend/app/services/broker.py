@@ -0,0 +1,560 @@
+"""
+Job Broker
+API aur workers ke beech job queue - in-process (single process / tests) ya Redis (separate worker tier)
+"""
+import os
+import json
+import time
+import asyncio
+import itertools
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Any, AsyncIterator, Dict, Iterable, Optional, Tuple
+
+from .clients import ANONYMOUS_CLIENT, ClientPolicy
+
+
+# Per-minute quota ka sliding window
+QUOTA_WINDOW = 60.0
+
+
+class QueueFull(Exception):
+    """Queue max depth par hai (HTTP 429)"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class QuotaExceeded(QueueFull):
+    """Client apne concurrent / per-minute quota par hai (HTTP 429)"""
+
+    def __init__(self, message: str, retry_after: float, reason: str):
+        super().__init__(message, retry_after)
+        self.reason = reason  # concurrency | rate
+
+
+class Broker(ABC):
+    """
+    Job queue interface
+
+    Job ek JSON-serializable dict hai: {"task_id", "priority", "client", "params"}.
+    Higher priority pehle; same priority mein clients ke beech weighted fair
+    queuing (har priority level ka apna virtual clock, client ka finish tag
+    += 1 / weight, sabse chhota tag pehle), ek client ke andar FIFO. Workers
+    har job ki duration aur apni capacity report karte hain taake API queue
+    ETA estimate kar sake.
+    """
+
+    def __init__(self, max_depth: int, default_duration: float):
+        self.max_depth = max_depth
+        self.default_duration = default_duration
+        self.smoothing = 0.2
+        # Crashed worker ke jobs itni der baad client ke active count se nikal jate hain
+        self.active_ttl = 3600.0
+
+    @abstractmethod
+    async def enqueue(self, job: Dict[str, Any], policy: ClientPolicy) -> None:
+        """Job queue mein daalo; full ho to QueueFull, client quota par ho to QuotaExceeded"""
+
+    @abstractmethod
+    async def dequeue(self) -> Dict[str, Any]:
+        """Agla job (available hone tak wait)"""
+
+    @abstractmethod
+    async def remove(self, task_id: str) -> bool:
+        """Waiting job queue se nikaalo (cancel); True agar queue mein tha"""
+
+    @abstractmethod
+    async def release(self, task_id: str, client: str) -> None:
+        """Job khatam (ya abort) - client ke concurrent quota se nikaalo"""
+
+    @abstractmethod
+    async def client_usage(self, client: str) -> Tuple[int, int, Optional[float]]:
+        """(active tasks, last minute ke submissions, window ka oldest submission epoch)"""
+
+    async def check_quota(self, client: str, policy: ClientPolicy) -> None:
+        """Client quota par ho to QuotaExceeded (cheap early check)"""
+        active, recent, oldest = await self.client_usage(client)
+        if policy.max_concurrent and active >= policy.max_concurrent:
+            raise await self.quota_exceeded("concurrency", policy, oldest)
+        if policy.per_minute and recent >= policy.per_minute:
+            raise await self.quota_exceeded("rate", policy, oldest)
+
+    async def quota_exceeded(self, reason: str, policy: ClientPolicy, oldest: Optional[float]) -> QuotaExceeded:
+        if reason == "rate":
+            retry_after = (oldest or time.time()) + QUOTA_WINDOW - time.time()
+            message = f"Client rate quota reached ({policy.per_minute} per minute)"
+        else:
+            _, retry_after = await self.capacity_and_duration()
+            message = f"Client concurrency quota reached ({policy.max_concurrent} active tasks)"
+        return QuotaExceeded(message, max(1.0, retry_after), reason)
+
+    async def extend(self, task_ids: Iterable[str]) -> None:
+        """Running jobs abhi zinda hain (worker heartbeat par) - visibility timeout aage badhao"""
+
+    async def requeue_expired(self) -> int:
+        """Jin claimed jobs ka worker chup ho gaya unhe queue mein wapas daalo; kitne"""
+        return 0
+
+    async def publish_cancel(self, task_id: str) -> None:
+        """Doosre processes ke workers ko cancel signal (shared brokers ke liye)"""
+
+    async def cancellations(self) -> AsyncIterator[str]:
+        """Doosre processes se aaye cancel signals ke task IDs"""
+        return
+        yield
+
+    @abstractmethod
+    async def position(self, task_id: str) -> Optional[int]:
+        """1-based queue position (None agar queue mein nahi)"""
+
+    @abstractmethod
+    async def depth(self) -> int:
+        """Waiting jobs ki tadaad"""
+
+    @abstractmethod
+    async def record_duration(self, seconds: float) -> None:
+        """Completed job ki duration (EWMA update)"""
+
+    @abstractmethod
+    async def heartbeat(self, worker_id: str, concurrency: int) -> None:
+        """Worker process zinda hai aur itne jobs parallel chala sakta hai"""
+
+    @abstractmethod
+    async def capacity_and_duration(self) -> Tuple[int, float]:
+        """(live workers ki total concurrency, average job duration)"""
+
+    async def retry_after(self) -> int:
+        """Queue drain hone ka rough estimate (Retry-After seconds)"""
+        capacity, duration = await self.capacity_and_duration()
+        return max(1, int(await self.depth() / max(1, capacity) * duration + 0.999))
+
+    async def queue_full(self) -> QueueFull:
+        return QueueFull(f"Job queue is full ({self.max_depth} waiting)", await self.retry_after())
+
+    async def start(self):
+        """Connections etc. (app startup)"""
+
+    async def close(self):
+        """Cleanup (app shutdown)"""
+
+    async def stats(self) -> Dict[str, Any]:
+        capacity, duration = await self.capacity_and_duration()
+        return {
+            "queued": await self.depth(),
+            "max_depth": self.max_depth,
+            "capacity": capacity,
+            "avg_duration": round(duration, 2)
+        }
+
+
+class InProcessBroker(Broker):
+    """
+    asyncio.PriorityQueue par based broker
+
+    API aur workers ek hi process mein (WORKER_MODE=inline) ya tests ke liye.
+    """
+
+    def __init__(self, max_depth: int, default_duration: float):
+        super().__init__(max_depth, default_duration)
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._waiting: Dict[str, Tuple[int, float, int]] = {}  # task_id -> sort key
+        self._seq = itertools.count()
+        self._avg_duration = default_duration
+        self._workers: Dict[str, Tuple[int, float]] = {}
+
+        # Fair queuing: priority -> virtual time, client -> {priority: last finish tag}
+        self._vtime: Dict[int, float] = {}
+        self._finish: Dict[str, Dict[int, float]] = {}
+
+        # Quotas: client -> active task IDs / recent submission times
+        self._owner: Dict[str, str] = {}  # task_id -> client
+        self._active: Dict[str, set] = {}
+        self._recent: Dict[str, deque] = {}
+
+    def _get_queue(self) -> asyncio.PriorityQueue:
+        if self._queue is None:
+            self._queue = asyncio.PriorityQueue()
+        return self._queue
+
+    async def enqueue(self, job: Dict[str, Any], policy: ClientPolicy) -> None:
+        if len(self._waiting) >= self.max_depth:
+            raise await self.queue_full()
+        client = job.get("client") or ANONYMOUS_CLIENT
+        await self.check_quota(client, policy)
+
+        priority = job.get("priority", 0)
+        finish = self._finish.setdefault(client, {})
+        tag = max(self._vtime.get(priority, 0.0), finish.get(priority, 0.0)) + 1.0 / policy.weight
+        finish[priority] = tag
+        key = (-priority, tag, next(self._seq))
+
+        task_id = job["task_id"]
+        self._waiting[task_id] = key
+        self._owner[task_id] = client
+        self._active.setdefault(client, set()).add(task_id)
+        self._recent.setdefault(client, deque()).append(time.time())
+        self._get_queue().put_nowait((key, job))
+
+    async def dequeue(self) -> Dict[str, Any]:
+        while True:
+            key, job = await self._get_queue().get()
+            if self._waiting.get(job["task_id"]) == key:
+                del self._waiting[job["task_id"]]
+                priority = -key[0]
+                self._vtime[priority] = max(self._vtime.get(priority, 0.0), key[1])
+                return job
+
+    async def remove(self, task_id: str) -> bool:
+        # Heap entry lazily skip hoti hai (dequeue key match check karta hai)
+        if self._waiting.pop(task_id, None) is None:
+            return False
+        await self.release(task_id, self._owner.get(task_id, ANONYMOUS_CLIENT))
+        return True
+
+    async def release(self, task_id: str, client: str) -> None:
+        client = self._owner.pop(task_id, client)
+        active = self._active.get(client)
+        if active is None:
+            return
+        active.discard(task_id)
+        if not active:
+            del self._active[client]
+            # Idle client ke jo tags virtual clock se peeche hain unhe yaad rakhne ki zarurat nahi
+            finish = self._finish.get(client, {})
+            for priority, tag in list(finish.items()):
+                if tag <= self._vtime.get(priority, 0.0):
+                    del finish[priority]
+            if not finish:
+                self._finish.pop(client, None)
+
+    async def client_usage(self, client: str) -> Tuple[int, int, Optional[float]]:
+        recent = self._recent.get(client)
+        if recent is not None:
+            cutoff = time.time() - QUOTA_WINDOW
+            while recent and recent[0] <= cutoff:
+                recent.popleft()
+            if not recent:
+                del self._recent[client]
+                recent = None
+        return (
+            len(self._active.get(client, ())),
+            len(recent) if recent else 0,
+            recent[0] if recent else None
+        )
+
+    async def position(self, task_id: str) -> Optional[int]:
+        key = self._waiting.get(task_id)
+        if key is None:
+            return None
+        return 1 + sum(1 for other in self._waiting.values() if other < key)
+
+    async def depth(self) -> int:
+        return len(self._waiting)
+
+    async def record_duration(self, seconds: float) -> None:
+        self._avg_duration += self.smoothing * (seconds - self._avg_duration)
+
+    async def heartbeat(self, worker_id: str, concurrency: int) -> None:
+        self._workers[worker_id] = (concurrency, time.time())
+
+    async def capacity_and_duration(self) -> Tuple[int, float]:
+        return sum(concurrency for concurrency, _ in self._workers.values()), self._avg_duration
+
+
+# Atomic enqueue: depth check + client quotas + fair-share tag + ZADD + payload
+#
+# KEYS[1] = queue (sorted set), KEYS[2] = payloads (hash), KEYS[3] = virtual time per priority (hash),
+# KEYS[4] = client finish tags per priority (hash), KEYS[5] = client active (zset), KEYS[6] = client recent (zset),
+# KEYS[7] = wakeup list (idle workers BLPOP karte hain)
+# ARGV[1] = max depth, ARGV[2] = task ID, ARGV[3] = priority, ARGV[4] = job JSON, ARGV[5] = weight,
+# ARGV[6] = max concurrent, ARGV[7] = per minute, ARGV[8] = now, ARGV[9] = quota window, ARGV[10] = active TTL
+_ENQUEUE_SCRIPT = """
+if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[1]) then
+    return {0, 'full'}
+end
+local now = tonumber(ARGV[8])
+redis.call('ZREMRANGEBYSCORE', KEYS[5], '-inf', now - tonumber(ARGV[10]))
+redis.call('ZREMRANGEBYSCORE', KEYS[6], '-inf', now - tonumber(ARGV[9]))
+local max_concurrent = tonumber(ARGV[6])
+if max_concurrent > 0 and redis.call('ZCARD', KEYS[5]) >= max_concurrent then
+    return {0, 'concurrency'}
+end
+local per_minute = tonumber(ARGV[7])
+if per_minute > 0 and redis.call('ZCARD', KEYS[6]) >= per_minute then
+    local oldest = redis.call('ZRANGE', KEYS[6], 0, 0, 'WITHSCORES')
+    return {0, 'rate', oldest[2]}
+end
+local vtime = tonumber(redis.call('HGET', KEYS[3], ARGV[3]) or '0')
+local last = tonumber(redis.call('HGET', KEYS[4], ARGV[3]) or '0')
+local tag = math.max(vtime, last) + 1 / tonumber(ARGV[5])
+local ttl = math.ceil(tonumber(ARGV[10]))
+redis.call('HSET', KEYS[4], ARGV[3], tag)
+redis.call('EXPIRE', KEYS[4], ttl)
+redis.call('ZADD', KEYS[1], -tonumber(ARGV[3]) * 1e12 + tag, ARGV[2])
+redis.call('HSET', KEYS[2], ARGV[2], ARGV[4])
+redis.call('ZADD', KEYS[5], now, ARGV[2])
+redis.call('EXPIRE', KEYS[5], ttl)
+redis.call('ZADD', KEYS[6], now, ARGV[2])
+redis.call('EXPIRE', KEYS[6], math.ceil(tonumber(ARGV[9])))
+redis.call('LPUSH', KEYS[7], ARGV[2])
+redis.call('LTRIM', KEYS[7], 0, tonumber(ARGV[1]))
+return {1}
+"""
+
+# Atomic claim: sabse chhota score queue se nikal kar processing set mein (visibility deadline)
+#
+# Payload hash mein hi rehta hai jab tak worker ack (release) na kare; worker crash
+# ho jaye to deadline ke baad _REQUEUE_SCRIPT job wapas queue mein daal deta hai.
+#
+# KEYS[1] = queue, KEYS[2] = payloads, KEYS[3] = processing (zset, score = visibility deadline)
+# ARGV[1] = visibility deadline
+_CLAIM_SCRIPT = """
+while true do
+    local popped = redis.call('ZPOPMIN', KEYS[1])
+    if #popped == 0 then
+        return nil
+    end
+    local payload = redis.call('HGET', KEYS[2], popped[1])
+    if payload then
+        redis.call('ZADD', KEYS[3], ARGV[1], popped[1])
+        return {popped[1], popped[2], payload}
+    end
+end
+"""
+
+# Expired claims -> queue (apni priority mein sabse aage), payload par redelivered = true
+#
+# KEYS[1] = queue, KEYS[2] = payloads, KEYS[3] = processing, KEYS[4] = virtual time per priority,
+# KEYS[5] = wakeup list; ARGV[1] = now
+_REQUEUE_SCRIPT = """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[3], '-inf', ARGV[1])
+local requeued = 0
+for _, task_id in ipairs(expired) do
+    redis.call('ZREM', KEYS[3], task_id)
+    local payload = redis.call('HGET', KEYS[2], task_id)
+    if payload then
+        local job = cjson.decode(payload)
+        local priority = tonumber(job['priority']) or 0
+        job['redelivered'] = true
+        redis.call('HSET', KEYS[2], task_id, cjson.encode(job))
+        local vtime = tonumber(redis.call('HGET', KEYS[4], tostring(priority)) or '0')
+        redis.call('ZADD', KEYS[1], -priority * 1e12 + vtime, task_id)
+        redis.call('LPUSH', KEYS[5], task_id)
+        requeued = requeued + 1
+    end
+end
+return requeued
+"""
+
+# Dequeued job ka tag us priority ka virtual time ban jata hai (sirf aage badhta hai)
+#
+# KEYS[1] = virtual time per priority (hash), ARGV[1] = priority, ARGV[2] = tag
+_ADVANCE_SCRIPT = """
+if tonumber(ARGV[2]) > tonumber(redis.call('HGET', KEYS[1], ARGV[1]) or '0') then
+    redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+end
+return 1
+"""
+
+
+class RedisBroker(Broker):
+    """
+    Redis sorted-set queue (score = -priority * 1e12 + client finish tag)
+
+    API processes enqueue karte hain, `python -m app.worker` processes jobs
+    claim karte hain. Dono tiers alag alag scale hote hain.
+
+    Delivery at-least-once hai: claim (Lua) job ko atomically queue se
+    processing set mein le jata hai, visibility deadline ke saath. Running
+    jobs ki deadline worker heartbeat par aage badhti hai; job khatam hone
+    par release() ack karta hai. Worker crash ho (ya job ke beech mein mar
+    jaye) to deadline ke baad koi bhi worker requeue_expired() se job wapas
+    queue mein daal deta hai (`redelivered: true`, dobara run hota hai).
+    """
+
+    def __init__(
+        self,
+        client,
+        max_depth: int,
+        default_duration: float,
+        heartbeat_ttl: float = 30.0,
+        visibility_timeout: float = 60.0,
+        prefix: str = "aivision"
+    ):
+        super().__init__(max_depth, default_duration)
+        self.redis = client
+        self.heartbeat_ttl = heartbeat_ttl
+        self.visibility_timeout = visibility_timeout
+        self.queue_key = f"{prefix}:jobs:queue"
+        self.payload_key = f"{prefix}:jobs:payload"
+        self.processing_key = f"{prefix}:jobs:processing"
+        self.wakeup_key = f"{prefix}:jobs:wakeup"
+        self.vtime_key = f"{prefix}:jobs:vtime"
+        self.client_prefix = f"{prefix}:jobs:client"
+        self.duration_key = f"{prefix}:jobs:avg_duration"
+        self.workers_key = f"{prefix}:jobs:workers"
+        self.cancel_channel = f"{prefix}:jobs:cancel"
+        self._enqueue_script = self.redis.register_script(_ENQUEUE_SCRIPT)
+        self._advance_script = self.redis.register_script(_ADVANCE_SCRIPT)
+        self._claim_script = self.redis.register_script(_CLAIM_SCRIPT)
+        self._requeue_script = self.redis.register_script(_REQUEUE_SCRIPT)
+
+    def _client_keys(self, client: str) -> Tuple[str, str, str]:
+        """(active, recent, finish tags) - idle client ki keys TTL se khud expire hoti hain"""
+        base = f"{self.client_prefix}:{client}"
+        return f"{base}:active", f"{base}:recent", f"{base}:finish"
+
+    async def enqueue(self, job: Dict[str, Any], policy: ClientPolicy) -> None:
+        client = job.get("client") or ANONYMOUS_CLIENT
+        active_key, recent_key, finish_key = self._client_keys(client)
+        result = await self._enqueue_script(
+            keys=[
+                self.queue_key, self.payload_key, self.vtime_key, finish_key, active_key, recent_key, self.wakeup_key
+            ],
+            args=[
+                self.max_depth, job["task_id"], job.get("priority", 0), json.dumps(job, default=str),
+                policy.weight, policy.max_concurrent, policy.per_minute,
+                time.time(), QUOTA_WINDOW, self.active_ttl
+            ]
+        )
+        if result[0]:
+            return
+        if result[1] == "full":
+            raise await self.queue_full()
+        raise await self.quota_exceeded(result[1], policy, float(result[2]) if len(result) > 2 else None)
+
+    async def dequeue(self) -> Dict[str, Any]:
+        while True:
+            claimed = await self._claim_script(
+                keys=[self.queue_key, self.payload_key, self.processing_key],
+                args=[time.time() + self.visibility_timeout]
+            )
+            if claimed:
+                task_id, score, payload = claimed
+                job = json.loads(payload)
+                priority = job.get("priority", 0)
+                await self._advance_script(keys=[self.vtime_key], args=[priority, float(score) + priority * 1e12])
+                return job
+            # Queue khali: enqueue / requeue ke wakeup tak (ya timeout par dobara check)
+            await self.redis.blpop([self.wakeup_key], timeout=5)
+
+    async def remove(self, task_id: str) -> bool:
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hget(self.payload_key, task_id)
+            pipe.zrem(self.queue_key, task_id)
+            pipe.hdel(self.payload_key, task_id)
+            payload, removed, _ = await pipe.execute()
+        if removed and payload:
+            await self.release(task_id, json.loads(payload).get("client") or ANONYMOUS_CLIENT)
+        return bool(removed)
+
+    async def release(self, task_id: str, client: str) -> None:
+        """Ack: job processing set aur payload se hatao, client quota se nikaalo"""
+        active_key, _, _ = self._client_keys(client)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.zrem(self.processing_key, task_id)
+            pipe.hdel(self.payload_key, task_id)
+            pipe.zrem(active_key, task_id)
+            await pipe.execute()
+
+    async def extend(self, task_ids: Iterable[str]) -> None:
+        task_ids = list(task_ids)
+        if task_ids:
+            deadline = time.time() + self.visibility_timeout
+            await self.redis.zadd(self.processing_key, {task_id: deadline for task_id in task_ids}, xx=True)
+
+    async def requeue_expired(self) -> int:
+        return await self._requeue_script(
+            keys=[self.queue_key, self.payload_key, self.processing_key, self.vtime_key, self.wakeup_key],
+            args=[time.time()]
+        )
+
+    async def client_usage(self, client: str) -> Tuple[int, int, Optional[float]]:
+        active_key, recent_key, _ = self._client_keys(client)
+        now = time.time()
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.zcount(active_key, now - self.active_ttl, "+inf")
+            pipe.zcount(recent_key, now - QUOTA_WINDOW, "+inf")
+            pipe.zrangebyscore(recent_key, now - QUOTA_WINDOW, "+inf", start=0, num=1, withscores=True)
+            active, recent, oldest = await pipe.execute()
+        return active, recent, oldest[0][1] if oldest else None
+
+    async def publish_cancel(self, task_id: str) -> None:
+        await self.redis.publish(self.cancel_channel, task_id)
+
+    async def cancellations(self) -> AsyncIterator[str]:
+        pubsub = self.redis.pubsub()
+        await pubsub.subscribe(self.cancel_channel)
+        try:
+            async for message in pubsub.listen():
+                if message.get("type") == "message":
+                    yield message["data"]
+        finally:
+            await pubsub.unsubscribe()
+            await pubsub.aclose()
+
+    async def position(self, task_id: str) -> Optional[int]:
+        rank = await self.redis.zrank(self.queue_key, task_id)
+        return None if rank is None else rank + 1
+
+    async def depth(self) -> int:
+        return await self.redis.zcard(self.queue_key)
+
+    async def record_duration(self, seconds: float) -> None:
+        # Read-modify-write race sirf EWMA ko thoda skew karta hai - acceptable
+        current = await self.redis.get(self.duration_key)
+        average = float(current) if current else self.default_duration
+        await self.redis.set(self.duration_key, average + self.smoothing * (seconds - average))
+
+    async def heartbeat(self, worker_id: str, concurrency: int) -> None:
+        await self.redis.hset(self.workers_key, worker_id, json.dumps([concurrency, time.time()]))
+
+    async def capacity_and_duration(self) -> Tuple[int, float]:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.hgetall(self.workers_key)
+            pipe.get(self.duration_key)
+            workers, duration = await pipe.execute()
+
+        cutoff = time.time() - self.heartbeat_ttl
+        capacity = 0
+        stale = []
+        for worker_id, raw in workers.items():
+            concurrency, seen_at = json.loads(raw)
+            if seen_at >= cutoff:
+                capacity += concurrency
+            else:
+                stale.append(worker_id)
+        if stale:
+            await self.redis.hdel(self.workers_key, *stale)
+
+        return capacity, float(duration) if duration else self.default_duration
+
+    async def close(self):
+        await self.redis.aclose()
+
+
+def create_broker() -> Broker:
+    """BROKER_BACKEND ke hisaab se broker banata hai"""
+    backend = os.getenv("BROKER_BACKEND", "memory").lower()
+    max_depth = int(os.getenv("SCHEDULER_MAX_QUEUE", "100"))
+    default_duration = float(os.getenv("SCHEDULER_DURATION_ESTIMATE", "30"))
+
+    if backend == "memory":
+        return InProcessBroker(max_depth, default_duration)
+
+    if backend == "redis":
+        from .redis_store import create_redis_client
+        return RedisBroker(
+            create_redis_client(),
+            max_depth,
+            default_duration,
+            visibility_timeout=float(os.getenv("BROKER_VISIBILITY_TIMEOUT", "60"))
+        )
+
+    raise ValueError(f"Unknown BROKER_BACKEND: {backend}")
+
+
+# Global instance
+job_broker = create_broker()
@@ -0,0 +1,239 @@
+"""
+Generation Result Cache
+Same payload dobara upstream na bheja jaye - memory (LRU) + disk tiers
+"""
+import os
+import json
+import time
+import asyncio
+import hashlib
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Tuple
+
+
+class GenerationCache:
+    """
+    Content-addressed cache for generated images
+
+    Key canonical payload ka SHA-256 hash hai. Memory tier byte-bounded LRU hai,
+    disk tier raw image files rakhta hai. Dono tiers TTL aur size se evict hote hain.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("GENERATION_CACHE_ENABLED", "true").lower() == "true"
+        self.ttl_seconds = float(os.getenv("GENERATION_CACHE_TTL", "86400"))
+        self.memory_max_bytes = int(float(os.getenv("GENERATION_CACHE_MEMORY_MB", "64")) * 1024 * 1024)
+        self.disk_dir = os.getenv("GENERATION_CACHE_DIR", "./data/cache")
+        self.disk_max_bytes = int(float(os.getenv("GENERATION_CACHE_DISK_MB", "1024")) * 1024 * 1024)
+
+        # key -> (image bytes, stored_at)
+        self._memory: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+        self._memory_bytes = 0
+
+        # key -> (size, stored_at); pehli disk access par directory scan se banta hai
+        self._disk_index: Optional["OrderedDict[str, Tuple[int, float]]"] = None
+        self._disk_bytes = 0
+        self._disk_lock = asyncio.Lock()
+
+        self._stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "writes": 0,
+            "evictions": 0,
+            "expirations": 0
+        }
+
+    @property
+    def disk_enabled(self) -> bool:
+        return bool(self.disk_dir) and self.disk_max_bytes > 0
+
+    @staticmethod
+    def make_key(payload: Dict[str, Any]) -> str:
+        """Canonical JSON (sorted keys, no whitespace) ka SHA-256"""
+        canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def _is_expired(self, stored_at: float) -> bool:
+        return self.ttl_seconds > 0 and (time.time() - stored_at) > self.ttl_seconds
+
+    async def get(self, key: str) -> Optional[bytes]:
+        """Memory tier, phir disk tier check karta hai. Disk hit memory mein promote hota hai."""
+        if not self.enabled:
+            return None
+
+        entry = self._memory.get(key)
+        if entry is not None:
+            data, stored_at = entry
+            if not self._is_expired(stored_at):
+                self._memory.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                return data
+            self._drop_memory(key)
+            self._stats["expirations"] += 1
+
+        if self.disk_enabled:
+            found = await self._disk_get(key)
+            if found is not None:
+                data, stored_at = found
+                self._stats["disk_hits"] += 1
+                self._memory_put(key, data, stored_at)
+                return data
+
+        self._stats["misses"] += 1
+        return None
+
+    async def put(self, key: str, data: bytes):
+        """Store image bytes in both tiers"""
+        if not self.enabled or not data:
+            return
+
+        stored_at = time.time()
+        self._memory_put(key, data, stored_at)
+        self._stats["writes"] += 1
+
+        if self.disk_enabled:
+            try:
+                await self._disk_put(key, data, stored_at)
+            except OSError as e:
+                print(f"⚠️ Cache disk write failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters aur tier sizes"""
+        lookups = self._stats["memory_hits"] + self._stats["disk_hits"] + self._stats["misses"]
+        hits = self._stats["memory_hits"] + self._stats["disk_hits"]
+        return {
+            "enabled": self.enabled,
+            **self._stats,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_bytes,
+            "disk_entries": len(self._disk_index) if self._disk_index is not None else None,
+            "disk_bytes": self._disk_bytes if self._disk_index is not None else None
+        }
+
+    # Memory tier
+
+    def _memory_put(self, key: str, data: bytes, stored_at: float):
+        if len(data) > self.memory_max_bytes:
+            return
+
+        if key in self._memory:
+            self._drop_memory(key)
+
+        self._memory[key] = (data, stored_at)
+        self._memory_bytes += len(data)
+
+        while self._memory_bytes > self.memory_max_bytes and self._memory:
+            oldest = next(iter(self._memory))
+            self._drop_memory(oldest)
+            self._stats["evictions"] += 1
+
+    def _drop_memory(self, key: str):
+        data, _ = self._memory.pop(key)
+        self._memory_bytes -= len(data)
+
+    # Disk tier
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], key)
+
+    async def _ensure_disk_index(self):
+        if self._disk_index is None:
+            self._disk_index = await asyncio.to_thread(self._scan_disk)
+            self._disk_bytes = sum(size for size, _ in self._disk_index.values())
+
+    def _scan_disk(self) -> "OrderedDict[str, Tuple[int, float]]":
+        entries = []
+        if os.path.isdir(self.disk_dir):
+            for root, _, files in os.walk(self.disk_dir):
+                for name in files:
+                    if name.endswith(".tmp"):
+                        continue
+                    try:
+                        st = os.stat(os.path.join(root, name))
+                    except OSError:
+                        continue
+                    entries.append((name, st.st_size, st.st_mtime))
+
+        # Oldest first, taake LRU order sahi rahe
+        entries.sort(key=lambda e: e[2])
+        return OrderedDict((name, (size, mtime)) for name, size, mtime in entries)
+
+    async def _disk_get(self, key: str) -> Optional[Tuple[bytes, float]]:
+        async with self._disk_lock:
+            await self._ensure_disk_index()
+            entry = self._disk_index.get(key)
+            if entry is None:
+                return None
+
+            _, stored_at = entry
+            if self._is_expired(stored_at):
+                await asyncio.to_thread(self._remove_file, key)
+                self._drop_disk(key)
+                self._stats["expirations"] += 1
+                return None
+
+            try:
+                data = await asyncio.to_thread(self._read_file, key)
+            except OSError:
+                self._drop_disk(key)
+                return None
+
+            self._disk_index.move_to_end(key)
+            return data, stored_at
+
+    async def _disk_put(self, key: str, data: bytes, stored_at: float):
+        if len(data) > self.disk_max_bytes:
+            return
+
+        async with self._disk_lock:
+            await self._ensure_disk_index()
+            await asyncio.to_thread(self._write_file, key, data)
+
+            if key in self._disk_index:
+                self._drop_disk(key)
+            self._disk_index[key] = (len(data), stored_at)
+            self._disk_bytes += len(data)
+
+            evicted = []
+            while self._disk_bytes > self.disk_max_bytes and self._disk_index:
+                oldest = next(iter(self._disk_index))
+                self._drop_disk(oldest)
+                evicted.append(oldest)
+
+            if evicted:
+                self._stats["evictions"] += len(evicted)
+                await asyncio.to_thread(self._remove_files, evicted)
+
+    def _drop_disk(self, key: str):
+        size, _ = self._disk_index.pop(key)
+        self._disk_bytes -= size
+
+    def _read_file(self, key: str) -> bytes:
+        with open(self._disk_path(key), "rb") as f:
+            return f.read()
+
+    def _write_file(self, key: str, data: bytes):
+        path = self._disk_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Atomic write: tmp file + rename, taake half-written file kabhi read na ho
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _remove_file(self, key: str):
+        try:
+            os.remove(self._disk_path(key))
+        except OSError:
+            pass
+
+    def _remove_files(self, keys):
+        for key in keys:
+            self._remove_file(key)
+
+
+# Global instance
+generation_cache = GenerationCache()
@@ -0,0 +1,117 @@
+"""
+Client Identity & Quotas
+/generate ka caller kaun hai (registered API key / client IP) aur uski fair-share policy kya hai
+"""
+import os
+import json
+import ipaddress
+from typing import Any, Dict, Optional
+
+from starlette.requests import HTTPConnection
+
+
+# Jin jobs ka client pata nahi (purane journal entries, internal requeue)
+ANONYMOUS_CLIENT = "anonymous"
+
+
+class ClientPolicy:
+    """
+    Ek client ka share aur limits
+
+    weight: fair queuing mein relative share (2 = weight 1 wale se double jobs)
+    max_concurrent: ek waqt mein queued + running tasks (0 = unlimited)
+    per_minute: sliding 60s window mein submissions (0 = unlimited)
+    """
+
+    def __init__(self, weight: float = 1.0, max_concurrent: int = 0, per_minute: int = 0):
+        self.weight = max(0.01, float(weight))
+        self.max_concurrent = max(0, int(max_concurrent))
+        self.per_minute = max(0, int(per_minute))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "weight": self.weight,
+            "max_concurrent": self.max_concurrent,
+            "per_minute": self.per_minute
+        }
+
+
+class ClientRegistry:
+    """
+    Request -> client ID -> ClientPolicy
+
+    Quota identity sirf unhi cheezon par jo caller forge nahi kar sakta:
+    CLIENT_API_KEYS mein registered X-API-Key (uska naam), warna client IP.
+    IP peer address hai, ya CLIENT_IP_HEADER (e.g. X-Forwarded-For) ki last
+    hop agar request CLIENT_TRUSTED_PROXIES mein se kisi proxy se aayi ho.
+    Unknown API keys aur X-Client-ID identity nahi badalte (warna har naya
+    header value naya quota hota) - X-Client-ID sirf label hai.
+    """
+
+    def __init__(self):
+        # Quotas default off: proxy ke peeche saare browser users ek hi IP share karte hain
+        self.default = ClientPolicy(
+            weight=float(os.getenv("CLIENT_DEFAULT_WEIGHT", "1")),
+            max_concurrent=int(os.getenv("CLIENT_MAX_CONCURRENT", "0")),
+            per_minute=int(os.getenv("CLIENT_RATE_PER_MINUTE", "0"))
+        )
+
+        # CLIENT_POLICIES='{"batch-co": {"weight": 1, "max_concurrent": 40}, "web": {"weight": 4}}'
+        self.policies: Dict[str, ClientPolicy] = {}
+        for client_id, overrides in json.loads(os.getenv("CLIENT_POLICIES", "") or "{}").items():
+            self.policies[client_id] = ClientPolicy(**{**self.default.to_dict(), **overrides})
+
+        # CLIENT_API_KEYS="batch-co:sk-abc,web:sk-def" (key -> client naam)
+        self.api_keys: Dict[str, str] = {}
+        for entry in os.getenv("CLIENT_API_KEYS", "").split(","):
+            name, _, key = entry.strip().partition(":")
+            if name and key:
+                self.api_keys[key] = name
+
+        # CLIENT_IP_HEADER="X-Forwarded-For" + CLIENT_TRUSTED_PROXIES="172.16.0.0/12,10.0.0.2"
+        self.ip_header = os.getenv("CLIENT_IP_HEADER", "").strip().lower()
+        self.trusted_proxies = [
+            ipaddress.ip_network(proxy.strip(), strict=False)
+            for proxy in os.getenv("CLIENT_TRUSTED_PROXIES", "").split(",")
+            if proxy.strip()
+        ]
+
+    def identify(self, request: HTTPConnection) -> str:
+        """Request (ya WebSocket) ka client ID (quotas aur fair share isi par)"""
+        name = self.api_keys.get(request.headers.get("x-api-key", ""))
+        if name:
+            return name
+
+        host = self.client_ip(request)
+        if host:
+            return "ip:" + host
+        return ANONYMOUS_CLIENT
+
+    def client_ip(self, request: HTTPConnection) -> Optional[str]:
+        """Peer IP, ya trusted proxy ka forwarded client IP"""
+        peer = request.client.host if request.client else None
+        if self.ip_header and self._is_trusted_proxy(peer):
+            # Last hop trusted proxy ne khud likhi hai; pehle wali caller forge kar sakta hai
+            forwarded = request.headers.get(self.ip_header, "").split(",")[-1].strip()
+            if forwarded:
+                return forwarded
+        return peer
+
+    def _is_trusted_proxy(self, host: Optional[str]) -> bool:
+        try:
+            address = ipaddress.ip_address(host)
+        except (TypeError, ValueError):
+            return False
+        return any(address in network for network in self.trusted_proxies)
+
+    @staticmethod
+    def label(request: HTTPConnection) -> Optional[str]:
+        """X-Client-ID (display / stats ke liye; quota identity nahi)"""
+        return request.headers.get("x-client-id", "").strip()[:64] or None
+
+    def policy(self, client_id: Optional[str]) -> ClientPolicy:
+        return self.policies.get(client_id or ANONYMOUS_CLIENT, self.default)
+
+
+# Global instance
+client_registry = ClientRegistry()
@@ -0,0 +1,235 @@
+"""
+Derivative Image Pipeline
+Generation ke baad thumbnails, WebP/AVIF encodes aur LQIP placeholder banata hai (process pool mein)
+"""
+import os
+import base64
+import asyncio
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+from PIL import Image, ImageFilter
+
+from .blob_store import blob_store
+
+
+FORMAT_CONTENT_TYPES = {
+    "avif": "image/avif",
+    "webp": "image/webp",
+    "jpeg": "image/jpeg",
+    "png": "image/png"
+}
+
+
+def _avif_supported() -> bool:
+    """Pillow 11.2+ mein AVIF built-in hai; purane versions mein pillow-avif-plugin chahiye"""
+    try:
+        import pillow_avif  # noqa: F401
+    except ImportError:
+        pass
+    Image.init()
+    return "AVIF" in Image.SAVE
+
+
+def _encode(img: Image.Image, fmt: str, quality: int) -> bytes:
+    buffered = BytesIO()
+    if fmt == "jpeg":
+        img.convert("RGB").save(buffered, format="JPEG", quality=quality, optimize=True, progressive=True)
+    elif fmt == "png":
+        img.save(buffered, format="PNG", optimize=True)
+    else:
+        img.save(buffered, format=fmt.upper(), quality=quality)
+    return buffered.getvalue()
+
+
+def render_derivatives(
+    data: bytes,
+    sizes: List[int],
+    formats: List[str],
+    quality: int,
+    placeholder_size: int
+) -> Dict[str, Any]:
+    """
+    Worker process mein chalta hai (top-level function = picklable)
+
+    Returns:
+        {"width", "height", "variants": [{"width", "height", "format", "content_type", "data"}],
+         "placeholder": data URI, "blurhash": str ya None}
+    """
+    with Image.open(BytesIO(data)) as source:
+        source.load()
+        has_alpha = source.mode in ("RGBA", "LA") or "transparency" in source.info
+        base = source.convert("RGBA" if has_alpha else "RGB")
+
+    width, height = base.size
+    fallback = "png" if has_alpha else "jpeg"
+    variants = []
+
+    # Original size ke modern encodes + har thumbnail size (modern formats + fallback)
+    targets = [(width, formats)] + [
+        (size, formats + [fallback]) for size in sorted(set(sizes)) if size < max(width, height)
+    ]
+
+    for size, target_formats in targets:
+        img = base
+        if size < max(width, height):
+            img = base.copy()
+            img.thumbnail((size, size), Image.LANCZOS)
+
+        for fmt in target_formats:
+            try:
+                encoded = _encode(img, fmt, quality)
+            except (OSError, KeyError, ValueError):
+                continue  # Encoder available nahi
+            variants.append({
+                "width": img.size[0],
+                "height": img.size[1],
+                "format": fmt,
+                "content_type": FORMAT_CONTENT_TYPES[fmt],
+                "data": encoded
+            })
+
+    # LQIP: chhota blurred preview jo JSON mein inline ja sake
+    tiny = base.copy()
+    tiny.thumbnail((placeholder_size, placeholder_size), Image.BILINEAR)
+    tiny = tiny.filter(ImageFilter.GaussianBlur(radius=1))
+    try:
+        placeholder_bytes, placeholder_type = _encode(tiny, "webp", 40), "image/webp"
+    except (OSError, KeyError, ValueError):
+        placeholder_bytes, placeholder_type = _encode(tiny, "jpeg", 40), "image/jpeg"
+    placeholder = f"data:{placeholder_type};base64,{base64.b64encode(placeholder_bytes).decode()}"
+
+    blurhash_value = None
+    try:
+        import blurhash
+        blurhash_value = blurhash.encode(tiny.convert("RGB"), x_components=4, y_components=3)
+    except Exception:
+        pass  # Optional dependency
+
+    return {
+        "width": width,
+        "height": height,
+        "variants": variants,
+        "placeholder": placeholder,
+        "blurhash": blurhash_value
+    }
+
+
+class DerivativePipeline:
+    """Post-generation derivatives ko process pool mein render karke blob store mein rakhta hai"""
+
+    def __init__(self):
+        self.enabled = os.getenv("DERIVATIVES_ENABLED", "true").lower() == "true"
+        self.sizes = [int(s) for s in os.getenv("DERIVATIVE_SIZES", "256,512").split(",") if s.strip()]
+        self.quality = int(os.getenv("DERIVATIVE_QUALITY", "80"))
+        self.placeholder_size = int(os.getenv("DERIVATIVE_PLACEHOLDER_SIZE", "16"))
+        self.workers = int(os.getenv("DERIVATIVE_WORKERS", "2"))
+
+        requested = [f.strip().lower() for f in os.getenv("DERIVATIVE_FORMATS", "webp,avif").split(",") if f.strip()]
+        avif = _avif_supported()
+        self.formats = [f for f in requested if f in ("webp", "avif") and (f != "avif" or avif)]
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._stats = {"processed": 0, "failed": 0}
+
+    def start(self):
+        if self.enabled and self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def process(self, image_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Image ke derivatives banao aur manifest blob meta mein save karo
+
+        Returns manifest (variants ke blob IDs + placeholder) ya None
+        """
+        if not self.enabled:
+            return None
+
+        existing = await blob_store.get_meta(image_id, "derivatives")
+        if existing:
+            return existing
+
+        data = await blob_store.get(image_id)
+        if data is None:
+            return None
+
+        self.start()
+        loop = asyncio.get_running_loop()
+        try:
+            rendered = await loop.run_in_executor(
+                self._executor,
+                render_derivatives,
+                data,
+                self.sizes,
+                self.formats,
+                self.quality,
+                self.placeholder_size
+            )
+        except Exception as e:
+            self._stats["failed"] += 1
+            print(f"⚠️ Derivative rendering failed for {image_id[:12]}: {e}")
+            return None
+
+        variants = []
+        for variant in rendered["variants"]:
+            blob_id = await blob_store.put(variant.pop("data"), variant["content_type"])
+            variants.append({**variant, "blob_id": blob_id})
+
+        manifest = {
+            "width": rendered["width"],
+            "height": rendered["height"],
+            "variants": variants,
+            "placeholder": rendered["placeholder"],
+            "blurhash": rendered["blurhash"]
+        }
+        await blob_store.put_meta(image_id, "derivatives", manifest)
+        self._stats["processed"] += 1
+        return manifest
+
+    @staticmethod
+    def select(manifest: Dict[str, Any], accept: str, size: Optional[int]) -> Optional[str]:
+        """
+        Accept header aur requested size ke hisaab se best variant ka blob ID
+
+        None = original serve karo
+        """
+        accept = (accept or "").lower()
+        preferred = [fmt for fmt in ("avif", "webp") if FORMAT_CONTENT_TYPES[fmt] in accept]
+
+        full_size = max(manifest["width"], manifest["height"])
+        target = full_size if not size or size >= full_size else size
+
+        # Requested size se bada ya barabar sabse chhota variant
+        candidates = [v for v in manifest["variants"] if max(v["width"], v["height"]) >= target]
+        if not candidates:
+            return None
+        best_size = min(max(v["width"], v["height"]) for v in candidates)
+        sized = [v for v in candidates if max(v["width"], v["height"]) == best_size]
+
+        for fmt in preferred:
+            for variant in sized:
+                if variant["format"] == fmt:
+                    return variant["blob_id"]
+
+        # Modern format accept nahi: thumbnail ka fallback encode, full size par original
+        for variant in sized:
+            if variant["format"] in ("jpeg", "png"):
+                return variant["blob_id"]
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "formats": self.formats,
+            "sizes": self.sizes,
+            **self._stats
+        }
+
+
+# Global instance
+derivative_pipeline = DerivativePipeline()
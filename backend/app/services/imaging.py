@@ -0,0 +1,54 @@
+"""
+Image Helpers
+Format sniffing aur transcoding - heavy PIL kaam event loop se bahar worker pool mein
+"""
+import os
+import asyncio
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from PIL import Image
+
+
+# Magic bytes -> MIME type
+_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"BM", "image/bmp"),
+)
+
+# PIL decode/encode ke liye dedicated pool (PIL zyada tar kaam mein GIL release karta hai)
+image_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("IMAGE_WORKERS", "2")),
+    thread_name_prefix="image-worker"
+)
+
+
+def sniff_image_type(data: bytes) -> Optional[str]:
+    """Header bytes se image ka MIME type pehchanta hai (decode kiye bina)"""
+    for signature, mime in _SIGNATURES:
+        if data.startswith(signature):
+            return mime
+
+    if len(data) >= 12 and data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    if len(data) >= 12 and data[4:8] == b"ftyp" and data[8:12] in (b"avif", b"avis"):
+        return "image/avif"
+
+    return None
+
+
+def transcode_to_png(data: bytes) -> bytes:
+    """Decode + PNG re-encode (blocking - worker pool mein chalayein)"""
+    with Image.open(BytesIO(data)) as img:
+        buffered = BytesIO()
+        img.save(buffered, format="PNG")
+        return buffered.getvalue()
+
+
+async def run_in_image_pool(fn, *args):
+    """Blocking image function ko image_executor mein chalata hai"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(image_executor, fn, *args)
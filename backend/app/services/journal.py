@@ -0,0 +1,213 @@
+"""
+Task Journal
+SQLite (WAL mode) mein task lifecycle record karta hai taake restart ke baad tasks recover ho sakein
+"""
+import os
+import json
+import time
+import sqlite3
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    task_id TEXT PRIMARY KEY,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    image_id TEXT,
+    result TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status);
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    task_id TEXT NOT NULL,
+    node TEXT NOT NULL,
+    data TEXT NOT NULL,
+    at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_events_task ON events(task_id);
+"""
+
+# Journal mein sirf chhote fields jate hain (images blob store mein hain)
+_NODE_FIELDS = ("node_status", "generated_image_id", "iteration_count", "quality_score", "error_message")
+
+
+class TaskJournal:
+    """
+    Write-behind SQLite journal
+
+    Writes memory buffer mein collect hoti hain aur har flush_interval par ek
+    transaction mein commit hoti hain (kam write amplification). Saara SQLite
+    kaam ek dedicated thread par hota hai, event loop par nahi.
+
+    Note: ek journal file ek hi process ki honi chahiye (multiple workers ho to
+    har worker ko alag TASK_JOURNAL_PATH dein).
+    """
+
+    def __init__(self):
+        self.path = os.getenv("TASK_JOURNAL_PATH", "")
+        self.enabled = bool(self.path)
+        self.recovery_mode = os.getenv("JOURNAL_RECOVERY", "requeue").lower()  # requeue | fail
+        self.flush_interval = float(os.getenv("JOURNAL_FLUSH_INTERVAL", "0.2"))
+        self.retention = float(os.getenv("JOURNAL_RETENTION", str(7 * 24 * 3600)))
+
+        self._pending: List[Tuple[str, tuple]] = []
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._conn: Optional[sqlite3.Connection] = None
+        self._writer: Optional[asyncio.Task] = None
+        self._stats = {"writes": 0, "commits": 0}
+
+    # Lifecycle
+
+    async def start(self):
+        if not self.enabled or self._writer is not None:
+            return
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="journal")
+        await self._run(self._open)
+        self._writer = asyncio.create_task(self._write_loop())
+
+    async def close(self):
+        if self._writer is None:
+            return
+        self._writer.cancel()
+        try:
+            await self._writer
+        except asyncio.CancelledError:
+            pass
+        self._writer = None
+
+        await self.flush()
+        await self._run(self._close_conn)
+        self._executor.shutdown(wait=True)
+        self._executor = None
+
+    async def _run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    def _open(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+        # Purane finished tasks saaf karo
+        cutoff = time.time() - self.retention
+        self._conn.execute(
+            "DELETE FROM events WHERE task_id IN "
+            "(SELECT task_id FROM tasks WHERE status IN ('completed', 'failed', 'cancelled') AND updated_at < ?)",
+            (cutoff,)
+        )
+        self._conn.execute(
+            "DELETE FROM tasks WHERE status IN ('completed', 'failed', 'cancelled') AND updated_at < ?",
+            (cutoff,)
+        )
+        self._conn.commit()
+
+    def _close_conn(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    # Recording (non-blocking, buffered)
+
+    def record_created(self, task_id: str, params: Dict[str, Any]):
+        """Naya task; row pehle se ho (requeue / redelivery) to uska status aur image_id rehne do"""
+        if not self.enabled:
+            return
+        now = time.time()
+        self._pending.append((
+            "INSERT OR IGNORE INTO tasks (task_id, params, status, created_at, updated_at) VALUES (?, ?, 'pending', ?, ?)",
+            (task_id, json.dumps(params, default=str), now, now)
+        ))
+
+    def record_node(self, task_id: str, node: str, update: Dict[str, Any]):
+        if not self.enabled:
+            return
+        data = {field: update[field] for field in _NODE_FIELDS if update.get(field) is not None}
+        now = time.time()
+        self._pending.append((
+            "INSERT INTO events (task_id, node, data, at) VALUES (?, ?, ?, ?)",
+            (task_id, node, json.dumps(data, default=str), now)
+        ))
+        if data.get("generated_image_id"):
+            self._pending.append((
+                "UPDATE tasks SET status = 'running', image_id = ?, updated_at = ? WHERE task_id = ?",
+                (data["generated_image_id"], now, task_id)
+            ))
+        else:
+            self._pending.append((
+                "UPDATE tasks SET status = 'running', updated_at = ? WHERE task_id = ?",
+                (now, task_id)
+            ))
+
+    def record_finished(self, task_id: str, status: str, result: Dict[str, Any]):
+        if not self.enabled:
+            return
+        self._pending.append((
+            "UPDATE tasks SET status = ?, image_id = COALESCE(?, image_id), result = ?, updated_at = ? WHERE task_id = ?",
+            (status, result.get("image_id"), json.dumps(result, default=str), time.time(), task_id)
+        ))
+
+    # Flushing
+
+    async def flush(self):
+        if not self._pending or self._executor is None:
+            return
+        batch, self._pending = self._pending, []
+        await self._run(self._write_batch, batch)
+
+    def _write_batch(self, batch: List[Tuple[str, tuple]]):
+        with self._conn:
+            for sql, params in batch:
+                self._conn.execute(sql, params)
+        self._stats["writes"] += len(batch)
+        self._stats["commits"] += 1
+
+    async def _write_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"⚠️ Journal flush failed: {e}")
+
+    # Recovery
+
+    async def load_tasks(self) -> List[Dict[str, Any]]:
+        """Journal ke saare tasks (params + last known state)"""
+        if not self.enabled or self._executor is None:
+            return []
+        return await self._run(self._load_tasks)
+
+    def _load_tasks(self) -> List[Dict[str, Any]]:
+        rows = self._conn.execute(
+            "SELECT task_id, params, status, created_at, image_id, result FROM tasks ORDER BY created_at"
+        ).fetchall()
+        return [
+            {
+                "task_id": task_id,
+                "params": json.loads(params),
+                "status": status,
+                "created_at": created_at,
+                "image_id": image_id,
+                "result": json.loads(result) if result else None
+            }
+            for task_id, params, status, created_at, image_id, result in rows
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "pending": len(self._pending),
+            **self._stats
+        }
+
+
+# Global instance
+task_journal = TaskJournal()
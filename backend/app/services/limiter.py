@@ -0,0 +1,228 @@
+"""
+Adaptive Concurrency Limiter
+Upstream par concurrent requests ko AIMD (additive increase, multiplicative decrease) se control karta hai
+"""
+import time
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After header (seconds ya HTTP-date) ko seconds mein convert karta hai"""
+    if not value:
+        return None
+
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class Permit:
+    """Ek acquired slot; caller isme request ka outcome record karta hai"""
+
+    def __init__(self, started: float):
+        self.started = started
+        self.outcome: Optional[str] = None  # "ok" | "error" | "overload"
+        self.retry_after: Optional[float] = None
+
+    def record_overload(self, retry_after: Optional[float] = None):
+        """429 / timeout - limit multiplicatively kam hogi"""
+        self.outcome = "overload"
+        self.retry_after = retry_after
+
+    def record_error(self):
+        """Non-overload failure (e.g. 5xx) - error rate mein count hota hai"""
+        self.outcome = "error"
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD concurrency controller
+
+    Healthy responses (latency target ke andar, low error rate) par limit har
+    window mein +1 badhti hai; 429 ya timeout par limit backoff factor se cut hoti hai.
+    Limit se zyada requests FIFO queue mein wait karti hain, fail nahi hoti.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial_limit: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 32,
+        backoff_factor: float = 0.5,
+        latency_target: float = 60.0,
+        error_rate_threshold: float = 0.1
+    ):
+        self.name = name
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.backoff_factor = backoff_factor
+        self.latency_target = latency_target
+        self.error_rate_threshold = error_rate_threshold
+
+        self._limit = float(min(max(initial_limit, self.min_limit), self.max_limit))
+        self.in_flight = 0
+        self._waiters: "deque[asyncio.Future]" = deque()
+
+        self._blocked_until = 0.0
+        self._unblock_handle: Optional[asyncio.TimerHandle] = None
+        self._last_decrease = 0.0
+
+        # EWMA of latency and error rate (alpha = 0.1)
+        self._latency_ewma: Optional[float] = None
+        self._error_rate = 0.0
+
+        self._stats = {
+            "successes": 0,
+            "errors": 0,
+            "overloads": 0,
+            "increases": 0,
+            "decreases": 0
+        }
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @asynccontextmanager
+    async def acquire(self):
+        """
+        Slot milne tak wait karta hai
+
+        Usage:
+            async with limiter.acquire() as permit:
+                response = await client.post(...)
+                if response.status_code == 429:
+                    permit.record_overload(retry_after)
+        """
+        await self._acquire_slot()
+        permit = Permit(time.monotonic())
+        try:
+            yield permit
+        except asyncio.CancelledError:
+            # Cancelled request ka koi signal nahi - limit adjust mat karo
+            permit.outcome = "cancelled"
+            raise
+        except Exception:
+            if permit.outcome is None:
+                permit.outcome = "error"
+            raise
+        finally:
+            self._release_slot()
+            self._record(permit)
+
+    def _can_admit(self) -> bool:
+        return self.in_flight < self.limit and time.monotonic() >= self._blocked_until
+
+    async def _acquire_slot(self):
+        if not self._waiters and self._can_admit():
+            self.in_flight += 1
+            return
+
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        self._wake()
+
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                # Slot mil chuka tha lekin caller chala gaya - wapas karo
+                self._release_slot()
+            else:
+                try:
+                    self._waiters.remove(fut)
+                except ValueError:
+                    pass
+            raise
+
+    def _release_slot(self):
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self):
+        """Free slots FIFO order mein waiters ko hand over karta hai"""
+        remaining_block = self._blocked_until - time.monotonic()
+        if remaining_block > 0:
+            if self._unblock_handle is None and self._waiters:
+                loop = asyncio.get_running_loop()
+                self._unblock_handle = loop.call_later(remaining_block, self._unblock)
+            return
+
+        while self._waiters and self.in_flight < self.limit:
+            fut = self._waiters.popleft()
+            if fut.done():
+                continue
+            self.in_flight += 1
+            fut.set_result(None)
+
+    def _unblock(self):
+        self._unblock_handle = None
+        self._wake()
+
+    def _record(self, permit: Permit):
+        if permit.outcome == "cancelled":
+            return
+
+        now = time.monotonic()
+        latency = now - permit.started
+        outcome = permit.outcome or "ok"
+
+        self._latency_ewma = latency if self._latency_ewma is None else 0.9 * self._latency_ewma + 0.1 * latency
+        self._error_rate = 0.9 * self._error_rate + 0.1 * (0.0 if outcome == "ok" else 1.0)
+
+        if outcome == "overload":
+            self._stats["overloads"] += 1
+
+            if permit.retry_after:
+                self._blocked_until = max(self._blocked_until, now + permit.retry_after)
+
+            # Ek hi burst ke multiple 429s par baar baar cut na karo:
+            # sirf un requests ka signal lo jo last decrease ke baad start hui thi
+            if permit.started >= self._last_decrease:
+                self._limit = max(float(self.min_limit), self._limit * self.backoff_factor)
+                self._last_decrease = now
+                self._stats["decreases"] += 1
+            return
+
+        if outcome == "error":
+            self._stats["errors"] += 1
+            return
+
+        self._stats["successes"] += 1
+        healthy = latency <= self.latency_target and self._error_rate <= self.error_rate_threshold
+        if healthy and self._limit < self.max_limit:
+            previous = self.limit
+            # Additive increase: poori window successful ho to +1
+            self._limit = min(float(self.max_limit), self._limit + 1.0 / self._limit)
+            if self.limit > previous:
+                self._stats["increases"] += 1
+                self._wake()
+
+    def stats(self) -> Dict[str, Any]:
+        """Monitoring ke liye current state"""
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "waiters": len(self._waiters),
+            "blocked_for": round(max(0.0, self._blocked_until - time.monotonic()), 3),
+            "latency_ewma": round(self._latency_ewma, 3) if self._latency_ewma is not None else None,
+            "error_rate": round(self._error_rate, 4),
+            **self._stats
+        }
@@ -0,0 +1,370 @@
+"""
+Redis Task Store
+Multiple uvicorn workers / replicas ke beech shared task state (Redis protocol)
+"""
+import os
+import json
+import asyncio
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .task_store import (
+    TaskStore,
+    ChangeNotifier,
+    PatchFanout,
+    TERMINAL_STATUSES,
+    created_timestamp,
+    encode_cursor,
+    decode_cursor
+)
+
+
+def create_redis_client():
+    """
+    REDIS_URL se async client banata hai
+
+    redis package optional hai - sirf redis backends ke liye chahiye
+    """
+    try:
+        import redis.asyncio as redis
+    except ImportError:
+        raise RuntimeError("Redis backends require the 'redis' package: pip install redis")
+
+    return redis.from_url(
+        os.getenv("REDIS_URL", "redis://localhost:6379/0"),
+        decode_responses=True
+    )
+
+
+# Atomic patch: exists/status check + HSET + TTL + PUBLISH ek hi round trip mein
+#
+# Status badle to status index (sorted set) bhi isi script mein move hota hai.
+#
+# KEYS[1] = task hash
+# KEYS[2] = created index (sorted set, score = created timestamp)
+# ARGV[1] = TTL seconds (-1 = persist, 0 = unchanged)
+# ARGV[2] = pub/sub channel
+# ARGV[3] = patch JSON object (publish ke liye; naya version isme prepend hota hai)
+# ARGV[4] = allowed statuses JSON list ("" = no condition)
+# ARGV[5] = task ID
+# ARGV[6] = status index key prefix
+# ARGV[7..] = field, value pairs
+_UPDATE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return nil
+end
+if ARGV[4] ~= '' then
+    local current = redis.call('HGET', KEYS[1], 'status')
+    local allowed = cjson.decode(ARGV[4])
+    local ok = false
+    for _, status in ipairs(allowed) do
+        if current == cjson.encode(status) then ok = true end
+    end
+    if not ok then
+        return nil
+    end
+end
+local old_status = redis.call('HGET', KEYS[1], 'status')
+redis.call('HSET', KEYS[1], unpack(ARGV, 7))
+local version = redis.call('HINCRBY', KEYS[1], 'version', 1)
+local new_status = redis.call('HGET', KEYS[1], 'status')
+if old_status ~= new_status then
+    local created = redis.call('ZSCORE', KEYS[2], ARGV[5])
+    if old_status then
+        redis.call('ZREM', ARGV[6] .. cjson.decode(old_status), ARGV[5])
+    end
+    if new_status and created then
+        redis.call('ZADD', ARGV[6] .. cjson.decode(new_status), created, ARGV[5])
+    end
+end
+local ttl = tonumber(ARGV[1])
+if ttl > 0 then
+    redis.call('EXPIRE', KEYS[1], ttl)
+elseif ttl < 0 then
+    redis.call('PERSIST', KEYS[1])
+end
+redis.call('PUBLISH', ARGV[2], '{"version": ' .. version .. ', ' .. string.sub(ARGV[3], 2))
+return redis.call('HGETALL', KEYS[1])
+"""
+
+
+class RedisTaskStore(TaskStore):
+    """
+    Redis-backed TaskStore
+
+    Har task ek hash hai (field values JSON-encoded), updates Lua script se
+    atomic hain aur har patch task ke channel par publish hota hai. Terminal
+    tasks Redis EXPIRE se TTL par khud hat jate hain; memory budget Redis ki
+    maxmemory policy handle karti hai.
+
+    `client` koi bhi redis.asyncio-compatible client ho sakta hai - tests mein
+    in-process stand-in (e.g. fakeredis.aioredis.FakeRedis) pass karein.
+    """
+
+    def __init__(
+        self,
+        client,
+        completed_ttl: float,
+        failed_ttl: float,
+        sweep_interval: float,
+        prefix: str = "aivision"
+    ):
+        self.redis = client
+        self.completed_ttl = completed_ttl
+        self.failed_ttl = failed_ttl
+        self.sweep_interval = sweep_interval
+        self.prefix = prefix
+
+        self._update_script = self.redis.register_script(_UPDATE_SCRIPT)
+        self._sweeper: Optional[asyncio.Task] = None
+
+        # Long-poll waiters aur status streams: poore process ke liye ek pattern
+        # subscription (per-request pubsub connection nahi), local fan-out
+        self._changes = ChangeNotifier()
+        self._patches = PatchFanout()
+        self._change_feed: Optional[asyncio.Task] = None
+        self._change_feed_ready: Optional[asyncio.Event] = None
+
+    # Keys
+
+    def _key(self, task_id: str) -> str:
+        return f"{self.prefix}:task:{task_id}"
+
+    def _channel(self, task_id: str) -> str:
+        return f"{self.prefix}:task:{task_id}:events"
+
+    @property
+    def _index_key(self) -> str:
+        # Sorted set: task_id -> created timestamp (listing, counting + sweeping)
+        return f"{self.prefix}:tasks"
+
+    @property
+    def _status_prefix(self) -> str:
+        # Har status ka sorted set: {prefix}:tasks:status:{status}
+        return f"{self.prefix}:tasks:status:"
+
+    # Encoding
+
+    @staticmethod
+    def _encode(fields: Dict[str, Any]) -> Dict[str, str]:
+        return {name: json.dumps(value, default=str) for name, value in fields.items()}
+
+    @staticmethod
+    def _decode(raw) -> Dict[str, Any]:
+        if isinstance(raw, list):
+            raw = dict(zip(raw[::2], raw[1::2]))
+        return {name: json.loads(value) for name, value in raw.items()}
+
+    def _ttl_for(self, status: Optional[str]) -> int:
+        if status in TERMINAL_STATUSES:
+            return max(1, int(self.completed_ttl if status == "completed" else self.failed_ttl))
+        return -1
+
+    # TaskStore interface
+
+    async def create(self, task_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        key = self._key(task_id)
+        previous = await self.redis.hget(key, "status")
+        created_ts = created_timestamp(data)
+        data = {**data, "version": 1}
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(key)
+            pipe.hset(key, mapping=self._encode(data))
+            ttl = self._ttl_for(data.get("status"))
+            if ttl > 0:
+                pipe.expire(key, ttl)
+            if previous is not None:
+                pipe.zrem(self._status_prefix + json.loads(previous), task_id)
+            pipe.zadd(self._index_key, {task_id: created_ts})
+            pipe.zadd(self._status_prefix + data.get("status", "unknown"), {task_id: created_ts})
+            await pipe.execute()
+        return dict(data)
+
+    async def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        raw = await self.redis.hgetall(self._key(task_id))
+        if not raw:
+            return None
+        return self._decode(raw)
+
+    async def update(
+        self,
+        task_id: str,
+        if_status: Optional[Iterable[str]] = None,
+        **fields
+    ) -> Optional[Dict[str, Any]]:
+        if not fields:
+            return await self.get(task_id)
+
+        ttl = self._ttl_for(fields["status"]) if "status" in fields else 0
+        args = [
+            ttl,
+            self._channel(task_id),
+            json.dumps({"task_id": task_id, **fields}, default=str),
+            json.dumps(list(if_status)) if if_status is not None else "",
+            task_id,
+            self._status_prefix
+        ]
+        for name, value in self._encode(fields).items():
+            args.extend([name, value])
+
+        raw = await self._update_script(keys=[self._key(task_id), self._index_key], args=args)
+        if not raw:
+            return None
+        return self._decode(raw)
+
+    async def delete(self, task_id: str) -> bool:
+        status = await self.redis.hget(self._key(task_id), "status")
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(self._key(task_id))
+            pipe.zrem(self._index_key, task_id)
+            if status is not None:
+                pipe.zrem(self._status_prefix + json.loads(status), task_id)
+            deleted = (await pipe.execute())[0]
+        self._changes.notify(task_id)
+        return bool(deleted)
+
+    async def exists(self, task_id: str) -> bool:
+        return bool(await self.redis.exists(self._key(task_id)))
+
+    async def list_tasks(
+        self,
+        status: Optional[str] = None,
+        created_after: Optional[float] = None,
+        created_before: Optional[float] = None,
+        prompt_contains: Optional[str] = None,
+        limit: int = 50,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        index_key = self._status_prefix + status if status is not None else self._index_key
+        after = decode_cursor(cursor) if cursor is not None else None
+
+        max_score = "+inf" if created_before is None else f"({created_before}"
+        if after is not None and (created_before is None or after[0] < created_before):
+            max_score = after[0]
+        min_score = "-inf" if created_after is None else created_after
+
+        needle = prompt_contains.lower() if prompt_contains else None
+        batch_size = max(limit, 50)
+        offset = 0
+        results: List[Dict[str, Any]] = []
+        last = None
+
+        while len(results) < limit:
+            entries = await self.redis.zrevrangebyscore(
+                index_key, max_score, min_score, start=offset, num=batch_size, withscores=True
+            )
+            if not entries:
+                return results, None
+            offset += len(entries)
+            exhausted = len(entries) < batch_size  # index mein is batch ke baad kuch nahi
+
+            # Same-score ties cursor se pehle wale skip karo (order: score, member desc)
+            if after is not None:
+                entries = [(task_id, score) for task_id, score in entries if (score, task_id) < after]
+
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for task_id, _ in entries:
+                    pipe.hgetall(self._key(task_id))
+                raws = await pipe.execute()
+
+            for index, ((task_id, score), raw) in enumerate(zip(entries, raws)):
+                if not raw:
+                    continue  # TTL se expire ho chuka (sweep index saaf karega)
+                record = self._decode(raw)
+                if needle and needle not in (record.get("prompt") or "").lower():
+                    continue
+                results.append(record)
+                last = (score, task_id)
+                if len(results) >= limit:
+                    exhausted = exhausted and index == len(entries) - 1
+                    break
+
+        # Last page par cursor nahi (client ko khali page fetch na karna pade)
+        return results, None if exhausted else encode_cursor(*last)
+
+    async def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "redis",
+            "count": await self.redis.zcard(self._index_key),
+            "bytes": None,  # Redis INFO memory dekhein
+            "long_poll_waiters": len(self._changes),
+            "stream": self._patches.stats()
+        }
+
+    async def _watch_changes(self):
+        """Pehle long-poll / stream par change feed start karo aur subscribe hone tak ruko"""
+        if self._change_feed is None or self._change_feed.done():
+            self._change_feed_ready = asyncio.Event()
+            self._change_feed = asyncio.create_task(self._change_feed_loop(self._change_feed_ready))
+        await self._change_feed_ready.wait()
+
+    async def _change_feed_loop(self, ready: asyncio.Event):
+        """Saare task channels (kisi bhi process ke updates) -> local waiters aur subscribers"""
+        head, tail = f"{self.prefix}:task:", ":events"
+        pubsub = self.redis.pubsub()
+        try:
+            await pubsub.psubscribe(self._channel("*"))
+            ready.set()
+            async for message in pubsub.listen():
+                if message.get("type") == "pmessage":
+                    channel = message["channel"]
+                    if isinstance(channel, bytes):
+                        channel = channel.decode()
+                    task_id = channel[len(head):-len(tail)]
+                    self._changes.notify(task_id)
+                    if self._patches.has(task_id):
+                        self._patches.publish(task_id, json.loads(message["data"]))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"⚠️ Task change feed failed: {e}")
+        finally:
+            # Long-poll waiters apne timeout par current record le lenge; stream
+            # subscribers resync karte hue feed restart karte hain
+            ready.set()
+            self._patches.resync_all()
+            await pubsub.aclose()
+
+    async def start(self):
+        if self._sweeper is None and self.sweep_interval > 0:
+            self._sweeper = asyncio.create_task(self._sweep_loop())
+
+    async def close(self):
+        for task in (self._sweeper, self._change_feed):
+            if task is None:
+                continue
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._sweeper = None
+        self._change_feed = None
+        await self.redis.aclose()
+
+    async def sweep(self) -> int:
+        """Index se un tasks ko hatao jinka hash TTL se expire ho chuka hai"""
+        removed = 0
+        cursor = 0
+        while True:
+            cursor, entries = await self.redis.zscan(self._index_key, cursor, count=500)
+            task_ids = [task_id for task_id, _ in entries]
+            if task_ids:
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    for task_id in task_ids:
+                        pipe.exists(self._key(task_id))
+                    alive = await pipe.execute()
+                stale = [task_id for task_id, present in zip(task_ids, alive) if not present]
+                if stale:
+                    removed += await self.redis.zrem(self._index_key, *stale)
+                    async for status_key in self.redis.scan_iter(match=self._status_prefix + "*"):
+                        await self.redis.zrem(status_key, *stale)
+            if cursor == 0:
+                return removed
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                print(f"⚠️ Redis task index sweep failed: {e}")
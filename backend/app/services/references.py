@@ -0,0 +1,181 @@
+"""
+Reference Image Service
+Reference uploads ko stream karke disk par spool, validate/downscale (worker thread) aur blob store mein rakhta hai
+"""
+import os
+import asyncio
+import hashlib
+import tempfile
+from collections import OrderedDict
+from io import BytesIO
+from typing import Any, AsyncIterator, BinaryIO, Dict, List, Optional, Tuple
+from PIL import Image
+
+from .blob_store import blob_store
+from .imaging import run_in_image_pool
+
+
+class ReferenceTooLarge(Exception):
+    """Upload size limit se bada hai (HTTP 413)"""
+
+
+class InvalidReferenceImage(ValueError):
+    """Upload valid image nahi hai (HTTP 400)"""
+
+
+def prepare_reference(source: BinaryIO, max_dimension: int, max_pixels: int) -> Tuple[bytes, str, int, int]:
+    """
+    Validate + downscale (blocking - worker thread mein chalayein)
+
+    Returns (bytes, content_type, width, height)
+    """
+    source.seek(0)
+    try:
+        img = Image.open(source)
+        width, height = img.size
+        if width * height > max_pixels:
+            raise InvalidReferenceImage(f"Image too large: {width}x{height} pixels")
+
+        # JPEG ko seedha reduced scale par decode karo (kam memory)
+        if max(width, height) > max_dimension:
+            img.draft("RGB", (max_dimension, max_dimension))
+        img.load()
+    except InvalidReferenceImage:
+        raise
+    except Exception as e:
+        raise InvalidReferenceImage(f"Invalid image: {e}")
+
+    # Already chhoti aur common format: bytes jaise hain waise rakh lo
+    if max(width, height) <= max_dimension and img.format in ("PNG", "JPEG", "WEBP"):
+        source.seek(0)
+        return source.read(), Image.MIME[img.format], width, height
+
+    if max(img.size) > max_dimension:
+        img.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+
+    has_alpha = img.mode in ("RGBA", "LA", "P") and ("A" in img.getbands() or "transparency" in img.info)
+    buffered = BytesIO()
+    if has_alpha:
+        img.convert("RGBA").save(buffered, format="PNG", optimize=True)
+        content_type = "image/png"
+    else:
+        img.convert("RGB").save(buffered, format="JPEG", quality=90)
+        content_type = "image/jpeg"
+
+    return buffered.getvalue(), content_type, img.size[0], img.size[1]
+
+
+class ReferenceImageService:
+    """Reference uploads -> blob handles (repeated uploads dobara process nahi hote)"""
+
+    def __init__(self):
+        self.max_bytes = int(float(os.getenv("REFERENCE_MAX_MB", "10")) * 1024 * 1024)
+        self.max_dimension = int(os.getenv("REFERENCE_MAX_DIMENSION", "1024"))
+        self.max_pixels = int(os.getenv("REFERENCE_MAX_PIXELS", str(50_000_000)))
+        self.spool_bytes = 1024 * 1024  # Isse bade uploads disk par spool hote hain
+        self.flush_bytes = 256 * 1024  # Itne bytes jama hone par thread mein spool write
+
+        # Raw upload hash -> processed reference info
+        self._index: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._index_size = int(os.getenv("REFERENCE_CACHE_ENTRIES", "1024"))
+        self._stats = {"uploads": 0, "reused": 0, "rejected": 0}
+
+    async def limit_stream(self, stream: AsyncIterator[bytes], declared_length: Optional[str] = None) -> AsyncIterator[bytes]:
+        """Stream ko pass-through karta hai, max_bytes cross hote hi ReferenceTooLarge"""
+        if declared_length and declared_length.isdigit() and int(declared_length) > self.max_bytes:
+            self._stats["rejected"] += 1
+            raise ReferenceTooLarge(f"Upload exceeds {self.max_bytes} bytes")
+
+        received = 0
+        async for chunk in stream:
+            received += len(chunk)
+            if received > self.max_bytes:
+                self._stats["rejected"] += 1
+                raise ReferenceTooLarge(f"Upload exceeds {self.max_bytes} bytes")
+            yield chunk
+
+    async def ingest_stream(self, stream: AsyncIterator[bytes]) -> Dict[str, Any]:
+        """
+        Raw image body: chunks spooled file mein likho (hash saath mein), phir ingest
+
+        Chunks memory mein jama hote hain aur flush_bytes par thread mein
+        flush hote hain - disk rollover / write event loop ko block nahi karta.
+        """
+        digest = hashlib.sha256()
+        with tempfile.SpooledTemporaryFile(max_size=self.spool_bytes) as spool:
+            pending: List[bytes] = []
+            pending_bytes = 0
+            async for chunk in stream:
+                pending.append(chunk)
+                pending_bytes += len(chunk)
+                if pending_bytes >= self.flush_bytes:
+                    await asyncio.to_thread(_spool_chunks, spool, digest, pending)
+                    pending, pending_bytes = [], 0
+            if pending:
+                await asyncio.to_thread(_spool_chunks, spool, digest, pending)
+            return await self._ingest(spool, digest.hexdigest())
+
+    async def ingest_file(self, source: BinaryIO) -> Dict[str, Any]:
+        """Already-spooled file (e.g. multipart UploadFile) ingest karo"""
+        digest = await run_in_image_pool(_hash_file, source)
+        return await self._ingest(source, digest)
+
+    async def ingest_bytes(self, data: bytes) -> Dict[str, Any]:
+        """Legacy base64 reference_image ke liye"""
+        if len(data) > self.max_bytes:
+            self._stats["rejected"] += 1
+            raise ReferenceTooLarge(f"Upload exceeds {self.max_bytes} bytes")
+        return await self._ingest(BytesIO(data), hashlib.sha256(data).hexdigest())
+
+    async def _ingest(self, source: BinaryIO, raw_hash: str) -> Dict[str, Any]:
+        self._stats["uploads"] += 1
+
+        cached = self._index.get(raw_hash)
+        if cached is not None and await blob_store.stat(cached["reference_id"]) is not None:
+            self._index.move_to_end(raw_hash)
+            self._stats["reused"] += 1
+            return {**cached, "reused": True}
+
+        try:
+            data, content_type, width, height = await run_in_image_pool(
+                prepare_reference, source, self.max_dimension, self.max_pixels
+            )
+        except InvalidReferenceImage:
+            self._stats["rejected"] += 1
+            raise
+
+        reference_id = await blob_store.put(data, content_type)
+        info = {
+            "reference_id": reference_id,
+            "content_type": content_type,
+            "width": width,
+            "height": height,
+            "size": len(data)
+        }
+
+        self._index[raw_hash] = info
+        while len(self._index) > self._index_size:
+            self._index.popitem(last=False)
+
+        return {**info, "reused": False}
+
+    def stats(self) -> Dict[str, Any]:
+        return {"cached": len(self._index), **self._stats}
+
+
+def _spool_chunks(spool: BinaryIO, digest, chunks: List[bytes]):
+    for chunk in chunks:
+        digest.update(chunk)
+        spool.write(chunk)
+
+
+def _hash_file(source: BinaryIO) -> str:
+    source.seek(0)
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: source.read(64 * 1024), b""):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+# Global instance
+reference_service = ReferenceImageService()
@@ -0,0 +1,115 @@
+"""
+Retry & Hedging Helpers
+Transient upstream failures ke liye jittered backoff, per-task budget aur hedged requests
+"""
+import random
+import asyncio
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+
+T = TypeVar("T")
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter"""
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.5, max_delay: float = 10.0):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def backoff(self, attempt: int) -> float:
+        """attempt 0-based hai; delay = uniform(0, min(cap, base * 2^attempt))"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+class RetryBudget:
+    """
+    Per-task retry budget
+
+    Ek task ke saare iterations milke isse zyada retries nahi kar sakte,
+    taake ek kharab upstream poore task ko minutes tak retry loop mein na rakhe.
+    """
+
+    def __init__(self, remaining: int):
+        self.remaining = max(0, remaining)
+        self.spent = 0
+
+    def try_spend(self) -> bool:
+        if self.remaining <= 0:
+            return False
+        self.remaining -= 1
+        self.spent += 1
+        return True
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies (percentiles ke liye)"""
+
+    def __init__(self, window: int = 200):
+        self._samples: "deque[float]" = deque(maxlen=window)
+
+    def observe(self, seconds: float):
+        self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+        return ordered[index]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "samples": len(self._samples),
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99)
+        }
+
+
+async def hedged(
+    fn: Callable[[], Awaitable[T]],
+    hedge_after: Optional[float],
+    on_hedge: Optional[Callable[[], None]] = None
+) -> T:
+    """
+    Hedged request: primary hedge_after seconds mein complete na ho to
+    doosri copy start karo; jo pehle successfully complete ho wo jeetti hai,
+    doosri cancel ho jati hai.
+    """
+    primary = asyncio.create_task(fn())
+    tasks = {primary}
+
+    try:
+        if hedge_after is None:
+            return await primary
+
+        done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+        if not done:
+            tasks.add(asyncio.create_task(fn()))
+            if on_hedge:
+                on_hedge()
+
+        pending = set(tasks)
+        last_error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.cancelled():
+                    continue
+                if task.exception() is None:
+                    return task.result()
+                last_error = task.exception()
+
+        raise last_error if last_error else asyncio.CancelledError()
+
+    finally:
+        # Loser (ya outer cancel par dono) ko cancel karo
+        for task in tasks:
+            if not task.done():
+                task.cancel()
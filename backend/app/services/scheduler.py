@@ -0,0 +1,304 @@
+"""
+Job Scheduler
+Broker se jobs nikal kar fixed worker pool mein chalata hai - saturation par naye jobs 429 se reject hote hain
+"""
+import os
+import time
+import socket
+import asyncio
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .broker import Broker, InProcessBroker, QueueFull, QuotaExceeded, job_broker
+from .clients import ANONYMOUS_CLIENT, client_registry
+
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+
+class JobScheduler:
+    """
+    Producer (submit) + optional consumer (N worker coroutines)
+
+    WORKER_MODE=inline: API process khud jobs chalata hai (default).
+    WORKER_MODE=external: API sirf enqueue karta hai; `python -m app.worker`
+    processes shared broker (BROKER_BACKEND=redis) se jobs consume karte hain.
+    """
+
+    def __init__(self, broker: Broker):
+        self.broker = broker
+        self.mode = os.getenv("WORKER_MODE", "inline").lower()
+        self.workers = int(os.getenv("SCHEDULER_WORKERS", "4"))
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.heartbeat_interval = 10.0
+
+        self.handler: Optional[JobHandler] = None
+        self._running: Dict[str, asyncio.Task] = {}  # task_id -> job task
+        self._workers: List[asyncio.Task] = []
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._cancel_listener: Optional[asyncio.Task] = None
+
+        self._stats = {"accepted": 0, "rejected": 0, "completed": 0, "failed": 0, "cancelled": 0}
+
+        # Per-client counters + queue wait (is process ka view; recent clients tak bounded)
+        self._clients: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.max_tracked_clients = 1000
+
+    @property
+    def consuming(self) -> bool:
+        """Kya ye process jobs execute karta hai"""
+        return self.handler is not None
+
+    # Lifecycle
+
+    async def start(self, handler: Optional[JobHandler] = None):
+        """Broker start; handler diya ho to worker pool bhi"""
+        if self.mode == "external" and isinstance(self.broker, InProcessBroker):
+            raise RuntimeError("WORKER_MODE=external requires a shared broker (BROKER_BACKEND=redis)")
+
+        await self.broker.start()
+        if handler is None or self._workers:
+            return
+        self.handler = handler
+        await self.broker.heartbeat(self.worker_id, self.workers)
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"job-worker-{n}")
+            for n in range(self.workers)
+        ]
+        self._heartbeat = asyncio.create_task(self._heartbeat_loop())
+        self._cancel_listener = asyncio.create_task(self._cancel_loop())
+
+    async def close(self):
+        # Running jobs bhi: unke CancelledError handlers (journal / checkpoint writes)
+        # broker aur journal band hone se pehle poore hon
+        jobs = list(self._running.values())
+        tasks = self._workers + [task for task in (self._heartbeat, self._cancel_listener) if task]
+        for task in tasks + jobs:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await asyncio.gather(*jobs, return_exceptions=True)
+        self._workers = []
+        self._heartbeat = None
+        self._cancel_listener = None
+        if self.consuming:
+            await self.broker.heartbeat(self.worker_id, 0)
+        await self.broker.close()
+
+    # Admission
+
+    async def admit(self, client: str = ANONYMOUS_CLIENT):
+        """
+        Cheap early check (kaam shuru karne se pehle)
+
+        Saturated ho to QueueFull, client apne quota par ho to QuotaExceeded.
+        """
+        try:
+            if await self.broker.depth() >= self.broker.max_depth:
+                raise await self.broker.queue_full()
+            await self.broker.check_quota(client, client_registry.policy(client))
+        except QueueFull as e:
+            self._count_rejection(client, e)
+            raise
+
+    async def submit(
+        self,
+        task_id: str,
+        params: Dict[str, Any],
+        priority: int = 0,
+        client: Optional[str] = None
+    ):
+        """
+        Job broker mein daalo (depth + quota check broker mein atomic hai)
+
+        Raises QueueFull agar max depth reach ho chuki ho, QuotaExceeded agar
+        client ka concurrent / per-minute quota khatam ho.
+        """
+        client = client or ANONYMOUS_CLIENT
+        job = {
+            "task_id": task_id,
+            "priority": priority,
+            "client": client,
+            "enqueued_at": time.time(),
+            "params": params
+        }
+        try:
+            await self.broker.enqueue(job, client_registry.policy(client))
+        except QueueFull as e:
+            self._count_rejection(client, e)
+            raise
+        self._stats["accepted"] += 1
+        self._client_stats(client)["accepted"] += 1
+
+    def _count_rejection(self, client: str, error: QueueFull):
+        self._stats["rejected"] += 1
+        key = "quota_rejected" if isinstance(error, QuotaExceeded) else "rejected"
+        self._client_stats(client)[key] += 1
+
+    def _client_stats(self, client: str) -> Dict[str, Any]:
+        stats = self._clients.get(client)
+        if stats is None:
+            stats = {
+                "accepted": 0, "rejected": 0, "quota_rejected": 0,
+                "completed": 0, "failed": 0, "cancelled": 0,
+                "running": 0, "waits": 0, "wait_total": 0.0, "wait_max": 0.0
+            }
+            self._clients[client] = stats
+            if len(self._clients) > self.max_tracked_clients:
+                self._clients.popitem(last=False)
+        else:
+            self._clients.move_to_end(client)
+        return stats
+
+    # Cancellation
+
+    async def cancel(self, task_id: str) -> bool:
+        """
+        Job cancel karo: queue se nikaalo, local run abort karo, warna
+        broker ke through doosre worker processes ko signal bhejo
+        """
+        removed = await self.broker.remove(task_id)
+        aborted = self._cancel_local(task_id)
+        if not removed and not aborted:
+            await self.broker.publish_cancel(task_id)
+        return removed or aborted
+
+    def _cancel_local(self, task_id: str) -> bool:
+        job_task = self._running.get(task_id)
+        if job_task is None or job_task.done():
+            return False
+        # CancelledError graph -> node -> in-flight httpx request tak propagate hota hai
+        job_task.cancel()
+        return True
+
+    async def _cancel_loop(self):
+        while True:
+            try:
+                async for task_id in self.broker.cancellations():
+                    self._cancel_local(task_id)
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Cancel listener failed: {e}")
+                await asyncio.sleep(1)
+
+    # Introspection
+
+    async def estimate(
+        self,
+        task_id: str,
+        started_at: Optional[float] = None,
+        finish_at: Optional[float] = None
+    ) -> Tuple[Optional[int], Optional[float]]:
+        """
+        (queue_position, eta_seconds)
+
+        started_at (epoch) running task ke liye - record se aata hai taake
+        external workers ke jobs ka ETA bhi API process de sake. finish_at
+        (last node transition ka estimate) ho to wahi use hota hai.
+        """
+        if started_at is not None and finish_at is not None:
+            return None, round(max(0.0, finish_at - time.time()), 1)
+
+        capacity, duration = await self.broker.capacity_and_duration()
+        if started_at is not None:
+            return None, round(max(0.0, duration - (time.time() - started_at)), 1)
+
+        position = await self.broker.position(task_id)
+        if position is None:
+            return None, None
+        # Aage wale jobs workers mein "waves" mein chalenge, phir apna run
+        waves = -(-position // max(1, capacity))
+        return position, round(waves * duration + duration, 1)
+
+    def client_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-client rejections aur queue wait (avg / max seconds)"""
+        report = {}
+        for client, stats in self._clients.items():
+            waits = stats["waits"]
+            report[client] = {
+                "policy": client_registry.policy(client).to_dict(),
+                **{k: v for k, v in stats.items() if k not in ("waits", "wait_total", "wait_max")},
+                "avg_wait": round(stats["wait_total"] / waits, 2) if waits else None,
+                "max_wait": round(stats["wait_max"], 2) if waits else None
+            }
+        return report
+
+    async def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "workers": self.workers if self.consuming else 0,
+            "running": len(self._running),
+            **await self.broker.stats(),
+            **self._stats,
+            "clients": self.client_stats()
+        }
+
+    # Workers
+
+    async def _worker(self):
+        while True:
+            try:
+                job = await self.broker.dequeue()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Transient broker error (e.g. Redis connection reset): worker zinda rahe
+                print(f"⚠️ Job dequeue failed: {e}")
+                await asyncio.sleep(1)
+                continue
+            task_id = job["task_id"]
+            client = job.get("client") or ANONYMOUS_CLIENT
+            started_at = time.monotonic()
+
+            client_stats = self._client_stats(client)
+            wait = max(0.0, time.time() - job.get("enqueued_at", time.time()))
+            client_stats["waits"] += 1
+            client_stats["wait_total"] += wait
+            client_stats["wait_max"] = max(client_stats["wait_max"], wait)
+            client_stats["running"] += 1
+
+            # Job alag task mein chalta hai taake sirf wahi cancel ho, worker nahi
+            job_task = asyncio.create_task(self.handler(job))
+            self._running[task_id] = job_task
+            try:
+                await asyncio.wait({job_task})
+                if job_task.cancelled():
+                    outcome = "cancelled"
+                elif job_task.exception() is not None:
+                    outcome = "failed"
+                    print(f"⚠️ Job {task_id} failed: {job_task.exception()}")
+                else:
+                    outcome = "completed"
+                self._stats[outcome] += 1
+                client_stats[outcome] += 1
+            except asyncio.CancelledError:
+                # Worker shutdown: running job bhi abort. Ack nahi hota - shared broker
+                # visibility timeout ke baad job kisi aur worker ko de deta hai
+                job_task.cancel()
+                self._running.pop(task_id, None)
+                client_stats["running"] -= 1
+                raise
+            self._running.pop(task_id, None)
+            client_stats["running"] -= 1
+            try:
+                await self.broker.release(task_id, client)
+                await self.broker.record_duration(time.monotonic() - started_at)
+            except Exception as e:
+                print(f"⚠️ Job completion report failed: {e}")
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                await self.broker.heartbeat(self.worker_id, self.workers)
+                await self.broker.extend(list(self._running))
+                requeued = await self.broker.requeue_expired()
+                if requeued:
+                    print(f"♻️ Requeued {requeued} job(s) from dead workers")
+            except Exception as e:
+                print(f"⚠️ Worker heartbeat failed: {e}")
+
+
+# Global instance
+job_scheduler = JobScheduler(job_broker)
@@ -3,11 +3,42 @@ SiliconFlow API Service
 Image generation ke liye external API calls
 """
 import os
+import time
 import base64
+import asyncio
 import httpx
 from typing import Optional, Dict, Any
-from io import BytesIO
-from PIL import Image
+
+from .cache import generation_cache
+from .singleflight import SingleFlight
+from .limiter import AdaptiveConcurrencyLimiter, parse_retry_after
+from .retry import RetryPolicy, RetryBudget, LatencyTracker, hedged
+from .imaging import sniff_image_type, transcode_to_png, run_in_image_pool
+
+
+# Transient upstream responses jinhe retry karna safe hai
+RETRYABLE_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+
+
+class SiliconFlowError(Exception):
+    """
+    Upstream generation error
+    
+    retryable=True transient failures (timeouts, 429, 5xx) ke liye hai;
+    baaki (4xx, bad response) fatal hain.
+    """
+    
+    def __init__(
+        self,
+        message: str,
+        retryable: bool = False,
+        status_code: Optional[int] = None,
+        retry_after: Optional[float] = None
+    ):
+        super().__init__(message)
+        self.retryable = retryable
+        self.status_code = status_code
+        self.retry_after = retry_after
 
 
 class SiliconFlowService:
@@ -22,6 +53,96 @@ class SiliconFlowService:
         
         if not self.api_key:
             raise ValueError("SILICONFLOW_API_KEY environment variable not set")
+        
+        # Connection pool settings (shared client ke liye)
+        self.max_connections = int(os.getenv("SILICONFLOW_MAX_CONNECTIONS", "20"))
+        self.max_keepalive_connections = int(os.getenv("SILICONFLOW_MAX_KEEPALIVE", "10"))
+        self.keepalive_expiry = float(os.getenv("SILICONFLOW_KEEPALIVE_EXPIRY", "30"))
+        self.http2 = os.getenv("SILICONFLOW_HTTP2", "false").lower() == "true"
+        self.connect_timeout = float(os.getenv("SILICONFLOW_CONNECT_TIMEOUT", "10"))
+        self.read_timeout = float(os.getenv("SILICONFLOW_READ_TIMEOUT", "120"))
+        
+        # Identical concurrent requests ek hi upstream call share karti hain
+        self.coalesce_enabled = os.getenv("SILICONFLOW_COALESCE", "true").lower() == "true"
+        self.flights = SingleFlight("siliconflow")
+        
+        # Adaptive upstream concurrency (429/timeouts par backoff, queueing instead of failing)
+        self.limiter = AdaptiveConcurrencyLimiter(
+            "siliconflow",
+            initial_limit=int(os.getenv("SILICONFLOW_LIMIT_INITIAL", "4")),
+            min_limit=int(os.getenv("SILICONFLOW_LIMIT_MIN", "1")),
+            max_limit=int(os.getenv("SILICONFLOW_LIMIT_MAX", str(self.max_connections))),
+            backoff_factor=float(os.getenv("SILICONFLOW_LIMIT_BACKOFF", "0.5")),
+            latency_target=float(os.getenv("SILICONFLOW_LATENCY_TARGET", "60"))
+        )
+        
+        # Retries (full jitter) aur optional hedging (p95 ke baad second request)
+        self.retry_policy = RetryPolicy(
+            max_attempts=int(os.getenv("SILICONFLOW_RETRY_ATTEMPTS", "3")),
+            base_delay=float(os.getenv("SILICONFLOW_RETRY_BASE_DELAY", "0.5")),
+            max_delay=float(os.getenv("SILICONFLOW_RETRY_MAX_DELAY", "10"))
+        )
+        self.hedging_enabled = os.getenv("SILICONFLOW_HEDGING", "false").lower() == "true"
+        self.hedge_percentile = float(os.getenv("SILICONFLOW_HEDGE_PERCENTILE", "0.95"))
+        self.hedge_min_samples = int(os.getenv("SILICONFLOW_HEDGE_MIN_SAMPLES", "20"))
+        self.latency = LatencyTracker()
+        self.retry_stats = {"retries": 0, "hedges": 0}
+        
+        # URL responses: streamed download, sirf unsupported formats transcode hote hain
+        self.max_image_bytes = int(float(os.getenv("SILICONFLOW_MAX_IMAGE_MB", "25")) * 1024 * 1024)
+        self.accepted_formats = {
+            f"image/{fmt.strip()}"
+            for fmt in os.getenv("SILICONFLOW_ACCEPTED_FORMATS", "png,jpeg,webp").split(",")
+            if fmt.strip()
+        }
+        
+        self._client: Optional[httpx.AsyncClient] = None
+    
+    def _build_client(self) -> httpx.AsyncClient:
+        """Pooled AsyncClient banata hai (keep-alive + optional HTTP/2)"""
+        http2 = self.http2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                print("⚠️ SILICONFLOW_HTTP2 requires the 'h2' package - falling back to HTTP/1.1")
+                http2 = False
+        
+        return httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry
+            ),
+            timeout=httpx.Timeout(
+                self.read_timeout,
+                connect=self.connect_timeout,
+                read=self.read_timeout
+            )
+        )
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """
+        Shared HTTP client
+        
+        Normally lifespan hook mein start() se banta hai; scripts ke liye lazily create hota hai
+        """
+        if self._client is None or self._client.is_closed:
+            self._client = self._build_client()
+        return self._client
+    
+    async def start(self):
+        """Open the shared connection pool (app startup par call hota hai)"""
+        if self._client is None or self._client.is_closed:
+            self._client = self._build_client()
+    
+    async def close(self):
+        """Close the shared connection pool (app shutdown par call hota hai)"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
     
     async def generate_image(
         self, 
@@ -31,7 +152,10 @@ class SiliconFlowService:
         height: int = 1024,
         num_inference_steps: int = 30,
         guidance_scale: float = 7.5,
-        seed: Optional[int] = None
+        seed: Optional[int] = None,
+        use_cache: bool = False,
+        retry_budget: Optional[RetryBudget] = None,
+        timeout: Optional[float] = None
     ) -> Dict[str, Any]:
         """
         Generate image using SiliconFlow API
@@ -44,83 +168,218 @@ class SiliconFlowService:
             num_inference_steps: Generation steps (default: 30)
             guidance_scale: How closely to follow prompt (default: 7.5)
             seed: Random seed for reproducibility
+            use_cache: Cache use karo chahe seed fixed na ho (opt-in)
+            retry_budget: Per-task retry budget (None = sirf retry policy ki limit)
+            timeout: Task ke deadline ka bacha hua budget (seconds) - retries samet
         
         Returns:
-            Dict with 'image' (base64) and 'metadata'
+            Dict with 'image_bytes' (raw), 'content_type' and 'metadata'
+        
+        Raises:
+            SiliconFlowError: retries ke baad bhi fail ho to
         """
+        payload = {
+            "model": "black-forest-labs/FLUX.1-schnell",
+            "prompt": prompt,
+            "negative_prompt": negative_prompt or "blurry, low quality, distorted",
+            "width": width,
+            "height": height,
+            "num_inference_steps": num_inference_steps,
+            "guidance_scale": guidance_scale,
+        }
+        
+        if seed is not None:
+            payload["seed"] = seed
+        
+        metadata = {
+            "prompt": prompt,
+            "width": width,
+            "height": height,
+            "steps": num_inference_steps,
+            "guidance": guidance_scale
+        }
+        
+        payload_key = generation_cache.make_key(payload)
+        
+        # Cache sirf tab jab result reproducible ho (fixed seed) ya caller opt-in kare
+        cacheable = (seed is not None or use_cache) and generation_cache.enabled
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        
         try:
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
+            if cacheable:
+                cached = await generation_cache.get(payload_key)
+                if cached is not None:
+                    return {
+                        "image_bytes": cached,
+                        "content_type": sniff_image_type(cached) or "image/png",
+                        "metadata": {**metadata, "cache_hit": True}
+                    }
             
-            payload = {
-                "model": "black-forest-labs/FLUX.1-schnell",
-                "prompt": prompt,
-                "negative_prompt": negative_prompt or "blurry, low quality, distorted",
-                "width": width,
-                "height": height,
-                "num_inference_steps": num_inference_steps,
-                "guidance_scale": guidance_scale,
-            }
+            async def fetch() -> bytes:
+                image_bytes = await self._request_with_retries(payload, retry_budget, deadline)
+                if cacheable:
+                    await generation_cache.put(payload_key, image_bytes)
+                return image_bytes
+            
+            # Deadline par in-flight request cancel hoti hai (httpx connection abort)
+            async with asyncio.timeout(timeout):
+                if self.coalesce_enabled:
+                    image_bytes = await self.flights.do(payload_key, fetch)
+                else:
+                    image_bytes = await fetch()
             
-            if seed is not None:
-                payload["seed"] = seed
+            return {
+                "image_bytes": image_bytes,
+                "content_type": sniff_image_type(image_bytes) or "image/png",
+                "metadata": {**metadata, "cache_hit": False}
+            }
             
-            async with httpx.AsyncClient(timeout=120.0) as client:
+        except SiliconFlowError:
+            raise
+        except TimeoutError:
+            if timeout is None:
+                raise SiliconFlowError("Image generation failed: timeout")
+            raise SiliconFlowError(f"Deadline exceeded after {timeout:.1f}s")
+        except Exception as e:
+            raise SiliconFlowError(f"Image generation failed: {str(e)}")
+    
+    async def _request_with_retries(
+        self,
+        payload: Dict[str, Any],
+        retry_budget: Optional[RetryBudget] = None,
+        deadline: Optional[float] = None
+    ) -> bytes:
+        """Retryable errors par jittered backoff ke saath dobara try karta hai (deadline tak)"""
+        attempt = 0
+        while True:
+            try:
+                return await hedged(
+                    lambda: self._timed_request(payload),
+                    self._hedge_delay(),
+                    on_hedge=self._count_hedge
+                )
+            except SiliconFlowError as e:
+                if not e.retryable or attempt + 1 >= self.retry_policy.max_attempts:
+                    raise
+                if retry_budget is not None and not retry_budget.try_spend():
+                    print(f"⚠️ Retry budget exhausted: {e}")
+                    raise
+                
+                delay = max(self.retry_policy.backoff(attempt), e.retry_after or 0.0)
+                if deadline is not None and time.monotonic() + delay >= deadline:
+                    print(f"⚠️ No deadline budget left for retry: {e}")
+                    raise
+                attempt += 1
+                self.retry_stats["retries"] += 1
+                print(f"🔁 Retry {attempt}/{self.retry_policy.max_attempts - 1} in {delay:.2f}s: {e}")
+                await asyncio.sleep(delay)
+    
+    def _hedge_delay(self) -> Optional[float]:
+        """Observed p95 latency ke baad hedge karo (enough samples aur spare capacity ho to)"""
+        if not self.hedging_enabled or len(self.latency) < self.hedge_min_samples:
+            return None
+        # Upstream already saturated ho to duplicate requests sirf load badhayengi
+        if self.limiter.stats()["waiters"] > 0:
+            return None
+        return self.latency.percentile(self.hedge_percentile)
+    
+    def _count_hedge(self):
+        self.retry_stats["hedges"] += 1
+    
+    async def _timed_request(self, payload: Dict[str, Any]) -> bytes:
+        started = time.monotonic()
+        image_bytes = await self._request_image(payload)
+        self.latency.observe(time.monotonic() - started)
+        return image_bytes
+    
+    async def _request_image(self, payload: Dict[str, Any]) -> bytes:
+        """Upstream call karke raw image bytes return karta hai"""
+        try:
+            return await self._fetch_image(payload)
+        except httpx.HTTPStatusError as e:
+            status = e.response.status_code
+            raise SiliconFlowError(
+                f"SiliconFlow API error: {status} - {e.response.text}",
+                retryable=status in RETRYABLE_STATUS_CODES,
+                status_code=status,
+                retry_after=parse_retry_after(e.response.headers.get("Retry-After"))
+            )
+        except (httpx.TimeoutException, httpx.TransportError) as e:
+            # Timeouts, connection resets, protocol errors - sab transient
+            raise SiliconFlowError(
+                f"SiliconFlow connection error: {type(e).__name__}: {e}",
+                retryable=True
+            )
+    
+    async def _fetch_image(self, payload: Dict[str, Any]) -> bytes:
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+        
+        client = self.client
+        
+        async with self.limiter.acquire() as permit:
+            try:
                 response = await client.post(
                     self.base_url,
                     headers=headers,
                     json=payload
                 )
-                response.raise_for_status()
-                
-                result = response.json()
-                
-                # Extract base64 image from response
-                if "data" in result and len(result["data"]) > 0:
-                    image_data = result["data"][0]
-                    
-                    # Response format: {"b64_json": "..."} or {"url": "..."}
-                    if "b64_json" in image_data:
-                        return {
-                            "image": image_data["b64_json"],
-                            "metadata": {
-                                "prompt": prompt,
-                                "width": width,
-                                "height": height,
-                                "steps": num_inference_steps,
-                                "guidance": guidance_scale
-                            }
-                        }
-                    elif "url" in image_data:
-                        # Download from URL and convert to base64
-                        image_response = await client.get(image_data["url"])
-                        image_response.raise_for_status()
-                        
-                        # Convert to base64
-                        img = Image.open(BytesIO(image_response.content))
-                        buffered = BytesIO()
-                        img.save(buffered, format="PNG")
-                        img_base64 = base64.b64encode(buffered.getvalue()).decode()
-                        
-                        return {
-                            "image": img_base64,
-                            "metadata": {
-                                "prompt": prompt,
-                                "width": width,
-                                "height": height,
-                                "steps": num_inference_steps,
-                                "guidance": guidance_scale
-                            }
-                        }
-                
-                raise ValueError("No image data in API response")
-                
-        except httpx.HTTPStatusError as e:
-            raise Exception(f"SiliconFlow API error: {e.response.status_code} - {e.response.text}")
-        except Exception as e:
-            raise Exception(f"Image generation failed: {str(e)}")
+            except httpx.TimeoutException:
+                permit.record_overload()
+                raise
+            
+            if response.status_code in (429, 503):
+                permit.record_overload(parse_retry_after(response.headers.get("Retry-After")))
+            elif response.status_code >= 500:
+                permit.record_error()
+        
+        response.raise_for_status()
+        
+        result = response.json()
+        
+        # Extract image from response
+        if "data" in result and len(result["data"]) > 0:
+            image_data = result["data"][0]
+            
+            # Response format: {"b64_json": "..."} or {"url": "..."}
+            if "b64_json" in image_data:
+                return base64.b64decode(image_data["b64_json"])
+            elif "url" in image_data:
+                return await self._download_image(image_data["url"])
+        
+        raise SiliconFlowError("Image generation failed: No image data in API response")
+    
+    async def _download_image(self, url: str) -> bytes:
+        """
+        Generated image URL se stream karke download karta hai
+        
+        Bytes jaisi hain waisi return hoti hain agar format accepted ho;
+        warna PNG transcode image worker pool mein hota hai (event loop par nahi).
+        """
+        chunks = []
+        size = 0
+        
+        async with self.client.stream("GET", url) as response:
+            response.raise_for_status()
+            
+            declared = response.headers.get("Content-Length")
+            if declared and declared.isdigit() and int(declared) > self.max_image_bytes:
+                raise SiliconFlowError(f"Image generation failed: image too large ({declared} bytes)")
+            
+            async for chunk in response.aiter_bytes():
+                size += len(chunk)
+                if size > self.max_image_bytes:
+                    raise SiliconFlowError(f"Image generation failed: image exceeds {self.max_image_bytes} bytes")
+                chunks.append(chunk)
+        
+        data = b"".join(chunks)
+        
+        if sniff_image_type(data) in self.accepted_formats:
+            return data
+        
+        return await run_in_image_pool(transcode_to_png, data)
     
     def validate_prompt(self, prompt: str) -> bool:
         """Validate if prompt is suitable for image generation"""
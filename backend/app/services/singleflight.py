@@ -0,0 +1,71 @@
+"""
+Single-Flight Request Coalescing
+Same key ke concurrent calls ek hi in-flight future share karte hain
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, TypeVar
+
+
+T = TypeVar("T")
+
+
+class _Call:
+    """Ek in-flight call aur us par wait karne wale callers"""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls into one
+
+    Pehla caller (leader) actual kaam start karta hai, baaki usi result/exception
+    ka wait karte hain. Ek waiter cancel ho to sirf wahi nikalta hai; jab saare
+    waiters chale jayein tab underlying task cancel hota hai.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[str, _Call] = {}
+        self._stats = {
+            "leaders": 0,
+            "coalesced": 0,
+            "abandoned": 0
+        }
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """Run fn() once per key; concurrent callers share its outcome"""
+        call = self._calls.get(key)
+
+        if call is None:
+            call = _Call(asyncio.create_task(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+            self._stats["leaders"] += 1
+        else:
+            self._stats["coalesced"] += 1
+
+        call.waiters += 1
+        try:
+            # shield: ek waiter ka cancel shared task ko cancel na kare
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Koi wait nahi kar raha - upstream kaam band karo
+                self._forget(key, call)
+                call.task.cancel()
+                self._stats["abandoned"] += 1
+
+    def _forget(self, key: str, call: _Call):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": len(self._calls),
+            "waiters": sum(call.waiters for call in self._calls.values()),
+            **self._stats
+        }
@@ -0,0 +1,522 @@
+"""
+Task Store
+Task records ke liye storage abstraction - TTL eviction, byte budget aur stats ke saath
+"""
+import os
+import json
+import time
+import base64
+import asyncio
+import bisect
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple
+
+
+# In statuses ke baad task dobara update nahi hota (TTL yahin se start hota hai)
+TERMINAL_STATUSES = {"completed", "failed", "cancelled"}
+
+
+def record_size(record: Dict[str, Any]) -> int:
+    """Approximate memory footprint (serialized JSON bytes)"""
+    return len(json.dumps(record, default=str))
+
+
+def created_timestamp(record: Dict[str, Any]) -> float:
+    """Record ke created_at (ISO) ka epoch timestamp - listing index ka sort key"""
+    try:
+        return datetime.fromisoformat(record["created_at"]).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return time.time()
+
+
+def encode_cursor(created_ts: float, task_id: str) -> str:
+    """Last returned item ki position ko opaque cursor mein badalta hai"""
+    raw = json.dumps([created_ts, task_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[float, str]:
+    """encode_cursor ka ulta; invalid cursor par ValueError"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_ts, task_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return float(created_ts), str(task_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def _discard_sorted(entries: List[Tuple[float, str]], entry: Tuple[float, str]):
+    """Sorted index se ek entry hatao (bisect, agar maujood ho)"""
+    position = bisect.bisect_left(entries, entry)
+    if position < len(entries) and entries[position] == entry:
+        del entries[position]
+
+
+class ChangeNotifier:
+    """
+    Per-task asyncio.Event - long-poll waiters ek notify par saath jaagte hain
+
+    Event sirf tab tak rehta hai jab tak koi wait kar raha ho; notify ke baad
+    agla waiter naya event leta hai.
+    """
+
+    def __init__(self):
+        self._events: Dict[str, asyncio.Event] = {}
+        self._waiters: Dict[str, int] = {}
+
+    def event(self, task_id: str) -> asyncio.Event:
+        """Waiter register karo (read se PEHLE, taake beech ka notify miss na ho)"""
+        self._waiters[task_id] = self._waiters.get(task_id, 0) + 1
+        return self._events.setdefault(task_id, asyncio.Event())
+
+    def release(self, task_id: str):
+        remaining = self._waiters.get(task_id, 0) - 1
+        if remaining > 0:
+            self._waiters[task_id] = remaining
+        else:
+            self._waiters.pop(task_id, None)
+            self._events.pop(task_id, None)
+
+    def notify(self, task_id: str):
+        event = self._events.pop(task_id, None)
+        if event is not None:
+            event.set()
+
+    def __len__(self) -> int:
+        return sum(self._waiters.values())
+
+
+class PatchFanout:
+    """
+    Per-task subscriber queues (bounded) - ek published patch saare local subscribers ko
+
+    Patches field deltas hain: slow subscriber ki queue bhar jaye to beech ka
+    patch drop karne se merged state galat ho jati. Isliye overflow par queue
+    khali karke ek resync marker rakha jata hai; subscriber phir poora record
+    dobara padhta hai.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._queues: Dict[str, Set[asyncio.Queue]] = {}
+        self._stats = {"resyncs": 0}
+
+    def add(self, task_id: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.maxsize)
+        self._queues.setdefault(task_id, set()).add(queue)
+        return queue
+
+    def remove(self, task_id: str, queue: asyncio.Queue):
+        queues = self._queues.get(task_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._queues[task_id]
+
+    def has(self, task_id: str) -> bool:
+        return task_id in self._queues
+
+    def publish(self, task_id: str, patch: Dict[str, Any]):
+        for queue in self._queues.get(task_id, ()):
+            if queue.full():
+                self._resync(task_id, queue)
+                self._stats["resyncs"] += 1
+            else:
+                queue.put_nowait(patch)
+
+    def resync_all(self):
+        """Feed toot gaya (beech ke patches miss ho sakte hain) - har subscriber resync kare"""
+        for task_id, queues in self._queues.items():
+            for queue in queues:
+                self._resync(task_id, queue)
+
+    @staticmethod
+    def _resync(task_id: str, queue: asyncio.Queue):
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait({"task_id": task_id, "resync": True})
+
+    def stats(self) -> Dict[str, Any]:
+        return {"subscribers": sum(len(queues) for queues in self._queues.values()), **self._stats}
+
+
+class TaskStore(ABC):
+    """
+    Task storage interface
+
+    Saare routes isi interface se baat karte hain; backend (memory, redis, ...)
+    TASK_STORE_BACKEND se choose hota hai. Har record ka `version` create par 1
+    hota hai aur har update par badhta hai (published patches mein bhi jata hai).
+    """
+
+    @abstractmethod
+    async def create(self, task_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Naya task record"""
+
+    @abstractmethod
+    async def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """Task record ki copy ya None"""
+
+    @abstractmethod
+    async def update(
+        self,
+        task_id: str,
+        if_status: Optional[Iterable[str]] = None,
+        **fields
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Fields atomically patch karo aur subscribers ko notify karo
+
+        if_status diya ho to patch sirf tab lagta hai jab current status usme ho
+        (e.g. cancelled task ko completed overwrite na kare). Task missing ho ya
+        condition fail ho to None.
+        """
+
+    @abstractmethod
+    async def delete(self, task_id: str) -> bool:
+        """Task remove karo; True agar exist karta tha"""
+
+    async def exists(self, task_id: str) -> bool:
+        return await self.get(task_id) is not None
+
+    @abstractmethod
+    async def list_tasks(
+        self,
+        status: Optional[str] = None,
+        created_after: Optional[float] = None,
+        created_before: Optional[float] = None,
+        prompt_contains: Optional[str] = None,
+        limit: int = 50,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Filtered task records, newest first (secondary indexes se, full scan nahi)
+
+        Returns (records, next_cursor); next_cursor None = aur results nahi.
+        """
+
+    @abstractmethod
+    async def stats(self) -> Dict[str, Any]:
+        """Count, bytes, evictions waghera"""
+
+    async def subscribe(self, task_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Task ke status changes ka async stream (har update ka patch)
+
+        Subscriber peeche reh jaye to beech ke patches ki jagah poora record
+        aata hai ("resync": True) - merge karne par state phir sahi hoti hai.
+
+        Usage:
+            async for patch in task_store.subscribe(task_id):
+                ...
+        """
+        queue = self._patches.add(task_id)
+        try:
+            await self._watch_changes()
+            while True:
+                patch = await queue.get()
+                if patch.get("resync"):
+                    await self._watch_changes()
+                    record = await self.get(task_id)
+                    if record is None:
+                        continue
+                    patch = {"task_id": task_id, **record, "resync": True}
+                yield patch
+        finally:
+            self._patches.remove(task_id, queue)
+
+    async def wait_for_change(self, task_id: str, version: int, timeout: float) -> Optional[Dict[str, Any]]:
+        """
+        Long-poll: record return karo jab uska version `version` se alag ho,
+        ya timeout par current record (None = task exist nahi karta)
+
+        Sleep loop nahi - har task ka ChangeNotifier event update par set hota hai.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            event = self._changes.event(task_id)
+            try:
+                await self._watch_changes()
+                record = await self.get(task_id)
+                remaining = deadline - loop.time()
+                if record is None or record.get("version", 0) != version or remaining <= 0:
+                    return record
+                try:
+                    await asyncio.wait_for(event.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+            finally:
+                self._changes.release(task_id)
+
+    async def _watch_changes(self):
+        """Cross-process change feed (Redis) - memory store mein updates local hi hain"""
+
+    async def start(self):
+        """Background maintenance start karo (app startup)"""
+
+    async def close(self):
+        """Background maintenance band karo (app shutdown)"""
+
+
+class MemoryTaskStore(TaskStore):
+    """
+    Process-local store
+
+    Terminal tasks (completed/failed/cancelled) TTL ke baad expire hote hain aur
+    byte budget cross hone par LRU order mein evict hote hain. Running tasks
+    kabhi evict nahi hote.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        completed_ttl: float,
+        failed_ttl: float,
+        sweep_interval: float
+    ):
+        self.max_bytes = max_bytes
+        self.completed_ttl = completed_ttl
+        self.failed_ttl = failed_ttl
+        self.sweep_interval = sweep_interval
+
+        self._records: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._expires_at: Dict[str, float] = {}
+        self._bytes = 0
+        self._sweeper: Optional[asyncio.Task] = None
+        self._patches = PatchFanout()
+        self._changes = ChangeNotifier()
+
+        # Secondary indexes: (created_ts, task_id) sorted lists - sab tasks, aur per status
+        self._by_status: Dict[str, List[Tuple[float, str]]] = {}
+        self._created_ts: Dict[str, float] = {}
+        self._created_index: List[Tuple[float, str]] = []
+
+        self._stats = {"evictions": 0, "expirations": 0}
+
+    async def create(self, task_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        if task_id in self._records:
+            self._remove(task_id)
+        record = {**data, "version": 1}
+        self._records[task_id] = record
+        self._index(task_id)
+        self._account(task_id)
+        self._track_expiry(task_id)
+        self._enforce_budget()
+        return dict(record)
+
+    async def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        record = self._records.get(task_id)
+        if record is None:
+            return None
+        if self._is_expired(task_id):
+            self._remove(task_id)
+            self._stats["expirations"] += 1
+            return None
+        self._records.move_to_end(task_id)
+        return dict(record)
+
+    async def update(
+        self,
+        task_id: str,
+        if_status: Optional[Iterable[str]] = None,
+        **fields
+    ) -> Optional[Dict[str, Any]]:
+        record = self._records.get(task_id)
+        if record is None:
+            return None
+        if if_status is not None and record.get("status") not in set(if_status):
+            return None
+        if "status" in fields:
+            self._unindex_status(task_id)
+        record.update(fields)
+        record["version"] = record.get("version", 0) + 1
+        if "status" in fields:
+            bisect.insort(self._by_status.setdefault(record["status"], []), (self._created_ts[task_id], task_id))
+        self._records.move_to_end(task_id)
+        self._account(task_id)
+        if "status" in fields:
+            self._track_expiry(task_id)
+        self._enforce_budget()
+        self._publish(task_id, {**fields, "version": record["version"]})
+        return dict(record)
+
+    async def delete(self, task_id: str) -> bool:
+        if task_id not in self._records:
+            return False
+        self._remove(task_id)
+        return True
+
+    async def list_tasks(
+        self,
+        status: Optional[str] = None,
+        created_after: Optional[float] = None,
+        created_before: Optional[float] = None,
+        prompt_contains: Optional[str] = None,
+        limit: int = 50,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        entries = self._by_status.get(status, []) if status is not None else self._created_index
+
+        # Newest first: upper bound (cursor / created_before) se neeche chalo
+        position = len(entries)
+        if cursor is not None:
+            position = bisect.bisect_left(entries, decode_cursor(cursor))
+        if created_before is not None:
+            position = min(position, bisect.bisect_left(entries, (created_before, "")))
+
+        needle = prompt_contains.lower() if prompt_contains else None
+        now = time.time()
+        results: List[Dict[str, Any]] = []
+        last = None
+
+        while position > 0 and len(results) < limit:
+            position -= 1
+            created_ts, task_id = entries[position]
+            if created_after is not None and created_ts < created_after:
+                position = 0
+                break
+            expires_at = self._expires_at.get(task_id)
+            if expires_at is not None and now >= expires_at:
+                continue
+            record = self._records[task_id]
+            if needle and needle not in (record.get("prompt") or "").lower():
+                continue
+            results.append(dict(record))
+            last = (created_ts, task_id)
+
+        has_more = position > 0 and (created_after is None or entries[position - 1][0] >= created_after)
+        next_cursor = encode_cursor(*last) if last is not None and has_more else None
+        return results, next_cursor
+
+    async def stats(self) -> Dict[str, Any]:
+        by_status = {status: len(task_ids) for status, task_ids in self._by_status.items() if task_ids}
+
+        return {
+            "backend": "memory",
+            "count": len(self._records),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "by_status": by_status,
+            "long_poll_waiters": len(self._changes),
+            "stream": self._patches.stats(),
+            **self._stats
+        }
+
+    def _publish(self, task_id: str, fields: Dict[str, Any]):
+        self._changes.notify(task_id)
+        self._patches.publish(task_id, {"task_id": task_id, **fields})
+
+    async def start(self):
+        if self._sweeper is None and self.sweep_interval > 0:
+            self._sweeper = asyncio.create_task(self._sweep_loop())
+
+    async def close(self):
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            try:
+                await self._sweeper
+            except asyncio.CancelledError:
+                pass
+            self._sweeper = None
+
+    # Internals
+
+    def _index(self, task_id: str):
+        record = self._records[task_id]
+        created_ts = created_timestamp(record)
+        self._created_ts[task_id] = created_ts
+        bisect.insort(self._created_index, (created_ts, task_id))
+        bisect.insort(self._by_status.setdefault(record.get("status", "unknown"), []), (created_ts, task_id))
+
+    def _unindex_status(self, task_id: str):
+        status = self._records[task_id].get("status", "unknown")
+        entries = self._by_status.get(status)
+        if entries is not None:
+            _discard_sorted(entries, (self._created_ts[task_id], task_id))
+
+    def _account(self, task_id: str):
+        size = record_size(self._records[task_id])
+        self._bytes += size - self._sizes.get(task_id, 0)
+        self._sizes[task_id] = size
+
+    def _track_expiry(self, task_id: str):
+        status = self._records[task_id].get("status")
+        if status in TERMINAL_STATUSES:
+            ttl = self.completed_ttl if status == "completed" else self.failed_ttl
+            self._expires_at[task_id] = time.time() + ttl
+        else:
+            self._expires_at.pop(task_id, None)
+
+    def _is_expired(self, task_id: str) -> bool:
+        expires_at = self._expires_at.get(task_id)
+        return expires_at is not None and time.time() >= expires_at
+
+    def _remove(self, task_id: str):
+        if task_id in self._records:
+            self._unindex_status(task_id)
+            _discard_sorted(self._created_index, (self._created_ts.pop(task_id), task_id))
+        self._records.pop(task_id, None)
+        self._bytes -= self._sizes.pop(task_id, 0)
+        self._expires_at.pop(task_id, None)
+        self._changes.notify(task_id)
+
+    def _enforce_budget(self):
+        if self._bytes <= self.max_bytes:
+            return
+
+        # Least recently used terminal tasks pehle
+        for task_id in list(self._records):
+            if self._bytes <= self.max_bytes:
+                break
+            if task_id in self._expires_at:
+                self._remove(task_id)
+                self._stats["evictions"] += 1
+
+    def sweep(self) -> int:
+        """Expired terminal tasks remove karo; kitne remove hue"""
+        now = time.time()
+        expired = [task_id for task_id, at in self._expires_at.items() if now >= at]
+        for task_id in expired:
+            self._remove(task_id)
+        self._stats["expirations"] += len(expired)
+        return len(expired)
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"⚠️ Task store sweep failed: {e}")
+
+
+def create_task_store() -> TaskStore:
+    """TASK_STORE_BACKEND ke hisaab se store banata hai"""
+    backend = os.getenv("TASK_STORE_BACKEND", "memory").lower()
+
+    if backend == "memory":
+        return MemoryTaskStore(
+            max_bytes=int(float(os.getenv("TASK_STORE_MAX_MB", "64")) * 1024 * 1024),
+            completed_ttl=float(os.getenv("TASK_TTL_COMPLETED", "3600")),
+            failed_ttl=float(os.getenv("TASK_TTL_FAILED", "3600")),
+            sweep_interval=float(os.getenv("TASK_SWEEP_INTERVAL", "30"))
+        )
+
+    if backend == "redis":
+        from .redis_store import RedisTaskStore, create_redis_client
+        return RedisTaskStore(
+            create_redis_client(),
+            completed_ttl=float(os.getenv("TASK_TTL_COMPLETED", "3600")),
+            failed_ttl=float(os.getenv("TASK_TTL_FAILED", "3600")),
+            sweep_interval=float(os.getenv("TASK_SWEEP_INTERVAL", "30"))
+        )
+
+    raise ValueError(f"Unknown TASK_STORE_BACKEND: {backend}")
+
+
+# Global instance
+task_store = create_task_store()
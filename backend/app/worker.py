@@ -0,0 +1,78 @@
+"""
+Worker Process Entry Point
+Broker se jobs uthakar agent graph chalata hai - API tier se alag scale hota hai
+
+Run with: python -m app.worker
+(API ko WORKER_MODE=external aur dono ko same BROKER_BACKEND=redis chahiye)
+"""
+import signal
+import asyncio
+from dotenv import load_dotenv
+
+# Services import hone se pehle env load karo (global instances env padhte hain)
+load_dotenv()
+
+from app.agent.jobs import run_job, recover_journal_tasks
+from app.agent.graph import start_checkpointing
+from app.agent.checkpoints import checkpoint_store
+from app.services.monitor import monitor
+from app.services.silicon_flow import silicon_flow_service
+from app.services.derivatives import derivative_pipeline
+from app.services.task_store import task_store
+from app.services.journal import task_journal
+from app.services.broker import InProcessBroker
+from app.services.scheduler import job_scheduler
+
+
+async def main():
+    """Worker lifecycle: startup -> jobs consume -> SIGTERM/SIGINT par graceful shutdown"""
+    print("\n" + "="*60)
+    print("🛠️ AI Vision Agent Pro - Worker Starting")
+    print(f"🆔 Worker: {job_scheduler.worker_id}")
+    print(f"⚙️ Concurrency: {job_scheduler.workers}")
+    print("="*60 + "\n")
+    
+    if isinstance(job_scheduler.broker, InProcessBroker):
+        raise SystemExit("app.worker requires a shared broker (BROKER_BACKEND=redis)")
+    
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    
+    await silicon_flow_service.start()
+    derivative_pipeline.start()
+    await task_store.start()
+    await start_checkpointing()
+    
+    if task_journal.enabled:
+        await task_journal.start()
+    
+    # Workers external broker se consume karte hain (in-process broker sirf inline mode ke liye)
+    job_scheduler.mode = "worker"
+    await job_scheduler.start(handler=run_job)
+    
+    if task_journal.enabled:
+        recovered = await recover_journal_tasks()
+        print(f"📒 Journal recovery: {recovered}")
+    
+    await stop.wait()
+    
+    print("\n" + "="*60)
+    print("👋 AI Vision Agent Pro - Worker Shutting Down")
+    
+    await job_scheduler.close()
+    await task_journal.close()
+    await checkpoint_store.close()
+    await task_store.close()
+    await silicon_flow_service.close()
+    derivative_pipeline.close()
+    
+    if monitor.enabled:
+        monitor.flush()
+    
+    print("="*60 + "\n")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
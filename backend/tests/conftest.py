@@ -0,0 +1,13 @@
+"""
+Test setup
+Services global instances import par env padhte hain - isliye env yahin pehle set hota hai
+"""
+import os
+import tempfile
+
+os.environ.setdefault("SILICONFLOW_API_KEY", "test-key")
+os.environ.setdefault("GENERATION_CACHE_ENABLED", "false")
+os.environ.setdefault("TASK_JOURNAL_PATH", "")
+os.environ.setdefault("LANGFUSE_ENABLED", "false")
+os.environ.setdefault("BLOB_STORE_DIR", tempfile.mkdtemp(prefix="aivision-blobs-"))
+os.environ.setdefault("DERIVATIVES_ENABLED", "false")
@@ -0,0 +1,230 @@
+"""
+Agent workflow tests (upstream httpx.MockTransport se mock hota hai)
+"""
+import asyncio
+import time
+from datetime import datetime
+
+import httpx
+
+from app.agent import graph, jobs
+from app.agent.checkpoints import checkpoint_store
+from app.agent.jobs import execute_agent_workflow
+from app.agent.nodes import critic_node, generator_node
+from app.agent.state import NodeStatus
+from app.services.silicon_flow import silicon_flow_service
+from app.services.task_store import task_store
+
+
+def run_with_upstream(handler, task_id: str, **params):
+    """Mocked upstream ke saath ek task chalao aur final record return karo"""
+    async def scenario():
+        silicon_flow_service._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        try:
+            await task_store.create(task_id, {
+                "task_id": task_id,
+                "status": "pending",
+                "progress": 0,
+                "current_step": "initializing",
+                "prompt": params.get("prompt", "a lighthouse at dusk"),
+                "created_at": datetime.now().isoformat()
+            })
+            await execute_agent_workflow(
+                task_id=task_id,
+                prompt=params.pop("prompt", "a lighthouse at dusk"),
+                reference_image_id=None,
+                max_iterations=params.pop("max_iterations", 3),
+                **params
+            )
+            return await task_store.get(task_id)
+        finally:
+            await silicon_flow_service.close()
+
+    return asyncio.run(scenario())
+
+
+def test_fatal_upstream_error_fails_task_after_one_call():
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        return httpx.Response(400, json={"message": "invalid parameters"})
+
+    record = run_with_upstream(handler, "fatal-400")
+
+    assert len(calls) == 1
+    assert record["status"] == "failed"
+    assert "400" in record["error"]
+    assert record.get("image_id") is None
+
+
+def test_shutdown_cancel_leaves_journal_row_unfinished(monkeypatch):
+    finished = []
+    monkeypatch.setattr(jobs.task_journal, "record_finished", lambda task_id, status, data: finished.append(status))
+    started = asyncio.Event()
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        started.set()
+        await asyncio.sleep(60)
+
+    async def scenario():
+        silicon_flow_service._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        await task_store.create("shutdown", {
+            "task_id": "shutdown",
+            "status": "pending",
+            "prompt": "a lighthouse at dusk",
+            "created_at": datetime.now().isoformat()
+        })
+        run = asyncio.create_task(execute_agent_workflow(
+            task_id="shutdown", prompt="a lighthouse at dusk", reference_image_id=None, max_iterations=1
+        ))
+        try:
+            await started.wait()
+            # Worker shutdown (job_scheduler.close) jaisa cancel - cancel_job nahi
+            run.cancel()
+            await asyncio.gather(run, return_exceptions=True)
+        finally:
+            await silicon_flow_service.close()
+
+    asyncio.run(scenario())
+
+    # Journal mein "cancelled" nahi - restart par recover_journal_tasks isse resume karta hai
+    assert finished == []
+
+
+def cancel_mid_generation(task_id: str, user_cancel: bool):
+    """Generator ke upstream call par task cancel karo; bacha hua checkpoint return"""
+    started = asyncio.Event()
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        started.set()
+        await asyncio.sleep(60)
+
+    async def scenario():
+        silicon_flow_service._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        await task_store.create(task_id, {
+            "task_id": task_id,
+            "status": "pending",
+            "prompt": "a lighthouse at dusk",
+            "created_at": datetime.now().isoformat()
+        })
+        run = asyncio.create_task(execute_agent_workflow(
+            task_id=task_id, prompt="a lighthouse at dusk", reference_image_id=None, max_iterations=1
+        ))
+        try:
+            await started.wait()
+            if user_cancel:
+                # cancel_job jaisa: status pehle, phir job abort
+                await task_store.update(task_id, status="cancelled")
+            run.cancel()
+            await asyncio.gather(run, return_exceptions=True)
+            return await checkpoint_store.saver.aget_tuple(checkpoint_store.config(task_id))
+        finally:
+            await checkpoint_store.discard(task_id)
+            await silicon_flow_service.close()
+
+    return asyncio.run(scenario())
+
+
+def test_worker_discards_checkpoint_only_for_user_cancel():
+    # Shutdown cancel: restart par resume ke liye checkpoint bacha rehta hai
+    assert cancel_mid_generation("shutdown-cancel", user_cancel=False) is not None
+    # User cancel: worker khud checkpoint hata deta hai (API process ke bharose nahi)
+    assert cancel_mid_generation("user-cancel", user_cancel=True) is None
+
+
+def test_failed_regeneration_keeps_best_image_without_rescoring():
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(400, json={"message": "invalid parameters"})
+
+    async def scenario():
+        silicon_flow_service._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        state = {
+            "task_id": "regen-fail",
+            "original_prompt": "a lighthouse at dusk",
+            "optimized_prompt": "a lighthouse at dusk, highly detailed, professional quality, 4k",
+            "use_cache": False,
+            "candidates": 2,
+            "generated_image_id": "round-1-a",
+            "candidate_image_ids": ["round-1-a", "round-1-b"],
+            "quality_score": 0.6,
+            "best_image_id": "round-1-a",
+            "best_quality_score": 0.6,
+            "iteration_count": 1,
+            "max_iterations": 3,
+            "retry_count": 0,
+            "should_regenerate": True,
+            "deadline_at": None
+        }
+        try:
+            state.update(await generator_node(state))
+            assert state["should_regenerate"] is False
+            assert state["candidate_image_ids"] is None
+
+            update = await critic_node(state)
+        finally:
+            await silicon_flow_service.close()
+        return state, update
+
+    state, update = asyncio.run(scenario())
+
+    # Stale round-1 candidates dobara score nahi hote, aur koi naya round nahi
+    assert update["should_regenerate"] is False
+    assert update["node_status"] == NodeStatus.COMPLETED
+    assert "iteration_count" not in update
+    assert state["best_image_id"] == "round-1-a"
+
+
+# 1x1 PNG (upstream b64_json response)
+PNG_B64 = (
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8z8BQDwAEhQGAhKmMIQAAAABJRU5ErkJggg=="
+)
+
+
+def test_coalesced_runs_fan_out_progress_and_respect_deadlines(monkeypatch):
+    monkeypatch.setattr(graph, "AGENT_COALESCE_ENABLED", True)
+    # Upstream-level coalescing band: har graph run ki apni call gine
+    monkeypatch.setattr(silicon_flow_service, "coalesce_enabled", False)
+    calls = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json={"data": [{"b64_json": PNG_B64}]})
+
+    reported = {}
+
+    async def listener(task_id, node, update, progress):
+        reported.setdefault(task_id, []).append(node)
+
+    async def scenario():
+        silicon_flow_service._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        graph.node_listeners.append(listener)
+        try:
+            # Default TASK_DEADLINE_SECONDS: har request ki apni time.time() + 300
+            same = [
+                graph.run_agent("a lighthouse at dusk", task_id, max_iterations=1, deadline_at=time.time() + 300)
+                for task_id in ("leader", "follower")
+            ]
+            shared = await asyncio.gather(*same)
+            assert len(calls) == 1
+
+            # Follower ki deadline shared run se pehle: alag run (leader ka budget inherit nahi karta)
+            deadline = time.time() + 60
+            separate = await asyncio.gather(
+                graph.run_agent("a lighthouse at dusk", "loose", max_iterations=1, deadline_at=deadline + 2),
+                graph.run_agent("a lighthouse at dusk", "tight", max_iterations=1, deadline_at=deadline + 1)
+            )
+            assert len(calls) == 3
+            return shared, separate
+        finally:
+            graph.node_listeners.remove(listener)
+            await silicon_flow_service.close()
+
+    shared, separate = asyncio.run(scenario())
+
+    assert [state["task_id"] for state in shared] == ["leader", "follower"]
+    assert shared[0]["generated_image_id"] == shared[1]["generated_image_id"]
+    assert reported["leader"] == reported["follower"] == ["planner", "generator", "critic"]
+    assert reported["tight"] == reported["loose"] == ["planner", "generator", "critic"]
+    assert graph._agent_flight_members == {}
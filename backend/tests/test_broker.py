@@ -0,0 +1,153 @@
+"""
+Job broker tests - priority, weighted fair queuing aur client quotas
+"""
+import asyncio
+
+import pytest
+
+from app.services.broker import InProcessBroker, RedisBroker, QueueFull, QuotaExceeded
+from app.services.clients import ClientPolicy
+
+
+def memory_broker(max_depth: int = 100):
+    return InProcessBroker(max_depth=max_depth, default_duration=30)
+
+
+def redis_broker(max_depth: int = 100):
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    return RedisBroker(fakeredis.FakeAsyncRedis(decode_responses=True), max_depth=max_depth, default_duration=30)
+
+
+brokers = pytest.mark.parametrize("make_broker", [memory_broker, redis_broker], ids=["memory", "redis"])
+
+
+def make_job(task_id: str, client: str, priority: int = 0):
+    return {"task_id": task_id, "priority": priority, "client": client, "params": {}}
+
+
+async def drain(broker, count: int):
+    return [(await broker.dequeue())["task_id"] for _ in range(count)]
+
+
+@brokers
+def test_fair_queuing_interleaves_clients(make_broker):
+    async def scenario():
+        broker = make_broker()
+        policy = ClientPolicy()
+        # Heavy client pehle 4 jobs daal deta hai, phir light client 2
+        for n in range(4):
+            await broker.enqueue(make_job(f"heavy-{n}", "heavy"), policy)
+        for n in range(2):
+            await broker.enqueue(make_job(f"light-{n}", "light"), policy)
+
+        assert await drain(broker, 6) == ["heavy-0", "light-0", "heavy-1", "light-1", "heavy-2", "heavy-3"]
+
+    asyncio.run(scenario())
+
+
+@brokers
+def test_weight_and_priority_order(make_broker):
+    async def scenario():
+        broker = make_broker()
+        for n in range(4):
+            await broker.enqueue(make_job(f"web-{n}", "web"), ClientPolicy(weight=2))
+        # Weight 0.75: finish tags web ke tags se kabhi equal nahi (tie-break backend-specific hai)
+        for n in range(2):
+            await broker.enqueue(make_job(f"batch-{n}", "batch"), ClientPolicy(weight=0.75))
+        await broker.enqueue(make_job("urgent", "batch", priority=5), ClientPolicy(weight=0.75))
+
+        # Higher priority pehle; zyada weight wala client bada share leta hai
+        assert await drain(broker, 7) == ["urgent", "web-0", "web-1", "batch-0", "web-2", "web-3", "batch-1"]
+        assert await broker.depth() == 0
+
+    asyncio.run(scenario())
+
+
+@brokers
+def test_concurrency_quota_until_release(make_broker):
+    async def scenario():
+        broker = make_broker()
+        policy = ClientPolicy(max_concurrent=2)
+        await broker.enqueue(make_job("t1", "c"), policy)
+        await broker.enqueue(make_job("t2", "c"), policy)
+
+        with pytest.raises(QuotaExceeded) as error:
+            await broker.enqueue(make_job("t3", "c"), policy)
+        assert error.value.reason == "concurrency"
+
+        # Doosre client par asar nahi
+        await broker.enqueue(make_job("other", "d"), policy)
+
+        # Job khatam -> quota wapas
+        await broker.dequeue()
+        await broker.release("t1", "c")
+        await broker.enqueue(make_job("t3", "c"), policy)
+
+        # Queue se cancel bhi quota chhodta hai
+        assert await broker.remove("t3")
+        assert (await broker.client_usage("c"))[0] == 1
+
+    asyncio.run(scenario())
+
+
+@brokers
+def test_rate_quota_and_max_depth(make_broker):
+    async def scenario():
+        broker = make_broker(max_depth=3)
+        await broker.enqueue(make_job("t1", "c"), ClientPolicy(per_minute=1))
+        with pytest.raises(QuotaExceeded) as error:
+            await broker.enqueue(make_job("t2", "c"), ClientPolicy(per_minute=1))
+        assert error.value.reason == "rate"
+        assert error.value.retry_after > 50
+
+        await broker.enqueue(make_job("t2", "d"), ClientPolicy())
+        await broker.enqueue(make_job("t3", "e"), ClientPolicy())
+        with pytest.raises(QueueFull) as error:
+            await broker.enqueue(make_job("t4", "f"), ClientPolicy())
+        assert not isinstance(error.value, QuotaExceeded)
+
+    asyncio.run(scenario())
+
+
+def test_redis_redelivers_unacked_job_after_visibility_timeout():
+    async def scenario():
+        broker = redis_broker()
+        broker.visibility_timeout = 0.05
+        policy = ClientPolicy()
+        await broker.enqueue(make_job("crashed", "web"), policy)
+        await broker.enqueue(make_job("acked", "web"), policy)
+
+        # Dono claim hue; "acked" release hota hai, "crashed" ka worker mar gaya
+        assert await drain(broker, 2) == ["crashed", "acked"]
+        await broker.release("acked", "web")
+        assert await broker.requeue_expired() == 0
+        assert await broker.depth() == 0
+
+        await asyncio.sleep(0.1)
+        assert await broker.requeue_expired() == 1
+        job = await broker.dequeue()
+        assert job["task_id"] == "crashed"
+        assert job["redelivered"] is True
+        assert await broker.depth() == 0
+
+    asyncio.run(scenario())
+
+
+def test_redis_extend_keeps_running_job_claimed():
+    async def scenario():
+        broker = redis_broker()
+        broker.visibility_timeout = 0.2
+        await broker.enqueue(make_job("slow", "web"), ClientPolicy())
+        await broker.dequeue()
+
+        # Heartbeat deadline aage badhata hai: job requeue nahi hota
+        for _ in range(3):
+            await asyncio.sleep(0.1)
+            await broker.extend(["slow"])
+            assert await broker.requeue_expired() == 0
+        await broker.release("slow", "web")
+        await asyncio.sleep(0.25)
+        assert await broker.requeue_expired() == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,52 @@
+"""
+Client identity tests
+"""
+from starlette.requests import Request
+
+from app.services.clients import ClientRegistry
+
+
+def make_request(headers=None, peer="10.0.0.7") -> Request:
+    return Request({
+        "type": "http",
+        "method": "POST",
+        "path": "/api/v1/generate",
+        "headers": [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()],
+        "client": (peer, 50000)
+    })
+
+
+def test_client_id_header_is_only_a_label():
+    registry = ClientRegistry()
+    request = make_request({"X-Client-ID": "spoof1"})
+
+    assert registry.identify(request) == "ip:10.0.0.7"
+    assert registry.label(request) == "spoof1"
+
+
+def test_only_registered_api_keys_change_identity(monkeypatch):
+    monkeypatch.setenv("CLIENT_API_KEYS", "batch-co:sk-abc")
+    registry = ClientRegistry()
+
+    assert registry.identify(make_request({"X-API-Key": "sk-abc"})) == "batch-co"
+    assert registry.identify(make_request({"X-API-Key": "sk-random"})) == "ip:10.0.0.7"
+
+
+def test_forwarded_ip_only_from_trusted_proxy(monkeypatch):
+    monkeypatch.setenv("CLIENT_IP_HEADER", "X-Forwarded-For")
+    monkeypatch.setenv("CLIENT_TRUSTED_PROXIES", "172.16.0.0/12")
+    registry = ClientRegistry()
+    headers = {"X-Forwarded-For": "1.2.3.4, 203.0.113.9"}
+
+    # Last hop proxy ne likhi hai; pehli entry caller ne forge ki
+    assert registry.identify(make_request(headers, peer="172.18.0.3")) == "ip:203.0.113.9"
+    assert registry.identify(make_request(headers, peer="198.51.100.1")) == "ip:198.51.100.1"
+
+
+def test_quotas_are_off_by_default(monkeypatch):
+    monkeypatch.delenv("CLIENT_MAX_CONCURRENT", raising=False)
+    monkeypatch.delenv("CLIENT_RATE_PER_MINUTE", raising=False)
+    policy = ClientRegistry().policy("ip:10.0.0.7")
+
+    assert policy.max_concurrent == 0
+    assert policy.per_minute == 0
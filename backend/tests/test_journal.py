@@ -0,0 +1,33 @@
+"""
+TaskJournal tests
+"""
+import asyncio
+
+from app.services.journal import TaskJournal
+
+
+def test_repeated_create_keeps_recovery_state(monkeypatch, tmp_path):
+    monkeypatch.setenv("TASK_JOURNAL_PATH", str(tmp_path / "journal.db"))
+
+    async def scenario():
+        journal = TaskJournal()
+        await journal.start()
+        try:
+            journal.record_created("t1", {"prompt": "a red fox"})
+            await journal.flush()
+            created_at = (await journal.load_tasks())[0]["created_at"]
+
+            journal.record_node("t1", "generator", {"generated_image_id": "blob-1"})
+            # Worker restart / redelivery: wahi job dobara
+            journal.record_created("t1", {"prompt": "a red fox"})
+            await journal.flush()
+            return created_at, await journal.load_tasks()
+        finally:
+            await journal.close()
+
+    created_at, tasks = asyncio.run(scenario())
+
+    assert len(tasks) == 1
+    assert tasks[0]["status"] == "running"
+    assert tasks[0]["image_id"] == "blob-1"
+    assert tasks[0]["created_at"] == created_at
@@ -0,0 +1,107 @@
+"""
+AdaptiveConcurrencyLimiter (AIMD) tests
+"""
+import asyncio
+
+from app.services.limiter import AdaptiveConcurrencyLimiter
+
+
+async def succeed(limiter: AdaptiveConcurrencyLimiter):
+    async with limiter.acquire():
+        pass
+
+
+async def overload(limiter: AdaptiveConcurrencyLimiter, retry_after=None):
+    async with limiter.acquire() as permit:
+        permit.record_overload(retry_after)
+
+
+def test_additive_increase_per_window_of_successes():
+    async def scenario():
+        limiter = AdaptiveConcurrencyLimiter("test", initial_limit=4, max_limit=6)
+        # Har success +1/limit: ~ek poori window (limit successes) ke baad +1
+        for _ in range(3):
+            await succeed(limiter)
+        assert limiter.limit == 4
+        for _ in range(2):
+            await succeed(limiter)
+        assert limiter.limit == 5
+
+        for _ in range(20):
+            await succeed(limiter)
+        assert limiter.limit == 6  # max_limit par cap
+
+    asyncio.run(scenario())
+
+
+def test_overload_cuts_limit_multiplicatively_once_per_burst():
+    async def scenario():
+        limiter = AdaptiveConcurrencyLimiter("test", initial_limit=8, min_limit=1, backoff_factor=0.5)
+
+        # Ek saath chali 3 requests ke 429s: sirf ek cut
+        permits_held = asyncio.Event()
+        entered = 0
+
+        async def burst_request():
+            nonlocal entered
+            async with limiter.acquire() as permit:
+                entered += 1
+                if entered == 3:
+                    permits_held.set()
+                await permits_held.wait()
+                permit.record_overload()
+
+        await asyncio.gather(*(burst_request() for _ in range(3)))
+        assert limiter.limit == 4
+        assert limiter.stats()["decreases"] == 1
+
+        # Cut ke baad shuru hui request ka 429 naya signal hai
+        await overload(limiter)
+        assert limiter.limit == 2
+        await overload(limiter)
+        await overload(limiter)
+        assert limiter.limit == 1  # min_limit se neeche nahi
+
+    asyncio.run(scenario())
+
+
+def test_requests_over_the_limit_queue_in_fifo_order():
+    async def scenario():
+        limiter = AdaptiveConcurrencyLimiter("test", initial_limit=1, max_limit=1)
+        release = asyncio.Event()
+        order = []
+
+        async def hold():
+            async with limiter.acquire():
+                await release.wait()
+
+        async def queued(n):
+            async with limiter.acquire():
+                order.append(n)
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        waiters = [asyncio.create_task(queued(n)) for n in range(3)]
+        await asyncio.sleep(0)
+        assert limiter.stats()["waiters"] == 3
+
+        release.set()
+        await asyncio.gather(holder, *waiters)
+        assert order == [0, 1, 2]
+        assert limiter.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+def test_retry_after_blocks_new_admissions():
+    async def scenario():
+        limiter = AdaptiveConcurrencyLimiter("test", initial_limit=4)
+        await overload(limiter, retry_after=0.1)
+        assert limiter.stats()["blocked_for"] > 0
+
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await succeed(limiter)
+        assert loop.time() - started >= 0.09
+
+    asyncio.run(scenario())
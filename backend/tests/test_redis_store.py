@@ -0,0 +1,149 @@
+"""
+RedisTaskStore tests (fakeredis in-process stand-in; Lua scripts lupa se chalte hain)
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")
+
+from app.services.redis_store import RedisTaskStore
+
+
+def make_store(**options) -> RedisTaskStore:
+    return RedisTaskStore(
+        fakeredis.FakeAsyncRedis(decode_responses=True),
+        completed_ttl=options.get("completed_ttl", 3600),
+        failed_ttl=options.get("failed_ttl", 3600),
+        sweep_interval=0
+    )
+
+
+def make_record(task_id: str, status: str = "pending", age: float = 0.0, prompt: str = "a red fox"):
+    return {
+        "task_id": task_id,
+        "status": status,
+        "progress": 0,
+        "prompt": prompt,
+        "created_at": (datetime.now() - timedelta(seconds=age)).isoformat()
+    }
+
+
+def test_update_is_conditional_and_bumps_version():
+    async def scenario():
+        store = make_store()
+        await store.create("t1", make_record("t1"))
+
+        running = await store.update("t1", if_status=("pending",), status="running", progress=10)
+        assert running["status"] == "running"
+        assert running["version"] == 2
+
+        # Cancelled task ko late completion overwrite nahi karti
+        assert await store.update("t1", if_status=("running",), status="cancelled") is not None
+        assert await store.update("t1", if_status=("running",), status="completed") is None
+        assert (await store.get("t1"))["status"] == "cancelled"
+        assert (await store.get("t1"))["version"] == 3
+
+        assert await store.update("missing", status="running") is None
+
+    asyncio.run(scenario())
+
+
+def test_status_index_listing_and_cursors():
+    async def scenario():
+        store = make_store()
+        for n in range(5):
+            await store.create(f"t{n}", make_record(f"t{n}", age=100 - n))
+        await store.update("t1", status="running")
+        await store.update("t3", status="running")
+
+        running, cursor = await store.list_tasks(status="running", limit=2)
+        assert [record["task_id"] for record in running] == ["t3", "t1"]
+        assert cursor is None
+        pending, _ = await store.list_tasks(status="pending")
+        assert [record["task_id"] for record in pending] == ["t4", "t2", "t0"]
+
+        # Newest first, page by page
+        seen, cursor, pages = [], None, 0
+        while True:
+            page, cursor = await store.list_tasks(limit=2, cursor=cursor)
+            seen.extend(record["task_id"] for record in page)
+            pages += 1
+            if cursor is None:
+                break
+        assert seen == ["t4", "t3", "t2", "t1", "t0"]
+        # Last (chhota) page par hi cursor None - khali page ki extra fetch nahi
+        assert pages == 3
+
+    asyncio.run(scenario())
+
+
+def test_updates_are_published_to_subscribers():
+    async def scenario():
+        store = make_store()
+        await store.create("t1", make_record("t1"))
+        patches = []
+
+        async def listen():
+            async for patch in store.subscribe("t1"):
+                patches.append(patch)
+                if patch.get("status") == "completed":
+                    return
+
+        listener = asyncio.create_task(listen())
+        await asyncio.sleep(0.05)
+        await store.update("t1", status="running", progress=10)
+        await store.update("t1", status="completed", progress=100)
+        await asyncio.wait_for(listener, 2)
+
+        assert [(patch["status"], patch["version"]) for patch in patches] == [("running", 2), ("completed", 3)]
+        assert patches[0]["task_id"] == "t1"
+
+    asyncio.run(scenario())
+
+
+def test_sweep_drops_expired_tasks_from_indexes():
+    async def scenario():
+        store = make_store(completed_ttl=1)
+        await store.create("t1", make_record("t1"))
+        await store.create("t2", make_record("t2"))
+        await store.update("t1", status="completed")
+        assert await store.redis.ttl(store._key("t1")) > 0
+
+        # TTL expire (fakeredis mein seedha key hata kar simulate)
+        await store.redis.delete(store._key("t1"))
+        assert await store.sweep() == 1
+
+        assert await store.redis.zscore(store._index_key, "t1") is None
+        assert await store.redis.zscore(store._status_prefix + "completed", "t1") is None
+        assert await store.redis.zscore(store._index_key, "t2") is not None
+
+    asyncio.run(scenario())
+
+
+def test_subscribers_share_one_pattern_subscription():
+    async def scenario():
+        store = make_store()
+        await store.create("t1", make_record("t1"))
+        await store.create("t2", make_record("t2"))
+        streams = [store.subscribe(task_id) for task_id in ("t1", "t1", "t2")]
+        nexts = [asyncio.ensure_future(stream.__anext__()) for stream in streams]
+        await asyncio.sleep(0.05)
+
+        feed = store._change_feed
+        assert feed is not None
+        assert (await store.redis.pubsub_numpat()) == 1
+
+        await store.update("t1", progress=10)
+        await store.update("t2", progress=20)
+        patches = await asyncio.wait_for(asyncio.gather(*nexts), 2)
+        assert [patch["progress"] for patch in patches] == [10, 10, 20]
+        assert store._change_feed is feed
+
+        for stream in streams:
+            await stream.aclose()
+        await store.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,79 @@
+"""
+JobScheduler tests - worker pool lifecycle
+"""
+import asyncio
+
+from app.services.broker import InProcessBroker
+from app.services.clients import ClientPolicy
+from app.services.scheduler import JobScheduler
+
+
+def make_scheduler(workers: int = 1) -> JobScheduler:
+    scheduler = JobScheduler(InProcessBroker(max_depth=100, default_duration=30))
+    scheduler.mode = "inline"
+    scheduler.workers = workers
+    return scheduler
+
+
+def make_job(task_id: str):
+    return {"task_id": task_id, "priority": 0, "client": "web", "params": {}}
+
+
+async def wait_until(predicate):
+    while not predicate():
+        await asyncio.sleep(0.01)
+
+
+def test_close_waits_for_cancelled_jobs_to_clean_up():
+    cleaned_up = []
+
+    async def handler(job):
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            # Journal / checkpoint write jaisa async cleanup
+            await asyncio.sleep(0.05)
+            cleaned_up.append(job["task_id"])
+            raise
+
+    async def scenario():
+        scheduler = make_scheduler()
+        await scheduler.start(handler)
+        await scheduler.broker.enqueue(make_job("t1"), ClientPolicy())
+        await wait_until(lambda: "t1" in scheduler._running)
+
+        await scheduler.close()
+        return list(cleaned_up)
+
+    # close() return hone tak job ka cleanup poora ho chuka hai
+    assert asyncio.run(scenario()) == ["t1"]
+
+
+def test_worker_survives_transient_dequeue_error():
+    handled = []
+
+    async def handler(job):
+        handled.append(job["task_id"])
+
+    async def scenario():
+        scheduler = make_scheduler()
+        broker = scheduler.broker
+        dequeue = broker.dequeue
+        failures = [ConnectionError("connection reset")]
+
+        async def flaky_dequeue():
+            if failures:
+                raise failures.pop()
+            return await dequeue()
+
+        broker.dequeue = flaky_dequeue
+        await scheduler.start(handler)
+        await broker.enqueue(make_job("t1"), ClientPolicy())
+        try:
+            # Pehla dequeue fail hota hai; wahi worker retry karke job uthata hai
+            await asyncio.wait_for(wait_until(lambda: handled), timeout=5)
+        finally:
+            await scheduler.close()
+
+    asyncio.run(scenario())
+    assert handled == ["t1"]
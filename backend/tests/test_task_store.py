@@ -0,0 +1,65 @@
+"""
+MemoryTaskStore tests
+"""
+import asyncio
+from datetime import datetime
+
+from app.services.task_store import MemoryTaskStore
+
+
+def make_store() -> MemoryTaskStore:
+    return MemoryTaskStore(max_bytes=64 * 1024 * 1024, completed_ttl=3600, failed_ttl=3600, sweep_interval=0)
+
+
+def test_slow_subscriber_gets_full_record_instead_of_dropped_patches():
+    async def scenario():
+        store = make_store()
+        await store.create("t1", {"task_id": "t1", "status": "running", "created_at": datetime.now().isoformat()})
+        events = store.subscribe("t1")
+        first = asyncio.ensure_future(events.__anext__())
+        await asyncio.sleep(0)
+
+        # Pehla patch consume, phir subscriber queue (256) se zyada patches
+        await store.update("t1", current_step="planner")
+        assert (await first)["current_step"] == "planner"
+        await store.update("t1", current_step="generator", iteration=1)
+        for progress in range(300):
+            await store.update("t1", progress=progress)
+
+        patch = await events.__anext__()
+        await events.aclose()
+        return patch, await store.get("t1")
+
+    patch, record = asyncio.run(scenario())
+
+    # Dropped deltas (current_step / iteration) resync record mein maujood hain
+    assert patch["resync"] is True
+    assert patch["current_step"] == "generator"
+    assert patch["iteration"] == 1
+    assert patch["progress"] == 299
+    assert patch["version"] == record["version"]
+
+
+def test_status_listing_follows_status_changes_and_deletes():
+    async def scenario():
+        store = make_store()
+        for n in range(5):
+            await store.create(f"t{n}", {"task_id": f"t{n}", "status": "pending", "created_at": datetime(2026, 1, 1, 12, 0, n).isoformat()})
+        await store.update("t1", status="running")
+        await store.update("t3", status="running")
+        await store.update("t3", progress=50)
+        await store.delete("t2")
+
+        running, cursor = await store.list_tasks(status="running")
+        assert [record["task_id"] for record in running] == ["t3", "t1"]
+        assert cursor is None
+
+        page, cursor = await store.list_tasks(status="pending", limit=1)
+        assert [record["task_id"] for record in page] == ["t4"]
+        page, cursor = await store.list_tasks(status="pending", limit=1, cursor=cursor)
+        assert [record["task_id"] for record in page] == ["t0"]
+        assert cursor is None
+
+        assert (await store.stats())["by_status"] == {"pending": 2, "running": 2}
+
+    asyncio.run(scenario())
@@ -23,7 +23,7 @@ export default function ImageCanvas({
     if (!image) return;
 
     const link = document.createElement('a');
-    link.href = `data:image/png;base64,${image}`;
+    link.href = image;
     link.download = `ai-vision-${Date.now()}.png`;
     link.click();
   };
@@ -156,7 +156,7 @@ export default function ImageCanvas({
               className="absolute inset-0"
             >
               <img
-                src={`data:image/png;base64,${image}`}
+                src={image}
                 alt="Generated"
                 className="w-full h-full object-contain"
               />
@@ -17,7 +17,9 @@ export const useImageGeneration = () => {
   const [feedback, setFeedback] = useState(null);
   const [currentStep, setCurrentStep] = useState('');
   
-  const pollIntervalRef = useRef(null);
+  const pollRef = useRef(null); // Long-poll loop ({ active })
+  const eventSourceRef = useRef(null); // SSE status stream
+  const activeTaskRef = useRef(null); // Abhi chal raha task (cancel ke liye)
 
   /**
    * Start image generation
@@ -31,8 +33,18 @@ export const useImageGeneration = () => {
       setStatus('pending');
       setCurrentStep('Initializing...');
 
+      // Reference file pehle multipart upload hoti hai; generate mein sirf handle jata hai
+      let referenceImageId = null;
+      if (options.referenceFile) {
+        const form = new FormData();
+        form.append('file', options.referenceFile);
+        const upload = await axios.post(`${API_BASE_URL}/api/v1/reference`, form);
+        referenceImageId = upload.data.reference_id;
+      }
+
       const response = await axios.post(`${API_BASE_URL}/api/v1/generate`, {
         prompt,
+        reference_image_id: referenceImageId,
         reference_image: options.referenceImage || null,
         max_iterations: options.maxIterations || 3,
         enable_monitoring: true
@@ -40,9 +52,10 @@ export const useImageGeneration = () => {
 
       const { task_id } = response.data;
       setTaskId(task_id);
+      activeTaskRef.current = task_id;
       
-      // Start polling for status
-      startPolling(task_id);
+      // Status updates: SSE stream (fallback: polling)
+      startStatusStream(task_id);
 
       return task_id;
     } catch (err) {
@@ -54,41 +67,131 @@ export const useImageGeneration = () => {
   }, []);
 
   /**
-   * Poll task status
+   * Stop status updates (stream + polling)
    */
-  const startPolling = useCallback((task_id) => {
-    // Clear existing interval
-    if (pollIntervalRef.current) {
-      clearInterval(pollIntervalRef.current);
+  const stopStatusUpdates = useCallback(() => {
+    if (eventSourceRef.current) {
+      eventSourceRef.current.close();
+      eventSourceRef.current = null;
+    }
+    if (pollRef.current) {
+      pollRef.current.active = false;
+      pollRef.current = null;
+    }
+  }, []);
+
+  /**
+   * Status (poora ya partial patch) ko state mein apply karo
+   */
+  const applyStatus = useCallback((data) => {
+    if (data.status !== undefined) setStatus(data.status);
+    if (data.progress !== undefined) setProgress(data.progress);
+    if (data.current_step !== undefined) setCurrentStep(data.current_step);
+
+    // Update based on status
+    if (data.status === 'completed') {
+      // Image URL se serve hoti hai (browser cache + ETag)
+      setGeneratedImage(data.image_url ? `${API_BASE_URL}${data.image_url}` : null);
+      setFeedback(data.feedback);
+      setLoading(false);
+      activeTaskRef.current = null;
+      stopStatusUpdates();
+    } else if (data.status === 'failed') {
+      setError(data.error || 'Generation failed');
+      setLoading(false);
+      activeTaskRef.current = null;
+      stopStatusUpdates();
+    } else if (data.status === 'cancelled') {
+      setLoading(false);
+      activeTaskRef.current = null;
+      stopStatusUpdates();
     }
+  }, [stopStatusUpdates]);
+
+  /**
+   * Long-poll task status (fallback jab SSE available na ho)
+   * Server version badalne tak request hold karta hai; kuch na badle to 304 (body nahi)
+   */
+  const startPolling = useCallback((task_id) => {
+    stopStatusUpdates();
 
-    // Poll every 2 seconds
-    pollIntervalRef.current = setInterval(async () => {
-      try {
-        const response = await axios.get(`${API_BASE_URL}/api/v1/status/${task_id}`);
-        const data = response.data;
-
-        setStatus(data.status);
-        setProgress(data.progress);
-        setCurrentStep(data.current_step);
-
-        // Update based on status
-        if (data.status === 'completed') {
-          setGeneratedImage(data.generated_image);
-          setFeedback(data.feedback);
-          setLoading(false);
-          clearInterval(pollIntervalRef.current);
-        } else if (data.status === 'failed') {
-          setError(data.error || 'Generation failed');
-          setLoading(false);
-          clearInterval(pollIntervalRef.current);
+    const poll = { active: true };
+    pollRef.current = poll;
+
+    (async () => {
+      let etag = null;
+      while (poll.active) {
+        try {
+          const response = await axios.get(`${API_BASE_URL}/api/v1/status/${task_id}`, {
+            params: { wait: 25 },
+            headers: etag ? { 'If-None-Match': etag } : {},
+            validateStatus: (code) => code === 200 || code === 304,
+          });
+          if (!poll.active) return;
+          if (response.status === 200) {
+            etag = response.headers.etag || null;
+            applyStatus(response.data);
+          }
+        } catch (err) {
+          console.error('Polling error:', err);
+          // Don't stop polling on temporary errors (thoda ruk kar retry)
+          await new Promise((resolve) => setTimeout(resolve, 2000));
         }
-      } catch (err) {
-        console.error('Polling error:', err);
-        // Don't stop polling on temporary errors
       }
-    }, 2000);
-  }, []);
+    })();
+  }, [applyStatus, stopStatusUpdates]);
+
+  /**
+   * Server-Sent Events stream: har node transition par push
+   * (browser khud Last-Event-ID ke saath reconnect karta hai)
+   */
+  const startStatusStream = useCallback((task_id) => {
+    stopStatusUpdates();
+
+    if (typeof window === 'undefined' || !window.EventSource) {
+      startPolling(task_id);
+      return;
+    }
+
+    const source = new EventSource(`${API_BASE_URL}/api/v1/status/${task_id}/stream`);
+    eventSourceRef.current = source;
+    let received = false;
+
+    const handle = (event) => {
+      received = true;
+      applyStatus(JSON.parse(event.data));
+    };
+    source.addEventListener('status', handle);
+    source.addEventListener('progress', handle);
+    source.addEventListener('done', handle);
+
+    source.onerror = () => {
+      // Stream kabhi connect hi nahi hua (proxy / old server) ya band ho gaya: polling
+      if (eventSourceRef.current === source && (!received || source.readyState === EventSource.CLOSED)) {
+        startPolling(task_id);
+      }
+    };
+  }, [applyStatus, startPolling, stopStatusUpdates]);
+
+  /**
+   * Cancel running generation (server par upstream calls bhi ruk jati hain)
+   */
+  const cancelGeneration = useCallback(async () => {
+    const task_id = activeTaskRef.current;
+    if (!task_id) return;
+
+    activeTaskRef.current = null;
+    stopStatusUpdates();
+    setLoading(false);
+    setStatus('cancelled');
+    setCurrentStep('cancelled');
+
+    try {
+      await axios.post(`${API_BASE_URL}/api/v1/task/${task_id}/cancel`);
+    } catch (err) {
+      console.error('Failed to cancel task:', err);
+    }
+  }, [stopStatusUpdates]);
 
   /**
    * Submit feedback
@@ -111,9 +214,8 @@ export const useImageGeneration = () => {
    * Reset state
    */
   const reset = useCallback(() => {
-    if (pollIntervalRef.current) {
-      clearInterval(pollIntervalRef.current);
-    }
+    cancelGeneration();
+    stopStatusUpdates();
     setLoading(false);
     setError(null);
     setTaskId(null);
@@ -122,19 +224,37 @@ export const useImageGeneration = () => {
     setGeneratedImage(null);
     setFeedback(null);
     setCurrentStep('');
+  }, [cancelGeneration, stopStatusUpdates]);
+
+  // Tab band ho to running task cancel karo (warna upstream capacity waste hoti hai)
+  useEffect(() => {
+    const cancelOnUnload = () => {
+      if (activeTaskRef.current && navigator.sendBeacon) {
+        navigator.sendBeacon(`${API_BASE_URL}/api/v1/task/${activeTaskRef.current}/cancel`);
+      }
+    };
+    window.addEventListener('pagehide', cancelOnUnload);
+    return () => window.removeEventListener('pagehide', cancelOnUnload);
   }, []);
 
   // Cleanup on unmount
   useEffect(() => {
     return () => {
-      if (pollIntervalRef.current) {
-        clearInterval(pollIntervalRef.current);
+      if (pollRef.current) {
+        pollRef.current.active = false;
+      }
+      if (eventSourceRef.current) {
+        eventSourceRef.current.close();
+      }
+      if (activeTaskRef.current) {
+        axios.post(`${API_BASE_URL}/api/v1/task/${activeTaskRef.current}/cancel`).catch(() => {});
       }
     };
   }, []);
 
   return {
     generateImage,
+    cancelGeneration,
     submitFeedback,
     reset,
     loading,
@@ -3,6 +3,7 @@ Simple API Tests
 Backend API ko test karne ke liye
 """
 import requests
+import json
 import time
 import sys
 
@@ -54,39 +55,87 @@ def test_generate(prompt="A cute robot in a library"):
         task_id = data.get("task_id")
         print(f"✅ Generation started - Task ID: {task_id}")
         
-        # Poll for completion
+        # Wait for completion (SSE stream, fallback: polling)
         print("⏳ Waiting for generation to complete...")
         max_wait = 120  # 2 minutes
-        start_time = time.time()
+        status_data = stream_status(task_id, max_wait) or poll_status(task_id, max_wait)
         
-        while time.time() - start_time < max_wait:
-            status_response = requests.get(f"{API_BASE}/api/v1/status/{task_id}")
-            status_data = status_response.json()
-            
-            status = status_data.get("status")
-            progress = status_data.get("progress", 0)
-            
-            print(f"   Status: {status} - Progress: {progress}%", end='\r')
-            
-            if status == "completed":
-                print("\n✅ Generation completed successfully!")
-                if status_data.get("generated_image"):
-                    print("✅ Image data received")
-                return True
-            elif status == "failed":
-                error = status_data.get("error", "Unknown error")
-                print(f"\n❌ Generation failed: {error}")
-                return False
-            
-            time.sleep(2)
+        if status_data is None:
+            print(f"\n⚠️ Generation timed out after {max_wait}s")
+            return False
         
-        print(f"\n⚠️ Generation timed out after {max_wait}s")
+        status = status_data.get("status")
+        if status == "completed":
+            print("\n✅ Generation completed successfully!")
+            image_url = status_data.get("image_url")
+            if image_url:
+                image_response = requests.get(f"{API_BASE}{image_url}")
+                if image_response.status_code == 200:
+                    print(f"✅ Image data received ({len(image_response.content)} bytes)")
+            return True
+        
+        error = status_data.get("error", "Unknown error")
+        print(f"\n❌ Generation {status}: {error}")
         return False
         
     except Exception as e:
         print(f"❌ Generation test failed: {e}")
         return False
 
+def stream_status(task_id, max_wait):
+    """SSE stream se final status (None agar stream available na ho)"""
+    try:
+        with requests.get(
+            f"{API_BASE}/api/v1/status/{task_id}/stream",
+            stream=True,
+            timeout=(5, max_wait)
+        ) as response:
+            if response.status_code != 200:
+                return None
+            
+            event = None
+            for line in response.iter_lines(decode_unicode=True):
+                if line.startswith("event:"):
+                    event = line[6:].strip()
+                elif line.startswith("data:"):
+                    data = json.loads(line[5:])
+                    if "progress" in data:
+                        print(f"   {data.get('current_step', '')} - Progress: {data['progress']}%", end='\r')
+                    if event == "done":
+                        return data
+    except requests.RequestException as e:
+        print(f"⚠️ Status stream unavailable ({e}), falling back to polling")
+    return None
+
+def poll_status(task_id, max_wait):
+    """Long-poll (ETag + ?wait=) jab tak task finish na ho"""
+    start_time = time.time()
+    etag = None
+    
+    while time.time() - start_time < max_wait:
+        response = requests.get(
+            f"{API_BASE}/api/v1/status/{task_id}",
+            params={"wait": 10},
+            headers={"If-None-Match": etag} if etag else {}
+        )
+        if response.status_code == 304:
+            continue  # Kuch nahi badla
+        etag = response.headers.get("ETag")
+        status_data = response.json()
+        
+        status = status_data.get("status")
+        progress = status_data.get("progress", 0)
+        
+        print(f"   Status: {status} - Progress: {progress}%", end='\r')
+        
+        if status in ("completed", "failed", "cancelled"):
+            return status_data
+        
+        if etag is None:
+            time.sleep(2)  # Purana server: long-poll support nahi
+    
+    return None
+
 def run_all_tests():
     """Run all tests"""
     print("="*50)